@@ -3,13 +3,34 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+from functools import cache
+from typing import Literal
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 
-from .models import OptimizeRequest, OptimizeResponse, OptimizationResult
-from .seed import SCENARIOS
-from .optimizer import optimize, optimize_stream
+from .models import (
+    OptimizeRequest, OptimizeResponse, OptimizationResult, ExplainRequest, BatchOptimizeRequest, PrefetchRequest,
+)
+from .optimizer import (
+    optimize, optimize_stream, optimize_events, explain_assignment, choose_model_policy, format_sse, ModelPolicy,
+    DRIVE_TIMES_SHARE,
+)
+from .ingest import NdjsonIngest
+from .jobs import JobQueue, QueueFullError
+from .batches import BatchStore
+from .mip import MIP_MAX_RIDES, SolverUnavailableError, optimize_mip
+from .matching import optimize_first_leg
+from .route_store import RouteRun, route_store
+from .polyline import MAX_ZOOM, GeometryOptions
+from .deadline import Deadline
+from .directions import start_retry_budget
+from .metrics import metrics
+from .serialization import FastJSONResponse
+from .compression import CompressionMiddleware, StaticPayload
+from .scheduler import DEFAULT_TENANT, TENANT_ID_RE
 
 app = FastAPI(title="Fleet Route Optimizer", version="0.1.0")
 
@@ -20,36 +41,129 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 
-@app.get("/api/scenarios")
-async def list_scenarios() -> dict:
-    """List available scenarios."""
-    return {
+class _RetryBudgetScope:
+    """Gives every HTTP request one Google Maps retry budget, shared by all the calls it makes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            start_retry_budget()
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(_RetryBudgetScope)
+
+
+# Scenario data never changes while the process runs: build and serialize each payload once, on
+# first request (not at import, so a cold start serving /health never materializes it)
+@cache
+def _scenarios_payload() -> StaticPayload:
+    from .seed import SCENARIOS
+
+    return StaticPayload({
         "scenarios": {
             key: {"label": s["label"], "description": s["description"]}
             for key, s in SCENARIOS.items()
         }
-    }
+    })
+
+
+@cache
+def _seed_payload(scenario: str) -> StaticPayload:
+    from .seed import SCENARIOS
+
+    s = SCENARIOS[scenario]
+    return StaticPayload({"rides": s["rides"], "vehicles": s["vehicles"]})
+
+
+@app.get("/api/scenarios")
+async def list_scenarios(
+    if_none_match: str | None = Header(default=None), accept_encoding: str | None = Header(default=None)
+) -> Response:
+    """List available scenarios."""
+    return _scenarios_payload().response(if_none_match, accept_encoding)
 
 
 @app.get("/api/seed")
-async def get_seed(scenario: str = "downtown_mix") -> dict:
-    """Return scenario data. Defaults to downtown_mix."""
+async def get_seed(
+    scenario: str = "downtown_mix",
+    offset: int = Query(default=0, ge=0),
+    limit: int | None = Query(default=None, ge=1),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+) -> Response:
+    """Return scenario data. Defaults to downtown_mix. Conditional GETs get 304 Not Modified.
+
+    offset/limit page through the rides (vehicles always come whole); a page is cut from the
+    scenario's JSONL lines without parsing them, so large replayed days stay cheap to browse.
+    """
+    from .seed import SCENARIOS
+
     if scenario not in SCENARIOS:
         raise HTTPException(status_code=400, detail=f"Unknown scenario: {scenario}. Options: {list(SCENARIOS.keys())}")
+    if offset == 0 and limit is None:
+        return _seed_payload(scenario).response(if_none_match, accept_encoding)
     s = SCENARIOS[scenario]
-    return {
-        "rides": [r.model_dump() for r in s["rides"]],
-        "vehicles": [v.model_dump() for v in s["vehicles"]],
-    }
+    rides = s.ride_file
+    body = b"".join((
+        b'{"rides":', rides.json_array(offset, limit),
+        b',"vehicles":', s.vehicle_file.json_array(),
+        b',"total_rides":%d,"offset":%d,"limit":%s}' % (len(rides), offset, b"null" if limit is None else b"%d" % limit),
+    ))
+    return Response(body, media_type="application/json")
+
+
+def _deadline(request: OptimizeRequest, header_ms: int | None) -> Deadline:
+    """Request-level deadline: the body's deadline_ms wins over the X-Deadline-Ms header."""
+    ms = request.deadline_ms or header_ms
+    if ms is not None and ms <= 0:
+        raise HTTPException(status_code=400, detail="X-Deadline-Ms must be positive")
+    return Deadline.from_ms(ms)
+
+
+def _tenant(header: str | None) -> str:
+    """Caller identity for fair scheduling of Claude calls (X-Tenant-Id; one per operator account).
+
+    Any well-formed ID is accepted; the scheduler bounds how many unlisted ones it tracks.
+    """
+    if header is None:
+        return DEFAULT_TENANT
+    if not TENANT_ID_RE.match(header):
+        raise HTTPException(status_code=400, detail="X-Tenant-Id must be 1-64 of [a-zA-Z0-9_.-]")
+    return header
 
 
-@app.post("/api/optimize")
-async def optimize_routes(request: OptimizeRequest) -> OptimizeResponse:
+def _geometry(request: OptimizeRequest) -> GeometryOptions:
+    return GeometryOptions(
+        lazy=request.polylines == "lazy", encoded=request.polyline_format == "encoded", zoom=request.zoom
+    )
+
+
+def _policy(request: OptimizeRequest) -> ModelPolicy:
+    return choose_model_policy(request.rides, request.vehicles, request.model_tier, request.thinking_budget)
+
+
+@app.post("/api/optimize", response_model=OptimizeResponse, response_class=FastJSONResponse)
+async def optimize_routes(
+    request: OptimizeRequest,
+    x_deadline_ms: int | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+) -> FastJSONResponse:
     """Accept rides + vehicles, return assignments + reasoning + mile comparison."""
-    data = await optimize(request.rides, request.vehicles)
-    return OptimizeResponse(
+    data = await optimize(
+        request.rides, request.vehicles, _deadline(request, x_deadline_ms), request.speculative, request.output_format,
+        _policy(request), _tenant(x_tenant_id), _geometry(request),
+    )
+    return _optimize_response(data)
+
+
+def _optimize_response(data: dict) -> FastJSONResponse:
+    return FastJSONResponse(OptimizeResponse(
         result=data["result"],
         prompt_used=data["prompt"],
         naive_miles=round(data["naive_miles"], 1),
@@ -57,19 +171,243 @@ async def optimize_routes(request: OptimizeRequest) -> OptimizeResponse:
         naive_violations=data["naive_violations"],
         optimized_violations=data["optimized_violations"],
         naive_assignments=data["naive_assignments"],
-    )
+        degradations=data["degradations"],
+        plan_source=data["plan_source"],
+        plan_scores=data["plan_scores"],
+        repairs=data["repairs"],
+        model_policy=data["model_policy"],
+        local_search=data.get("local_search", {}),
+        solver=data.get("solver", {}),
+        run_id=data["run_id"],
+        rejected_lines=data.get("rejected_lines", []),
+        rejected_line_count=data.get("rejected_line_count", 0),
+    ))
+
+
+@app.post("/api/optimize-ndjson", response_model=OptimizeResponse, response_class=FastJSONResponse)
+async def optimize_routes_ndjson(
+    request: Request,
+    x_deadline_ms: int | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+) -> FastJSONResponse:
+    """/optimize for big boards, uploaded as NDJSON lines (see app.ingest) instead of one JSON body.
+
+    Lines are validated as they arrive and road legs are fetched meanwhile. Bad lines are left
+    out and listed in rejected_lines; the rest of the batch is still optimized.
+    """
+    tenant = _tenant(x_tenant_id)
+    if x_deadline_ms is not None and x_deadline_ms <= 0:  # checked before the upload is read
+        raise HTTPException(status_code=400, detail="X-Deadline-Ms must be positive")
+    ingest = NdjsonIngest()
+    try:
+        await ingest.feed(request.stream())
+        if not ingest.rides or not ingest.vehicles:
+            raise HTTPException(status_code=400, detail={
+                "message": "upload needs at least one valid ride line and one valid vehicle line",
+                "rejected_lines": [e.model_dump() for e in ingest.errors],
+                "rejected_line_count": ingest.error_count,
+            })
+        body = ingest.request()
+        deadline = _deadline(body, x_deadline_ms)
+        await ingest.settle(deadline, DRIVE_TIMES_SHARE)
+        data = await optimize(
+            body.rides, body.vehicles, deadline, body.speculative, body.output_format,
+            _policy(body), tenant, _geometry(body),
+        )
+    finally:
+        ingest.cancel()  # no-op once the prefetch has finished; otherwise nobody will use its legs
+    return _optimize_response({**data, **ingest.rejected()})
+
+
+@app.post("/api/optimize-mip", response_model=OptimizeResponse, response_class=FastJSONResponse)
+async def optimize_routes_mip(
+    request: OptimizeRequest, x_deadline_ms: int | None = Header(default=None)
+) -> FastJSONResponse:
+    """Exact MIP assignment for small batches (no LLM); a quality baseline for Claude's plans."""
+    if len(request.rides) > MIP_MAX_RIDES:
+        raise HTTPException(
+            status_code=400, detail=f"MIP mode handles up to {MIP_MAX_RIDES} rides; use /optimize for larger batches"
+        )
+    try:
+        data = await optimize_mip(
+            request.rides, request.vehicles, _deadline(request, x_deadline_ms), _geometry(request)
+        )
+    except SolverUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return _optimize_response(data)
+
+
+@app.post("/api/optimize-first-leg", response_model=OptimizeResponse, response_class=FastJSONResponse)
+async def optimize_routes_first_leg(
+    request: OptimizeRequest, x_deadline_ms: int | None = Header(default=None)
+) -> FastJSONResponse:
+    """Dispatch one next pickup per available vehicle by optimal min-cost matching (no LLM)."""
+    try:
+        data = await optimize_first_leg(
+            request.rides, request.vehicles, _deadline(request, x_deadline_ms), _geometry(request)
+        )
+    except SolverUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return _optimize_response(data)
 
 
 @app.post("/api/optimize-stream")
-async def optimize_routes_stream(request: OptimizeRequest):
+async def optimize_routes_stream(
+    request: OptimizeRequest,
+    x_deadline_ms: int | None = Header(default=None),
+    x_tenant_id: str | None = Header(default=None),
+):
     """Stream Claude's reasoning tokens, then send the final result."""
     return StreamingResponse(
-        optimize_stream(request.rides, request.vehicles),
+        optimize_stream(
+            request.rides, request.vehicles, _deadline(request, x_deadline_ms), request.speculative, request.output_format,
+            _policy(request), _tenant(x_tenant_id), _geometry(request),
+        ),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+def _route_run(run_id: str, plan: str, vehicle_id: str | None = None) -> RouteRun:
+    if not route_store.enabled:
+        raise HTTPException(
+            status_code=501, detail="Route runs aren't kept on this deployment; request polylines=\"eager\""
+        )
+    run = route_store.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    if plan not in run.plans:
+        raise HTTPException(status_code=400, detail=f"Unknown plan: {plan}. Options: {list(run.plans)}")
+    if vehicle_id is not None and vehicle_id not in run.plans[plan]:
+        raise HTTPException(status_code=404, detail=f"No {plan} route for vehicle {vehicle_id}")
+    return run
+
+
+@app.get("/api/routes/{run_id}/{vehicle_id}/polyline")
+async def get_route_geometry(
+    run_id: str,
+    vehicle_id: str,
+    plan: str = "optimized",
+    zoom: int | None = Query(default=None, ge=0, le=MAX_ZOOM),
+    format: Literal["points", "encoded"] = "points",
+) -> dict:
+    """Road geometry for one vehicle's route in a finished run, fetched on first request and cached."""
+    run = _route_run(run_id, plan, vehicle_id)
+    route = await run.route(plan, vehicle_id)
+    geometry = GeometryOptions(encoded=format == "encoded", zoom=zoom)
+    points, encoded = route.polyline, ""
+    if geometry.reshapes:
+        points, encoded = await asyncio.to_thread(geometry.shape, route.polyline)
+    return {
+        "run_id": run_id,
+        "vehicle_id": vehicle_id,
+        "plan": plan,
+        "polyline": points,
+        "encoded_polyline": encoded,
+        "route_miles": run.plans[plan][vehicle_id].route_miles,
+        "leg_miles": [round(m, 2) for m in route.leg_miles],
+        "leg_minutes": [round(m, 1) if m is not None else None for m in route.leg_minutes],
+    }
+
+
+@app.post("/api/routes/{run_id}/prefetch", status_code=202)
+async def prefetch_routes(run_id: str, request: PrefetchRequest) -> dict:
+    """Start fetching a run's polylines in the background, vehicles in the given viewport first."""
+    run = _route_run(run_id, request.plan)
+    queued = run.prefetch(request.plan, request.viewport, request.vehicle_ids)
+    return {"run_id": run_id, "plan": request.plan, "queued": queued}
+
+
+@app.post("/api/explain")
+async def explain_route(request: ExplainRequest, x_tenant_id: str | None = Header(default=None)) -> dict:
+    """Generate the reasoning for one vehicle's route on demand (compact plans ship without it)."""
+    if not any(v.id == request.vehicle_id for v in request.vehicles):
+        raise HTTPException(status_code=400, detail=f"Unknown vehicle: {request.vehicle_id}")
+    reasoning = await explain_assignment(
+        request.vehicle_id, request.ride_ids_in_order, request.rides, request.vehicles, _tenant(x_tenant_id)
+    )
+    return {"vehicle_id": request.vehicle_id, "reasoning": reasoning}
+
+
+# A job's deadline and Google retry budget start when a worker picks it up, not at submission
+async def _run_job(req: OptimizeRequest, tenant: str):
+    start_retry_budget()
+    async for event in optimize_events(
+        req.rides, req.vehicles, Deadline.from_ms(req.deadline_ms), req.speculative, req.output_format, _policy(req),
+        tenant, _geometry(req),
+    ):
+        yield event
+
+
+job_queue = JobQueue(_run_job)
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: OptimizeRequest, x_tenant_id: str | None = Header(default=None)) -> dict:
+    """Queue an optimization run and return its job ID immediately."""
+    try:
+        job = job_queue.submit(request, _tenant(x_tenant_id))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """Poll a job's status; includes the final result once it has succeeded."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.summary()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Stream a job's events (replayed from the start) as SSE until it finishes."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    async def frames():
+        async for event in job_queue.follow(job):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+batch_store = BatchStore()
+
+
+@app.post("/api/batches", status_code=202)
+async def submit_batch(request: BatchOptimizeRequest) -> dict:
+    """Submit many optimization requests as one Message Batch (day-ahead planning, no streaming)."""
+    if not request.requests:
+        raise HTTPException(status_code=400, detail="No requests in batch")
+    try:
+        run = batch_store.start(request.requests)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"batch_id": run.id, "status": run.status}
+
+
+@app.get("/api/batches/{batch_id}")
+async def get_batch(batch_id: str) -> dict:
+    """Poll a batch; once ended, includes each request's enriched result (or its error)."""
+    run = batch_store.get(batch_id)
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    return run.summary()
+
+
+@app.get("/api/metrics")
+async def get_metrics() -> dict:
+    return metrics.snapshot()
+
+
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
@@ -0,0 +1,233 @@
+"""Day-ahead batch optimization through the Message Batches API.
+
+Many OptimizeRequests (typically one per operator account) are turned into prompts with
+build_prompt, submitted as a single message batch, polled until the batch ends, and each result
+is run through the same repair, enrichment and violation pipeline as /optimize.
+
+Set ANTHROPIC_BATCH_API=local to use LocalMessageBatches, an in-process stand-in that answers
+each request with an ordinary messages.create call. It is also what the tests run against.
+"""
+
+import asyncio
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from .metrics import metrics
+from .models import OptimizeRequest
+from .optimizer import (
+    build_message_params, build_prompt, choose_model_policy, claude_client, finalize_plan, improve_plan,
+    parse_message_content,
+)
+from .road_matrix import MileageEvaluator
+
+
+BATCH_POLL_SECONDS = float(os.environ.get("ANTHROPIC_BATCH_POLL_SECONDS", "30"))
+LOCAL_BATCH_CONCURRENCY = 4
+BATCH_RUNS_RETAIN = int(os.environ.get("BATCH_RUNS_RETAIN", "64"))  # finished runs kept for GET /batches/{id}
+
+# Message Batches custom_id rules
+CUSTOM_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
+
+class LocalMessageBatches:
+    """In-process stand-in for `client.messages.batches` (create / retrieve / results).
+
+    Each batch is processed in the background with plain messages.create calls.
+    """
+
+    def __init__(self, client=None, concurrency: int = LOCAL_BATCH_CONCURRENCY):
+        self._client = client
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._batches: dict[str, SimpleNamespace] = {}
+        self._results: dict[str, list[SimpleNamespace]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def create(self, requests: list[dict]) -> SimpleNamespace:
+        batch = SimpleNamespace(
+            id=f"msgbatch_local_{uuid.uuid4().hex[:16]}",
+            processing_status="in_progress",
+            request_counts=SimpleNamespace(processing=len(requests), succeeded=0, errored=0, canceled=0, expired=0),
+        )
+        self._batches[batch.id] = batch
+        self._results[batch.id] = []
+        task = asyncio.create_task(self._process(batch, requests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return batch
+
+    async def _answer(self, batch: SimpleNamespace, request: dict) -> None:
+        client = self._client or claude_client()
+        async with self._semaphore:
+            try:
+                message = await client.messages.create(**request["params"])
+                result = SimpleNamespace(type="succeeded", message=message)
+                batch.request_counts.succeeded += 1
+            except Exception as e:
+                result = SimpleNamespace(type="errored", error=SimpleNamespace(type="api_error", message=str(e)))
+                batch.request_counts.errored += 1
+        batch.request_counts.processing -= 1
+        self._results[batch.id].append(SimpleNamespace(custom_id=request["custom_id"], result=result))
+
+    async def _process(self, batch: SimpleNamespace, requests: list[dict]) -> None:
+        await asyncio.gather(*[self._answer(batch, r) for r in requests])
+        batch.processing_status = "ended"
+
+    async def retrieve(self, batch_id: str) -> SimpleNamespace:
+        return self._batches[batch_id]
+
+    async def results(self, batch_id: str) -> AsyncIterator[SimpleNamespace]:
+        async def entries():
+            for entry in self._results[batch_id]:
+                yield entry
+        return entries()
+
+
+def default_batches_api():
+    if os.environ.get("ANTHROPIC_BATCH_API") == "local":
+        return LocalMessageBatches()
+    import anthropic
+
+    return anthropic.AsyncAnthropic().messages.batches
+
+
+@dataclass
+class BatchRun:
+    id: str
+    requests: dict[str, OptimizeRequest]
+    status: str = "submitting"  # submitting | in_progress | processing_results | ended | failed
+    upstream_id: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    ended_at: float | None = None
+    results: dict[str, dict] = field(default_factory=dict)
+    error: str | None = None
+
+    def summary(self) -> dict:
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "upstream_id": self.upstream_id,
+            "requests": len(self.requests),
+            "succeeded": sum(1 for r in self.results.values() if "error" not in r),
+            "failed": sum(1 for r in self.results.values() if "error" in r),
+            "results": self.results if self.status == "ended" else {},
+            "error": self.error,
+        }
+
+
+async def submit_batch(requests: dict[str, OptimizeRequest], batches_api) -> str:
+    """Build one Messages request per OptimizeRequest and submit them as a single batch."""
+    entries = []
+    for custom_id, req in requests.items():
+        policy = choose_model_policy(req.rides, req.vehicles, req.model_tier, req.thinking_budget)
+        compact = req.output_format == "compact"
+        prompt = build_prompt(req.rides, req.vehicles, compact=compact)
+        entries.append({"custom_id": custom_id, "params": build_message_params(prompt, policy, compact)})
+    batch = await batches_api.create(requests=entries)
+    metrics.incr("llm_batches_submitted")
+    metrics.incr("llm_batch_requests", len(entries))
+    return batch.id
+
+
+async def wait_for_batch(upstream_id: str, batches_api, poll_seconds: float = BATCH_POLL_SECONDS):
+    """Poll until the batch has ended (all requests answered, errored, canceled or expired)."""
+    while True:
+        batch = await batches_api.retrieve(upstream_id)
+        if batch.processing_status == "ended":
+            return batch
+        await asyncio.sleep(poll_seconds)
+
+
+async def process_results(run: BatchRun, batches_api) -> None:
+    """Repair, enrich and score each batch result like a regular /optimize response."""
+    async for entry in await batches_api.results(run.upstream_id):
+        req = run.requests.get(entry.custom_id)
+        if req is None:
+            continue
+        if entry.result.type != "succeeded":
+            message = getattr(getattr(entry.result, "error", None), "message", None)
+            run.results[entry.custom_id] = {"error": message or entry.result.type}
+            continue
+        try:
+            result, repairs = parse_message_content(
+                entry.result.message.content, req.rides, req.vehicles, req.output_format == "compact"
+            )
+        except ValueError as e:
+            run.results[entry.custom_id] = {"error": str(e)}
+            continue
+        evaluator = MileageEvaluator(req.rides, req.vehicles)
+        await evaluator.prepare()
+        local_search = await improve_plan(result, req.rides, req.vehicles, evaluator=evaluator)
+        comparison = await finalize_plan(result, req.rides, req.vehicles, evaluator=evaluator)
+        run.results[entry.custom_id] = {
+            **comparison,
+            "result": comparison["result"].model_dump(),
+            "naive_assignments": [a.model_dump() for a in comparison["naive_assignments"]],
+            "repairs": repairs,
+            "local_search": local_search,
+        }
+
+
+class BatchStore:
+    """Tracks batch runs and drives each one (submit → poll → post-process) in a background task.
+
+    Runs still in progress are always kept; of the finished ones, the `retain` that ended most
+    recently are, oldest evicted first.
+    """
+
+    def __init__(self, batches_api=None, poll_seconds: float = BATCH_POLL_SECONDS, retain: int = BATCH_RUNS_RETAIN):
+        self._batches_api = batches_api
+        self.poll_seconds = poll_seconds
+        self.retain = retain
+        self.runs: dict[str, BatchRun] = {}
+        self._finished: OrderedDict[str, None] = OrderedDict()  # run IDs in the order they ended
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def batches_api(self):
+        if self._batches_api is None:
+            self._batches_api = default_batches_api()
+        return self._batches_api
+
+    def start(self, requests: dict[str, OptimizeRequest]) -> BatchRun:
+        bad = [cid for cid in requests if not CUSTOM_ID_RE.match(cid)]
+        if bad:
+            raise ValueError(f"Request IDs must be 1-64 of [a-zA-Z0-9_-]: {bad}")
+        run = BatchRun(id=uuid.uuid4().hex[:12], requests=requests)
+        self.runs[run.id] = run
+        task = asyncio.create_task(self._drive(run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return run
+
+    def get(self, run_id: str) -> BatchRun | None:
+        return self.runs.get(run_id)
+
+    async def _drive(self, run: BatchRun) -> None:
+        try:
+            run.upstream_id = await submit_batch(run.requests, self.batches_api)
+            run.status = "in_progress"
+            await wait_for_batch(run.upstream_id, self.batches_api, self.poll_seconds)
+            run.status = "processing_results"
+            await process_results(run, self.batches_api)
+            run.status = "ended"
+        except Exception as e:
+            run.status = "failed"
+            run.error = str(e)
+        finally:
+            run.ended_at = time.time()
+            self._finished[run.id] = None
+            while len(self._finished) > self.retain:
+                self.runs.pop(self._finished.popitem(last=False)[0], None)
+
+    async def wait(self, run_id: str) -> BatchRun:
+        """Block until a run has finished (used by tests and scripts)."""
+        run = self.runs[run_id]
+        while run.status not in ("ended", "failed"):
+            await asyncio.sleep(0.01)
+        return run
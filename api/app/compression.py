@@ -0,0 +1,131 @@
+"""Response compression and precomputed static payloads with strong ETags.
+
+CompressionMiddleware compresses complete JSON bodies above COMPRESS_MIN_BYTES with brotli
+(when the `brotli` extra is installed and the client accepts it) or gzip. Streamed bodies
+(SSE and any other StreamingResponse) pass through untouched and unbuffered.
+
+StaticPayload holds one serialized body plus its compressed variants, built once. Each
+variant has its own strong ETag, so If-None-Match can answer 304 without re-serializing.
+"""
+
+import gzip
+import hashlib
+import os
+from typing import Any
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .serialization import dumps
+
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))  # smaller bodies aren't worth a round of deflate
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # per-request bodies; static payloads are compressed once at maximum quality
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Best content coding we can produce for an Accept-Encoding header: br, then gzip."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        if coding and not (params and q.replace(".", "", 1).isdigit() and float(q) == 0):
+            accepted.add(coding)
+    if "br" in accepted and _brotli() is not None:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == "br":
+        return _brotli().compress(body, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress complete response bodies; never touch streamed ones or already-encoded ones."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or headers.get("content-type", "").startswith("text/event-stream"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message  # held until we know whether the body arrives in one piece
+            elif message.get("more_body", False):
+                # A streamed body: send it on as it comes rather than buffer it to compress
+                passthrough = True
+                await send(start)
+                await send(message)
+            else:
+                body = message.get("body", b"")
+                if len(body) >= self.minimum_size:
+                    headers = MutableHeaders(scope=start)
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding:
+                        body = compress(body, encoding)
+                        headers["Content-Encoding"] = encoding
+                        headers["Content-Length"] = str(len(body))
+                        message = {**message, "body": body}
+                await send(start)
+                await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+class StaticPayload:
+    """A JSON body serialized once, with lazily built compressed variants and their strong ETags."""
+
+    def __init__(self, content: Any):
+        self.body = dumps(content)
+        self._digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self._variants: dict[str | None, bytes] = {None: self.body}
+
+    def etag(self, encoding: str | None = None) -> str:
+        return f'"{self._digest}-{encoding}"' if encoding else f'"{self._digest}"'
+
+    def not_modified(self, if_none_match: str | None) -> bool:
+        """Whether the client already holds some representation of this payload."""
+        if not if_none_match:
+            return False
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or any(t.strip('"').split("-")[0] == self._digest for t in tags)
+
+    def response(self, if_none_match: str | None = None, accept_encoding: str | None = None) -> Response:
+        encoding = choose_encoding(accept_encoding or "") if len(self.body) >= COMPRESS_MIN_BYTES else None
+        headers = {"ETag": self.etag(encoding), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if self.not_modified(if_none_match):
+            return Response(status_code=304, headers=headers)
+        if encoding not in self._variants:
+            self._variants[encoding] = compress(self.body, encoding, best=True)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self._variants[encoding], media_type="application/json", headers=headers)
@@ -0,0 +1,39 @@
+"""Request-level latency budget shared by every stage of the optimize pipeline."""
+
+import time
+from collections.abc import Callable
+
+
+class Deadline:
+    """A point in time by which the whole request must answer, plus the degradations applied to meet it.
+
+    A deadline of None is unbounded: every stage gets `None` as its timeout and nothing degrades.
+    """
+
+    def __init__(self, seconds: float | None = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._at = clock() + seconds if seconds is not None else None
+        self.degradations: list[str] = []
+
+    @classmethod
+    def from_ms(cls, ms: int | None) -> "Deadline":
+        return cls(ms / 1000 if ms is not None else None)
+
+    @property
+    def bounded(self) -> bool:
+        return self._at is not None
+
+    def remaining(self) -> float:
+        if self._at is None:
+            return float("inf")
+        return max(0.0, self._at - self._clock())
+
+    def share(self, fraction: float) -> float | None:
+        """Timeout for a stage entitled to `fraction` of the remaining budget (None when unbounded)."""
+        if self._at is None:
+            return None
+        return self.remaining() * fraction
+
+    def degrade(self, what: str) -> None:
+        if what not in self.degradations:
+            self.degradations.append(what)
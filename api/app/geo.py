@@ -3,10 +3,12 @@
 import math
 
 
+EARTH_RADIUS_MILES = 3959.0
+
+
 def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate distance in miles between two lat/lng points."""
-    R = 3959  # Earth radius in miles
     dlat = math.radians(lat2 - lat1)
     dlng = math.radians(lng2 - lng1)
     a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
-    return R * 2 * math.asin(math.sqrt(a))
+    return EARTH_RADIUS_MILES * 2 * math.asin(math.sqrt(a))
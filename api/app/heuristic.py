@@ -0,0 +1,78 @@
+"""Fast local assignment heuristic: the doc's 'hard filter + reservation-aware greedy' in milliseconds."""
+
+from .geo import haversine_miles
+from .models import Ride, Vehicle, VehicleStatus, RouteAssignment
+
+
+PRIORITY_RANK = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+
+# Penalty weights, in miles, so they trade off directly against deadhead distance
+LOAD_PENALTY_MILES = 1.5  # per ride already on the vehicle (Goldilocks / load balancing)
+RESERVATION_PENALTY_MILES = 4.0  # using a vehicle that a still-pending ride can't do without
+
+
+def is_eligible(ride: Ride, vehicle: Vehicle) -> bool:
+    """Hard feasibility filter: available, and fits the ride's passengers and luggage."""
+    return (
+        vehicle.status == VehicleStatus.AVAILABLE
+        and ride.passenger_count <= vehicle.capacity
+        and ride.luggage_count <= vehicle.luggage_capacity
+    )
+
+
+def greedy_assign(rides: list[Ride], vehicles: list[Vehicle]) -> list[RouteAssignment]:
+    """Assign every ride with a reservation-aware greedy pass.
+
+    Rides with the fewest eligible vehicles go first (then by priority and pickup time), each to the
+    vehicle with the lowest deadhead from its current route end plus load and reservation penalties.
+    Each route is then ordered by priority and time window. Rides no vehicle can serve go to the
+    largest available vehicle rather than being left unassigned.
+    """
+    available = [v for v in vehicles if v.status == VehicleStatus.AVAILABLE]
+    if not available:
+        return []
+
+    eligible = {r.id: [v for v in available if is_eligible(r, v)] for r in rides}
+    order = sorted(
+        rides,
+        key=lambda r: (len(eligible[r.id]) or len(available) + 1, PRIORITY_RANK.get(r.priority.value, 3), r.time_window_start),
+    )
+
+    # How many not-yet-placed rides each vehicle is the sole option for
+    sole_option: dict[str, int] = {v.id: 0 for v in available}
+    for r in rides:
+        if len(eligible[r.id]) == 1:
+            sole_option[eligible[r.id][0].id] += 1
+
+    routes: dict[str, list[Ride]] = {v.id: [] for v in available}
+    ends: dict[str, tuple[float, float]] = {v.id: (v.current_lat, v.current_lng) for v in available}
+    largest = max(available, key=lambda v: (v.capacity, v.luggage_capacity))
+
+    for ride in order:
+        candidates = eligible[ride.id]
+        if len(candidates) == 1:
+            sole_option[candidates[0].id] -= 1
+        if not candidates:
+            chosen = largest
+        else:
+            def cost(v: Vehicle) -> float:
+                lat, lng = ends[v.id]
+                deadhead = haversine_miles(lat, lng, ride.pickup_lat, ride.pickup_lng)
+                reserved = RESERVATION_PENALTY_MILES if sole_option[v.id] > 0 and len(candidates) > 1 else 0.0
+                return deadhead + LOAD_PENALTY_MILES * len(routes[v.id]) + reserved
+
+            chosen = min(candidates, key=cost)
+        routes[chosen.id].append(ride)
+        ends[chosen.id] = (ride.dropoff_lat, ride.dropoff_lng)
+
+    assignments = []
+    for v in available:
+        route = sorted(routes[v.id], key=lambda r: (PRIORITY_RANK.get(r.priority.value, 3), r.time_window_start))
+        if not route:
+            continue
+        assignments.append(RouteAssignment(
+            vehicle_id=v.id,
+            ride_ids_in_order=[r.id for r in route],
+            reasoning=f"Local heuristic: nearest eligible vehicle for {len(route)} ride(s), ordered by priority then pickup time.",
+        ))
+    return assignments
@@ -0,0 +1,180 @@
+"""Async job queue for optimization runs: bounded queue, fixed worker pool, poll + SSE access."""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+
+from .metrics import metrics
+from .models import OptimizeRequest
+from .scheduler import DEFAULT_TENANT
+
+
+JOB_WORKERS = int(os.environ.get("OPTIMIZE_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("OPTIMIZE_JOB_QUEUE_SIZE", "16"))
+JOB_RETAIN = int(os.environ.get("OPTIMIZE_JOB_RETAIN", "256"))  # finished jobs kept for polling
+
+# Used for Retry-After until we have observed some real job durations
+DEFAULT_JOB_SECONDS = 20.0
+
+Runner = Callable[[OptimizeRequest, str], AsyncIterator[dict]]  # (request, tenant) -> events
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity. `retry_after` is a whole number of seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Optimization queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    id: str
+    request: OptimizeRequest
+    tenant: str = DEFAULT_TENANT
+    status: str = "queued"  # queued | running | succeeded | failed
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+    events: list[dict] = field(default_factory=list)
+    result: dict | None = None
+    error: str | None = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def emit(self, event: dict) -> None:
+        self.events.append(event)
+        # Wake every SSE follower, then re-arm for the next event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def summary(self) -> dict:
+        now = time.monotonic()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "wait_seconds": round((self.started_at or now) - self.submitted_at, 3),
+            "run_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Bounded FIFO of optimization jobs drained by a fixed number of asyncio workers.
+
+    Workers are started lazily on the first submit so the queue binds to the serving event loop.
+    """
+
+    def __init__(self, runner: Runner, workers: int = JOB_WORKERS, maxsize: int = JOB_QUEUE_SIZE, retain: int = JOB_RETAIN):
+        self.runner = runner
+        self.workers = workers
+        self.maxsize = maxsize
+        self.retain = retain
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self._queue: asyncio.Queue[Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._running = 0
+        self._avg_run_seconds = DEFAULT_JOB_SECONDS
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def _ensure_workers(self) -> asyncio.Queue[Job]:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._running = 0
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        return self._queue
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a queue slot frees up, from the recent mean job duration."""
+        return max(1, math.ceil(self._avg_run_seconds / max(self.workers, 1)))
+
+    def submit(self, request: OptimizeRequest, tenant: str = DEFAULT_TENANT) -> Job:
+        queue = self._ensure_workers()
+        job = Job(id=uuid.uuid4().hex[:12], request=request, tenant=tenant)
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.incr("jobs_rejected")
+            raise QueueFullError(self.retry_after()) from None
+        self.jobs[job.id] = job
+        self._evict()
+        job.emit({"type": "job", "status": "queued"})
+        metrics.incr("jobs_submitted")
+        metrics.set_gauge("jobs_queue_depth", queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def _evict(self) -> None:
+        finished = [jid for jid, j in self.jobs.items() if j.done]
+        for jid in finished[: max(0, len(self.jobs) - self.retain)]:
+            del self.jobs[jid]
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            try:
+                await self._run(job)
+            finally:
+                queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.started_at = time.monotonic()
+        job.status = "running"
+        self._running += 1
+        metrics.observe("jobs_wait_seconds", job.started_at - job.submitted_at)
+        metrics.set_gauge("jobs_queue_depth", self.depth)
+        metrics.set_gauge("jobs_running", self._running)
+        job.emit({"type": "job", "status": "running"})
+        try:
+            async for event in self.runner(job.request, job.tenant):
+                if event.get("type") == "result":
+                    job.result = event["data"]
+                elif event.get("type") == "error":
+                    job.error = event.get("message")
+                job.emit(event)
+            job.status = "failed" if job.result is None else "succeeded"
+            if job.status == "failed" and job.error is None:
+                job.error = "Optimization finished without a result"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            job.emit({"type": "error", "message": job.error})
+        finally:
+            job.finished_at = time.monotonic()
+            run_seconds = job.finished_at - job.started_at
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+            self._running -= 1
+            metrics.observe("jobs_run_seconds", run_seconds)
+            metrics.incr("jobs_completed", status=job.status)
+            metrics.set_gauge("jobs_running", self._running)
+            job.emit({"type": "job", "status": job.status})
+
+    async def follow(self, job: Job) -> AsyncIterator[dict]:
+        """Replay a job's events so far, then yield new ones until it finishes."""
+        sent = 0
+        while True:
+            changed = job._changed
+            while sent < len(job.events):
+                yield job.events[sent]
+                sent += 1
+            if job.done:
+                return
+            await changed.wait()
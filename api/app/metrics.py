@@ -0,0 +1,92 @@
+"""In-process metrics registry (counters, gauges, histograms) exposed at /metrics."""
+
+from collections import deque
+
+
+def _key(name: str, labels: dict[str, str]) -> str:
+    """Render a metric name plus labels as a flat key, e.g. `jobs_completed{status=failed}`."""
+    if not labels:
+        return name
+    rendered = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+class _Histogram:
+    """Running count/sum/max plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def _percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self._percentile(0.5), 4),
+            "p95": round(self._percentile(0.95), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._histograms: dict[str, _Histogram] = {}
+
+    def incr(self, name: str, value: float = 1, **labels: str) -> None:
+        key = _key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = _key(name, labels)
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = _Histogram()
+        hist.observe(value)
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def gauge(self, name: str, **labels: str) -> float:
+        return self._gauges.get(_key(name, labels), 0)
+
+    def forget(self, **labels: str) -> None:
+        """Drop every series carrying all of these labels (e.g. an evicted tenant's)."""
+        wanted = {f"{k}={v}" for k, v in labels.items()}
+        for series in (self._counters, self._gauges, self._histograms):
+            for key in [k for k in series if k.endswith("}") and wanted <= set(k[k.index("{") + 1:-1].split(","))]:
+                del series[key]
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "histograms": {k: h.summary() for k, h in self._histograms.items()},
+        }
+
+    def reset(self) -> None:
+        self._counters.clear()
+        self._gauges.clear()
+        self._histograms.clear()
+
+
+metrics = Metrics()
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
 
 
@@ -64,7 +66,9 @@ class RouteAssignment(BaseModel):
     ride_ids_in_order: list[str]
     reasoning: str
     polyline: list[list[float]] = []  # [[lat, lng], ...] for map rendering
+    encoded_polyline: str = ""  # Google encoded polyline instead, when polyline_format="encoded"
     route_miles: float = 0.0
+    locally_improved: bool = False  # re-sequenced by the local-search pass after planning
 
 
 class OptimizationResult(BaseModel):
@@ -73,11 +77,49 @@ class OptimizationResult(BaseModel):
     unassigned_rides: list[str] = []
 
 
-class OptimizeRequest(BaseModel):
+class OptimizeOptions(BaseModel):
+    deadline_ms: int | None = Field(default=None, gt=0)  # overall latency budget; also settable via X-Deadline-Ms
+    speculative: bool = False  # race Claude against the local heuristic, keep the better plan
+    output_format: Literal["full", "compact"] = "full"  # compact: index-only plan, reasoning via /explain
+    model_tier: Literal["auto", "fast", "standard", "deep"] = "auto"  # auto: chosen from problem difficulty
+    thinking_budget: int | None = Field(default=None, ge=1024)  # overrides the tier's thinking budget
+    # lazy: miles only; geometry from /routes/{run_id}/{vehicle_id}/polyline (eager where the route store is off)
+    polylines: Literal["eager", "lazy"] = "eager"
+    polyline_format: Literal["points", "encoded"] = "points"  # encoded: Google polyline strings in encoded_polyline
+    zoom: int | None = Field(default=None, ge=0, le=22)  # simplify polylines for this map zoom; None sends full resolution
+
+
+class OptimizeRequest(OptimizeOptions):
     rides: list[Ride]
     vehicles: list[Vehicle]
 
 
+class IngestLine(BaseModel):
+    """One line of an /optimize-ndjson upload: exactly one of ride, vehicle or options."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    ride: Ride | None = None
+    vehicle: Vehicle | None = None
+    options: OptimizeOptions | None = None
+
+
+class LineError(BaseModel):
+    line: int  # 1-based line number in the upload
+    error: str
+
+
+class BatchOptimizeRequest(BaseModel):
+    requests: dict[str, OptimizeRequest]  # keyed by caller ID (e.g. operator account), 1-64 of [a-zA-Z0-9_-]
+
+
+class ExplainRequest(BaseModel):
+    rides: list[Ride]
+    vehicles: list[Vehicle]
+    vehicle_id: str
+    ride_ids_in_order: list[str]
+
+
 class OptimizeResponse(BaseModel):
     result: OptimizationResult
     prompt_used: str  # show the prompt for transparency
@@ -86,3 +128,19 @@ class OptimizeResponse(BaseModel):
     naive_violations: int = 0
     optimized_violations: int = 0
     naive_assignments: list[RouteAssignment] = []
+    degradations: list[str] = []  # e.g. skipped_drive_times, haversine_miles, road_matrix_capped, naive_plan
+    plan_source: Literal["llm", "heuristic", "naive", "mip", "matching"] = "llm"
+    plan_scores: dict[str, float] = {}  # speculative mode: score per candidate plan (lower is better)
+    repairs: dict[str, int] = {}  # local fixes applied to Claude's plan, e.g. {"inserted_rides": 1}
+    model_policy: dict = {}  # tier, model, thinking_budget, max_tokens, reason
+    local_search: dict = {}  # miles_saved, per-pass savings, routes_changed, elapsed_ms
+    solver: dict = {}  # MIP mode: status (optimal | time_limit | no_incumbent), objective, mip_gap, seconds
+    run_id: str = ""  # key for on-demand route geometry under /routes/{run_id}/...; empty if runs aren't kept
+    rejected_lines: list[LineError] = []  # NDJSON upload: lines left out of the batch (first NDJSON_MAX_ERRORS)
+    rejected_line_count: int = 0
+
+
+class PrefetchRequest(BaseModel):
+    plan: Literal["optimized", "naive"] = "optimized"
+    viewport: tuple[float, float, float, float] | None = None  # south, west, north, east
+    vehicle_ids: list[str] = []  # fetched first, e.g. the selected vehicle
@@ -0,0 +1,142 @@
+"""Client-side protection for upstream APIs: token-bucket rate limiting, retry budgets, circuit breaking."""
+
+import asyncio
+import random
+import time
+from collections.abc import Callable
+
+from .metrics import metrics
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second refill, bursts of up to `capacity`.
+
+    `acquire()` waits (without holding the event loop) until a token is available. A call can
+    cost more than one token, e.g. one per Distance Matrix element.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock: asyncio.Lock | None = None
+        self._lock_loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        """The waiters' lock for the running event loop, made there on first use (buckets are module globals)."""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, cost: float = 1) -> bool:
+        self._refill()
+        cost = min(cost, self.capacity)  # an oversized call waits for a full bucket, not forever
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    async def acquire(self, cost: float = 1) -> None:
+        # The lock keeps waiters FIFO so a burst drains at exactly `rate`
+        async with self._get_lock():
+            if self.try_acquire(cost):
+                return
+            metrics.incr("upstream_throttled", endpoint=self.name)
+            while not self.try_acquire(cost):
+                await asyncio.sleep((min(cost, self.capacity) - self.tokens) / self.rate)
+
+
+class RetryBudget:
+    """Per-request allowance of retries, bounded by attempt count and total elapsed seconds."""
+
+    def __init__(self, max_retries: int, max_seconds: float, base_delay: float = 0.2, clock: Callable[[], float] = time.monotonic):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.retries = 0
+        self._clock = clock
+        self._deadline = clock() + max_seconds
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self._deadline - self._clock())
+
+    def next_delay(self) -> float | None:
+        """Consume one retry and return a full-jitter backoff delay, or None if the budget is spent."""
+        if self.retries >= self.max_retries:
+            return None
+        delay = random.uniform(0, self.base_delay * 2 ** self.retries)
+        if delay >= self.remaining_seconds():
+            return None
+        self.retries += 1
+        return delay
+
+
+class CircuitBreaker:
+    """Closed → open after `failure_threshold` consecutive failures; half-open probe after `reset_seconds`."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.state = self.CLOSED
+        self._clock = clock
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("upstream_breaker_state", self._GAUGE[self.state], endpoint=self.name)
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            metrics.incr("upstream_breaker_transitions", endpoint=self.name, to=state)
+            self._publish()
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now. In half-open state only a single probe is let through."""
+        if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._transition(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        metrics.incr("upstream_short_circuited", endpoint=self.name)
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+            self._transition(self.OPEN)
+
+    def abandon(self) -> None:
+        """Release a half-open probe slot without recording an outcome (e.g. the caller was cancelled)."""
+        self._probe_in_flight = False
+
+    def reset(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self._transition(self.CLOSED)
@@ -0,0 +1,245 @@
+"""Cached road distances between problem points, and a route-mileage evaluator built on them.
+
+Legs are fetched from the Distance Matrix API in requests of at most 100 elements (and at most
+ROAD_MATRIX_MAX_ELEMENTS per call; past that, each origin's nearest legs first) and kept in a process-wide LRU cache keyed by rounded
+coordinates, so repeated optimizations of the same scenario (and the prompt's drive-time context)
+reuse them. A request only needs:
+
+    (vehicle positions + dropoffs) × pickups   — every possible deadhead leg
+    pickup → dropoff                           — each ride's own leg
+
+MileageEvaluator sums a route's legs from the cache, using haversine for any leg we don't have,
+so plan mileage needs no Directions calls. With eager polylines, Directions is called for the
+geometry anyway and its per-leg road distances land in the same cache (LegCache.put_route), so
+those routes are priced without the matrix; it is only fetched for lazy polylines and for
+scoring local-search moves.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+
+from .deadline import Deadline
+from .directions import RouteGeometry, _get_api_key, get_distance_matrix
+from .geo import haversine_miles
+from .metrics import metrics
+from .models import Ride, Vehicle, RouteAssignment
+
+
+Point = tuple[float, float]
+
+MIN_STAGE_SECONDS = 0.5  # matches optimizer: too little time left to start the fetch
+
+ROAD_MATRIX_CACHE_SIZE = int(os.environ.get("ROAD_MATRIX_CACHE_SIZE", "100000"))  # legs
+# Most elements one call may request (elements are billed, and requests are rate limited); bigger
+# problems fetch the legs most likely to be driven and evaluate the rest with haversine
+ROAD_MATRIX_MAX_ELEMENTS = int(os.environ.get("ROAD_MATRIX_MAX_ELEMENTS", "2500"))
+COORD_DECIMALS = 5  # ~1 m; points closer than this share cache entries
+# Distance Matrix allows 25 origins, 25 destinations and 100 elements per request; 10 × 10 fits all three
+BLOCK_SIDE = 10
+MAX_SIDE = 25
+
+
+def _key(p: Point) -> Point:
+    return round(p[0], COORD_DECIMALS), round(p[1], COORD_DECIMALS)
+
+
+class LegCache:
+    """LRU of (origin, destination) → (miles, minutes)."""
+
+    def __init__(self, maxsize: int = ROAD_MATRIX_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._legs: OrderedDict[tuple[Point, Point], tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._legs)
+
+    def get(self, origin: Point, destination: Point) -> tuple[float, float] | None:
+        key = (_key(origin), _key(destination))
+        leg = self._legs.get(key)
+        if leg is not None:
+            self._legs.move_to_end(key)
+        return leg
+
+    def put(self, origin: Point, destination: Point, miles: float, minutes: float) -> None:
+        key = (_key(origin), _key(destination))
+        self._legs[key] = (miles, minutes)
+        self._legs.move_to_end(key)
+        while len(self._legs) > self.maxsize:
+            self._legs.popitem(last=False)
+
+    def put_route(self, waypoints: list[Point], route: RouteGeometry) -> None:
+        """Cache a Directions route's legs between consecutive waypoints; straight-line legs are skipped."""
+        for origin, destination, miles, minutes in zip(waypoints, waypoints[1:], route.leg_miles, route.leg_minutes):
+            if minutes is not None:
+                self.put(origin, destination, miles, minutes)
+
+    def clear(self) -> None:
+        self._legs.clear()
+
+
+leg_cache = LegCache()
+
+
+def _blocks(origins: list[Point], destinations: list[Point]):
+    for i in range(0, len(origins), BLOCK_SIDE):
+        for j in range(0, len(destinations), BLOCK_SIDE):
+            yield origins[i:i + BLOCK_SIDE], destinations[j:j + BLOCK_SIDE]
+
+
+def _exact_requests(legs: list[tuple[Point, Point]]) -> list[tuple[list[Point], list[Point]]]:
+    """Requests covering exactly `legs`, with no off-target elements.
+
+    Legs are grouped by whichever side has fewer distinct points (one origin × its destinations,
+    or its origins × one destination), MAX_SIDE per request.
+    """
+    by_origin: dict[Point, list[Point]] = {}
+    by_destination: dict[Point, list[Point]] = {}
+    for o, d in legs:
+        by_origin.setdefault(o, []).append(d)
+        by_destination.setdefault(d, []).append(o)
+    if len(by_destination) < len(by_origin):
+        return [
+            (os[i:i + MAX_SIDE], [d]) for d, os in by_destination.items() for i in range(0, len(os), MAX_SIDE)
+        ]
+    return [([o], ds[i:i + MAX_SIDE]) for o, ds in by_origin.items() for i in range(0, len(ds), MAX_SIDE)]
+
+
+def _most_useful(legs: list[tuple[Point, Point]], limit: int) -> list[tuple[Point, Point]]:
+    """The `limit` legs most likely to be driven: each origin's nearest destinations, round robin.
+
+    Routes mostly chain short hops, so every origin gets its closest few before any origin gets a
+    long one.
+    """
+    by_origin: dict[Point, list[tuple[float, Point]]] = {}
+    for o, d in legs:
+        by_origin.setdefault(o, []).append((haversine_miles(*o, *d), d))
+    ranked = []
+    for o, ds in by_origin.items():
+        ds.sort()
+        ranked.extend((rank, miles, o, d) for rank, (miles, d) in enumerate(ds))
+    ranked.sort()
+    return [(o, d) for _, _, o, d in ranked[:limit]]
+
+
+async def _fetch_block(origins: list[Point], destinations: list[Point]) -> int:
+    """One Distance Matrix call; caches every OK element. Returns how many legs were stored."""
+    matrix = await get_distance_matrix(origins, destinations)
+    metrics.incr("road_matrix_requests")
+    if not matrix:
+        return 0
+    stored = 0
+    for o, row in zip(origins, matrix):
+        for d, cell in zip(destinations, row):
+            if cell.get("ok", True):
+                leg_cache.put(o, d, cell["distance_miles"], cell["duration_minutes"])
+                stored += 1
+    metrics.incr("road_matrix_elements", len(origins) * len(destinations))
+    return stored
+
+
+def _dedupe(points: list[Point]) -> list[Point]:
+    return list(dict.fromkeys(_key(p) for p in points))
+
+
+async def _fetch_blocks(blocks: list[tuple[list[Point], list[Point]]]) -> None:
+    await asyncio.gather(*[_fetch_block(o, d) for o, d in blocks])
+
+
+async def _fetch_legs(legs: list[tuple[Point, Point]], max_elements: int | None) -> bool:
+    """Fetch `legs` exactly, or the most useful of them up to the cap. False when the cap cut them short."""
+    limit = ROAD_MATRIX_MAX_ELEMENTS if max_elements is None else max_elements
+    if len(legs) > limit:
+        metrics.incr("road_matrix_capped")
+        await _fetch_blocks(_exact_requests(_most_useful(legs, limit)))
+        return False
+    await _fetch_blocks(_exact_requests(legs))
+    return True
+
+
+async def ensure_matrix(origins: list[Point], destinations: list[Point], max_elements: int | None = None) -> bool:
+    """Make sure every origin → destination leg is cached, fetching only rows/columns with gaps.
+
+    At most `max_elements` (default ROAD_MATRIX_MAX_ELEMENTS) are requested; past that, only the
+    most useful missing legs are fetched and this returns False so the caller can record it.
+    """
+    limit = ROAD_MATRIX_MAX_ELEMENTS if max_elements is None else max_elements
+    origins, destinations = _dedupe(origins), _dedupe(destinations)
+    missing = [(o, d) for o in origins for d in destinations if leg_cache.get(o, d) is None]
+    if not missing:
+        return True
+    rows = list(dict.fromkeys(o for o, _ in missing))
+    cols = list(dict.fromkeys(d for _, d in missing))
+    if len(rows) * len(cols) <= limit:
+        # Gaps fill whole rows and columns (a cold cache): square blocks need the fewest requests
+        await _fetch_blocks(list(_blocks(rows, cols)))
+        return True
+    return await _fetch_legs(missing, limit)
+
+
+async def ensure_pairs(pairs: list[tuple[Point, Point]], max_elements: int | None = None) -> bool:
+    """Cache specific legs (e.g. each ride's pickup → dropoff), requesting only those legs.
+
+    Returns False when `max_elements` left some of them unfetched.
+    """
+    missing = list(dict.fromkeys((_key(o), _key(d)) for o, d in pairs if leg_cache.get(o, d) is None))
+    if not missing:
+        return True
+    return await _fetch_legs(missing, max_elements)
+
+
+class MileageEvaluator:
+    """Route miles from cached road legs (haversine for legs we don't have) for one problem."""
+
+    def __init__(self, rides: list[Ride], vehicles: list[Vehicle]):
+        self.rides = rides
+        self.vehicles = vehicles
+        self._ride_map = {r.id: r for r in rides}
+        self._vehicle_map = {v.id: v for v in vehicles}
+        self.fallback_legs = 0
+
+    def leg(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        """Miles between two points: cached road distance, else haversine. Same signature as haversine_miles."""
+        cached = leg_cache.get((lat1, lng1), (lat2, lng2))
+        if cached is not None:
+            return cached[0]
+        self.fallback_legs += 1
+        return haversine_miles(lat1, lng1, lat2, lng2)
+
+    def route_miles(self, assignment: RouteAssignment) -> float:
+        vehicle = self._vehicle_map.get(assignment.vehicle_id)
+        if not vehicle:
+            return 0.0
+        total = 0.0
+        lat, lng = vehicle.current_lat, vehicle.current_lng
+        for rid in assignment.ride_ids_in_order:
+            ride = self._ride_map.get(rid)
+            if not ride:
+                continue
+            total += self.leg(lat, lng, ride.pickup_lat, ride.pickup_lng)
+            total += self.leg(ride.pickup_lat, ride.pickup_lng, ride.dropoff_lat, ride.dropoff_lng)
+            lat, lng = ride.dropoff_lat, ride.dropoff_lng
+        return total
+
+    async def prepare(self, deadline: Deadline | None = None, share: float = 1.0) -> None:
+        """Fetch whatever deadhead and ride legs are not cached yet, within `share` of the deadline."""
+        if not _get_api_key():
+            return
+        timeout = deadline.share(share) if deadline else None
+        if timeout is not None and timeout < MIN_STAGE_SECONDS:
+            deadline.degrade("haversine_miles")
+            return
+        pickups = [(r.pickup_lat, r.pickup_lng) for r in self.rides]
+        ends = [(v.current_lat, v.current_lng) for v in self.vehicles] + [(r.dropoff_lat, r.dropoff_lng) for r in self.rides]
+        ride_legs = [((r.pickup_lat, r.pickup_lng), (r.dropoff_lat, r.dropoff_lng)) for r in self.rides]
+        # Each ride's own leg is always driven: it gets first call on the element budget
+        pair_budget = min(len(ride_legs), ROAD_MATRIX_MAX_ELEMENTS)
+        try:
+            complete = await asyncio.wait_for(asyncio.gather(
+                ensure_matrix(ends, pickups, ROAD_MATRIX_MAX_ELEMENTS - pair_budget), ensure_pairs(ride_legs, pair_budget),
+            ), timeout)
+        except TimeoutError:
+            deadline.degrade("haversine_miles")
+            return
+        if not all(complete) and deadline:
+            deadline.degrade("road_matrix_capped")
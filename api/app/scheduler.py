@@ -0,0 +1,265 @@
+"""Weighted-fair scheduling of Claude calls across tenants (operator accounts).
+
+Every LLM call first takes a slot from the shared scheduler. Waiting calls are ordered by
+start-time fair queueing: each call is tagged with a virtual start time and costs its estimated
+tokens divided by the tenant's weight, so a tenant firing many large requests only gets its
+weighted share while others are waiting. A call is also held back while its tenant is at its
+concurrency limit or out of tokens-per-minute quota; grants are reconciled with actual usage.
+
+Tenant IDs come from a request header, so their number is bounded: tenants named in
+TENANT_WEIGHTS are always tracked, other IDs only up to TENANT_MAX_TRACKED at a time. Past that,
+new IDs share the OTHER_TENANT entry. An unlisted tenant idle for TENANT_IDLE_SECONDS is evicted,
+along with its metric series, when its slot is needed.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from .metrics import metrics
+
+
+DEFAULT_TENANT = "default"
+OTHER_TENANT = "other"  # shared by unlisted tenants once TENANT_MAX_TRACKED of them are tracked
+TENANT_ID_RE = re.compile(r"^[a-zA-Z0-9_.-]{1,64}$")
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))  # Claude calls in flight, all tenants
+TENANT_MAX_CONCURRENCY = int(os.environ.get("TENANT_MAX_CONCURRENCY", "4"))
+TENANT_TOKENS_PER_MINUTE = int(os.environ.get("TENANT_TOKENS_PER_MINUTE", "400000"))
+TENANT_MAX_TRACKED = int(os.environ.get("TENANT_MAX_TRACKED", "64"))  # unlisted tenants; 0 = listed only
+TENANT_IDLE_SECONDS = float(os.environ.get("TENANT_IDLE_SECONDS", "300"))
+
+
+def parse_tenant_weights(spec: str) -> dict[str, float]:
+    """Parse `acme=4,beta=2` into {"acme": 4.0, "beta": 2.0}; tenants not listed weigh 1."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+TENANT_WEIGHTS = parse_tenant_weights(os.environ.get("TENANT_WEIGHTS", ""))
+
+
+@dataclass
+class _Waiter:
+    tenant: str
+    cost: int
+    start_tag: float
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class _Tenant:
+    name: str
+    weight: float
+    max_concurrency: int
+    tokens_per_minute: int
+    tokens: float
+    updated: float
+    inflight: int = 0
+    last_finish: float = 0.0  # virtual finish tag of the tenant's latest request
+    last_active: float = 0.0
+    waiters: deque[_Waiter] = field(default_factory=deque)
+
+    def refill(self, now: float) -> None:
+        rate = self.tokens_per_minute / 60.0
+        self.tokens = min(self.tokens_per_minute, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def seconds_until(self, cost: int) -> float:
+        """Time until the bucket can cover `cost` (requests larger than the whole quota wait for a full bucket)."""
+        needed = min(cost, self.tokens_per_minute) - self.tokens
+        return max(0.0, needed * 60.0 / self.tokens_per_minute)
+
+
+class Grant:
+    """A held LLM slot. Call `charge()` with the real token usage once it is known."""
+
+    def __init__(self, scheduler: "FairScheduler", tenant: str, estimate: int):
+        self._scheduler = scheduler
+        self.tenant = tenant
+        self.estimate = estimate
+        self._released = False
+
+    def charge(self, tokens: int) -> None:
+        """Settle the quota with actual usage (refunds or bills the difference from the estimate)."""
+        self._scheduler._settle(self.tenant, self.estimate - tokens)
+        metrics.incr("llm_tenant_tokens", tokens - self.estimate, tenant=self.tenant)
+        self.estimate = tokens
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self.tenant)
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tenant_concurrency: int = TENANT_MAX_CONCURRENCY,
+        tokens_per_minute: int = TENANT_TOKENS_PER_MINUTE,
+        weights: dict[str, float] | None = None,
+        max_tracked: int = TENANT_MAX_TRACKED,
+        idle_seconds: float = TENANT_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.weights = TENANT_WEIGHTS if weights is None else weights
+        self.max_tracked = max_tracked
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        self.tenants: dict[str, _Tenant] = {}
+        self.inflight = 0
+        self._vtime = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _listed(self, name: str) -> bool:
+        return name in self.weights or name in (DEFAULT_TENANT, OTHER_TENANT)
+
+    def _tenant(self, name: str) -> _Tenant:
+        """The entry for `name`, created on first use; OTHER_TENANT's if unlisted tenants are at their limit."""
+        if name not in self.tenants and not self._listed(name):
+            unlisted = sum(not self._listed(n) for n in self.tenants)
+            if unlisted >= self.max_tracked:
+                unlisted -= self._evict_idle()
+            if unlisted >= self.max_tracked:
+                name = OTHER_TENANT
+        if name not in self.tenants:
+            self.tenants[name] = _Tenant(
+                name=name,
+                weight=self.weights.get(name, 1.0),
+                max_concurrency=self.tenant_concurrency,
+                tokens_per_minute=self.tokens_per_minute,
+                tokens=self.tokens_per_minute,
+                updated=self._clock(),
+            )
+        return self.tenants[name]
+
+    def _evict_idle(self) -> int:
+        """Drop unlisted tenants with nothing queued or running, idle for idle_seconds. Returns how many."""
+        now = self._clock()
+        idle = [
+            t.name for t in self.tenants.values()
+            if not self._listed(t.name) and not t.waiters and not t.inflight
+            and now - t.last_active >= self.idle_seconds
+        ]
+        for name in idle:
+            del self.tenants[name]
+            metrics.forget(tenant=name)
+        return len(idle)
+
+    async def acquire(self, tenant: str, estimated_tokens: int) -> Grant:
+        """Wait for a fair turn, then return a Grant (release it when the call finishes)."""
+        t = self._tenant(tenant)
+        start = max(self._vtime, t.last_finish)
+        t.last_finish = start + estimated_tokens / t.weight
+        t.last_active = self._clock()
+        waiter = _Waiter(t.name, estimated_tokens, start, asyncio.get_running_loop().create_future(), t.last_active)
+        t.waiters.append(waiter)
+        self._publish(t)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted in the same tick we were cancelled: hand the slot back
+                waiter.future.result().release()
+            elif waiter in t.waiters:
+                t.waiters.remove(waiter)
+                self._publish(t)
+                self._dispatch()
+            raise
+        return waiter.future.result()
+
+    def slot(self, tenant: str, estimated_tokens: int) -> "_Slot":
+        """`async with scheduler.slot(tenant, tokens) as grant:` — acquire, then always release."""
+        return _Slot(self, tenant, estimated_tokens)
+
+    def _dispatch(self) -> None:
+        """Grant as many waiting calls as capacity allows, lowest virtual start tag first."""
+        now = self._clock()
+        while self.inflight < self.max_concurrency:
+            ready = []
+            retry_in = None
+            for t in self.tenants.values():
+                if not t.waiters or t.inflight >= t.max_concurrency:
+                    continue
+                t.refill(now)
+                head = t.waiters[0]
+                wait = t.seconds_until(head.cost)
+                if wait > 0:
+                    retry_in = wait if retry_in is None else min(retry_in, wait)
+                    continue
+                ready.append(t)
+            if not ready:
+                if retry_in is not None:
+                    self._wake_in(retry_in)
+                return
+            t = min(ready, key=lambda t: t.waiters[0].start_tag)
+            waiter = t.waiters.popleft()
+            self._vtime = max(self._vtime, waiter.start_tag)
+            t.tokens -= waiter.cost
+            t.inflight += 1
+            self.inflight += 1
+            metrics.observe("llm_queue_wait_seconds", now - waiter.enqueued_at, tenant=t.name)
+            metrics.incr("llm_tenant_tokens", waiter.cost, tenant=t.name)
+            waiter.future.set_result(Grant(self, t.name, waiter.cost))
+            self._publish(t)
+
+    def _wake_in(self, seconds: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(seconds, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _release(self, tenant: str) -> None:
+        t = self.tenants[tenant]
+        t.inflight -= 1
+        t.last_active = self._clock()
+        self.inflight -= 1
+        self._publish(t)
+        self._dispatch()
+
+    def _settle(self, tenant: str, refund: int) -> None:
+        t = self.tenants.get(tenant)
+        if t is None:  # charged after release and evicted since: nothing left to settle
+            return
+        t.refill(self._clock())
+        t.tokens = min(t.tokens_per_minute, t.tokens + refund)
+        if refund > 0:
+            self._dispatch()
+
+    def _publish(self, t: _Tenant) -> None:
+        metrics.set_gauge("llm_tenant_queue_depth", len(t.waiters), tenant=t.name)
+        metrics.set_gauge("llm_tenant_inflight", t.inflight, tenant=t.name)
+
+
+class _Slot:
+    def __init__(self, scheduler: FairScheduler, tenant: str, estimated_tokens: int):
+        self._args = (tenant, estimated_tokens)
+        self._scheduler = scheduler
+        self.grant: Grant | None = None
+
+    async def __aenter__(self) -> Grant:
+        self.grant = await self._scheduler.acquire(*self._args)
+        return self.grant
+
+    async def __aexit__(self, *exc) -> bool:
+        self.grant.release()
+        return False
+
+
+llm_scheduler = FairScheduler()
@@ -0,0 +1,49 @@
+"""Coalescing of streamed thinking tokens into fewer, larger SSE frames."""
+
+import os
+
+
+SSE_FLUSH_MS = float(os.environ.get("SSE_FLUSH_MS", "50"))  # 0 sends every thinking delta as its own frame
+SSE_FLUSH_BYTES = int(os.environ.get("SSE_FLUSH_BYTES", "1024"))
+
+
+class TokenCoalescer:
+    """Buffers thinking deltas; flushes once the oldest is `interval` seconds old or `max_bytes` are held.
+
+    Time-based flushes need the caller's help: due_in() says how long it may wait for the
+    next delta before calling flush() itself, so a stalled stream still delivers what it has.
+    """
+
+    def __init__(self, interval: float | None = None, max_bytes: int | None = None):
+        self.interval = SSE_FLUSH_MS / 1000 if interval is None else interval
+        self.max_bytes = SSE_FLUSH_BYTES if max_bytes is None else max_bytes
+        self._parts: list[str] = []
+        self._size = 0
+        self._since: float | None = None
+
+    def add(self, text: str, now: float) -> str | None:
+        """Buffer one delta; returns the coalesced text when a flush is due."""
+        if not text:
+            return None
+        self._parts.append(text)
+        self._size += len(text.encode())
+        if self._since is None:
+            self._since = now
+        if self._size >= self.max_bytes or now - self._since >= self.interval:
+            return self.flush()
+        return None
+
+    def due_in(self, now: float) -> float | None:
+        """Seconds until the buffered text is due (None when empty)."""
+        if self._since is None:
+            return None
+        return max(0.0, self._since + self.interval - now)
+
+    def flush(self) -> str | None:
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        self._since = None
+        return text
@@ -0,0 +1,203 @@
+"""Columnar (struct-of-arrays) containers for large ride and vehicle batches.
+
+A 50k-ride historical batch as a list of Ride models is one pydantic instance, one __dict__
+and a dozen boxed values per ride. RideColumns / VehicleColumns hold the same data as one
+typed array per field instead: floats in array('d'), ints in array('i'), enums as int8 codes
+into the enum's member order, and strings packed into one str with an offsets array. Columns
+are derived from the models' fields, so adding a field to Ride or Vehicle needs no change here.
+
+Numeric columns support the buffer protocol, so numpy views them without a copy
+(np.frombuffer(rides.pickup_lat)); the spatial index and the first-leg matcher take columns
+as well as model lists.
+"""
+
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from enum import Enum
+from itertools import accumulate, pairwise
+from operator import itemgetter
+from typing import Any, ClassVar, Self
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+
+from .models import Ride, Vehicle
+
+
+class StringColumn(Sequence[str]):
+    """Strings concatenated into one str, with offsets[i]:offsets[i + 1] the i-th value."""
+
+    __slots__ = ("_text", "_offsets")
+
+    def __init__(self, values: Iterable[str] = ()):
+        values = values if isinstance(values, list) else list(values)
+        self._text = "".join(values)
+        self._offsets = array("I" if len(self._text) < 2**32 else "q", accumulate(map(len, values), initial=0))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self._text
+        return (text[a:b] for a, b in pairwise(self._offsets))
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + self._text.__sizeof__() + self._offsets.__sizeof__()
+
+
+def _kind(annotation: Any) -> str | type[Enum]:
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return annotation
+    if annotation is float:
+        return "d"
+    if annotation is int:
+        return "i"
+    if annotation is str:
+        return "str"
+    raise TypeError(f"no column type for {annotation!r}")
+
+
+class Columns:
+    """Struct of arrays for one model class; subclasses name the model with `model=`."""
+
+    model: ClassVar[type[BaseModel]]
+    _adapter: ClassVar[TypeAdapter]
+    kinds: ClassVar[dict[str, str | type[Enum]]]  # field -> array typecode, "str", or the enum class
+    _defaults: ClassVar[dict[str, Any]]
+    _codes: ClassVar[dict[str, dict[Any, int]]]  # enum field -> {member or value: code}
+    _members: ClassVar[dict[str, tuple[Enum, ...]]]  # enum field -> members, indexed by code
+
+    def __init_subclass__(cls, model: type[BaseModel], **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.model = model
+        cls._adapter = TypeAdapter(list[model])
+        cls.kinds = {name: _kind(f.annotation) for name, f in model.model_fields.items()}
+        cls._defaults = {
+            name: f.default for name, f in model.model_fields.items() if f.default is not PydanticUndefined
+        }
+        cls._members = {name: tuple(kind) for name, kind in cls.kinds.items() if isinstance(kind, type)}
+        cls._codes = {
+            name: {key: i for i, m in enumerate(members) for key in (m, m.value)}
+            for name, members in cls._members.items()
+        }
+
+    def __init__(self, columns: dict[str, array | StringColumn]):
+        lengths = {len(c) for c in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"columns differ in length: {sorted(lengths)}")
+        self.columns = columns
+
+    def __getattr__(self, name: str):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sum(c.__sizeof__() for c in self.columns.values())
+
+    @classmethod
+    def of(cls, items: "Self | Sequence[BaseModel]") -> Self:
+        """`items` as columns: returned as-is if it already is, converted from models otherwise."""
+        return items if isinstance(items, cls) else cls.from_models(items)
+
+    @classmethod
+    def _column(cls, name: str, values: list) -> array | StringColumn:
+        kind = cls.kinds[name]
+        if kind == "str":
+            return StringColumn(values)
+        if isinstance(kind, type):
+            codes = cls._codes[name]
+            return array("b", [codes[v] for v in values])
+        return array(kind, values)
+
+    @classmethod
+    def from_models(cls, models: Sequence[BaseModel]) -> Self:
+        return cls({name: cls._column(name, [getattr(m, name) for m in models]) for name in cls.kinds})
+
+    @classmethod
+    def from_records(cls, records: Sequence[dict]) -> Self:
+        """Columns straight from JSON-decoded dicts, skipping per-row model validation.
+
+        Checks what the columns need: required fields present, numbers numeric, enum values
+        known, strings strings. Raises ValueError naming the first bad row and field.
+        """
+        columns = {}
+        for name, kind in cls.kinds.items():
+            if name in cls._defaults:
+                default = cls._defaults[name]
+                values = [r.get(name, default) for r in records]
+            else:
+                try:
+                    values = list(map(itemgetter(name), records))
+                except KeyError:
+                    values = [r.get(name, PydanticUndefined) for r in records]
+            try:
+                if kind == "str" and not all(type(v) is str for v in values):
+                    raise TypeError
+                columns[name] = cls._column(name, values)
+            except (TypeError, KeyError, OverflowError):
+                raise ValueError(cls._bad_row(name, values)) from None
+        return cls(columns)
+
+    @classmethod
+    def _bad_row(cls, name: str, values: list) -> str:
+        for i, v in enumerate(values):
+            if v is PydanticUndefined:
+                return f"row {i}: {name} is required"
+            try:
+                if cls.kinds[name] == "str" and type(v) is not str:
+                    raise TypeError
+                cls._column(name, [v])
+            except (TypeError, KeyError, OverflowError):
+                return f"row {i}: invalid {name}: {v!r}"
+        return f"invalid {name}"
+
+    def row(self, i: int) -> dict[str, Any]:
+        out = {}
+        for name in self.kinds:
+            value = self.columns[name][i]
+            out[name] = self._members[name][value] if name in self._members else value
+        return out
+
+    def __getitem__(self, i: int) -> BaseModel:
+        return self.model.model_construct(**self.row(i))
+
+    def __iter__(self) -> Iterator[BaseModel]:
+        return iter(self.to_models())
+
+    def to_models(self) -> list[BaseModel]:
+        """Back to models, through the model's compiled validator (faster than model_construct)."""
+        names = list(self.kinds)
+        fields = []
+        for name in names:
+            column = self.columns[name]
+            members = self._members.get(name)
+            fields.append([members[c] for c in column] if members else column)
+        return self._adapter.validate_python([dict(zip(names, values)) for values in zip(*fields)])
+
+    def code(self, name: str, member: Enum) -> int:
+        """The int8 code an enum field stores for `member`."""
+        return self._codes[name][member]
+
+    def member(self, name: str, i: int) -> Enum:
+        """Row i's value of an enum field."""
+        return self._members[name][self.columns[name][i]]
+
+
+class RideColumns(Columns, model=Ride):
+    pass
+
+
+class VehicleColumns(Columns, model=Vehicle):
+    pass
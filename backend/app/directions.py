@@ -1,101 +1,252 @@
 """Google Maps Directions + Distance Matrix integration with haversine fallback."""
 
+import asyncio
 import os
-import httpx
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
 from .geo import haversine_miles
+from .metrics import metrics
+from .polyline import as_points, decode_polyline
+from .resilience import CircuitBreaker, RetryBudget, TokenBucket
+
+if TYPE_CHECKING:
+    import httpx
+
+
+DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+# Per-attempt timeout; the retry budget caps how many retries one incoming request may spend
+# across all of its Google calls, and how long after the request started they may still happen
+REQUEST_TIMEOUT_SECONDS = 6.0
+CONNECT_TIMEOUT_SECONDS = 2.0
+MAX_RETRIES = int(os.environ.get("GOOGLE_MAPS_MAX_RETRIES", "6"))
+RETRY_BUDGET_SECONDS = float(os.environ.get("GOOGLE_MAPS_RETRY_BUDGET_SECONDS", "30"))
+
+# Directions takes an origin, a destination and up to 25 intermediate waypoints per request; longer
+# routes are split into segments of at most this many points, sharing their end/start point
+MAX_ROUTE_POINTS = 27
+ROUTE_SEGMENT_POINTS = min(int(os.environ.get("DIRECTIONS_SEGMENT_POINTS", str(MAX_ROUTE_POINTS))), MAX_ROUTE_POINTS)
+ROUTE_CACHE_SIZE = int(os.environ.get("DIRECTIONS_CACHE_SIZE", "1024"))  # segments
+
+# Google statuses worth retrying; anything else (ZERO_RESULTS, INVALID_REQUEST, ...) is a real answer
+_RETRYABLE_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+# One bucket + breaker per endpoint, shared by every request in the process
+_LIMITERS = {
+    "directions": TokenBucket("directions", rate=float(os.environ.get("GOOGLE_DIRECTIONS_QPS", "10")), capacity=10),
+    # Google limits Distance Matrix by elements, not requests: one token per origin × destination
+    "distance_matrix": TokenBucket(
+        "distance_matrix", rate=float(os.environ.get("GOOGLE_DISTANCE_MATRIX_EPS", "500")), capacity=500
+    ),
+}
+_BREAKERS = {
+    name: CircuitBreaker(name, failure_threshold=5, reset_seconds=30)
+    for name in _LIMITERS
+}
+
+
+class _RetryableError(Exception):
+    pass
+
+
+_retry_budget: ContextVar[RetryBudget | None] = ContextVar("google_retry_budget", default=None)
+
+
+def start_retry_budget() -> RetryBudget:
+    """Open a fresh retry budget for the request (or job) running in this context.
+
+    Every Google call made from this context, including tasks it spawns afterwards, draws on it.
+    """
+    budget = RetryBudget(MAX_RETRIES, RETRY_BUDGET_SECONDS)
+    _retry_budget.set(budget)
+    return budget
 
 
 def _get_api_key() -> str | None:
     return os.environ.get("GOOGLE_MAPS_API_KEY")
 
 
+def __getattr__(name: str):
+    # httpx loads on the first Google call, not at cold start; `directions.httpx` still resolves
+    if name == "httpx":
+        import httpx
+        return httpx
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_client: "httpx.AsyncClient | None" = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_client() -> "httpx.AsyncClient":
+    """One pooled client per event loop, so concurrent calls reuse connections instead of handshaking."""
+    import httpx
+
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS))
+        _client_loop = loop
+    return _client
+
+
+async def _fetch_json(endpoint: str, url: str, params: dict[str, str], cost: float = 1) -> dict | None:
+    """GET a Google Maps endpoint through its rate limiter and circuit breaker.
+
+    Retries transient failures with jittered backoff inside the current request's retry budget
+    (a budget of its own when called outside one). Returns None when the breaker is open or
+    the budget is exhausted — callers fall back.
+    """
+    breaker = _BREAKERS[endpoint]
+    if not breaker.allow():
+        return None
+
+    import httpx
+
+    budget = _retry_budget.get() or RetryBudget(MAX_RETRIES, RETRY_BUDGET_SECONDS)
+    while True:
+        await _LIMITERS[endpoint].acquire(cost)
+        try:
+            resp = await _get_client().get(url, params=params)
+            if resp.status_code >= 500 or resp.status_code == 429:
+                raise _RetryableError(f"HTTP {resp.status_code}")
+            data = resp.json()
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+            if data.get("status") in _RETRYABLE_STATUSES:
+                raise _RetryableError(data["status"])
+            breaker.record_success()
+            return data
+        except (httpx.HTTPError, ValueError, _RetryableError):
+            delay = budget.next_delay()
+            if delay is None:
+                metrics.incr("upstream_failures", endpoint=endpoint)
+                breaker.record_failure()
+                return None
+            metrics.incr("upstream_retries", endpoint=endpoint)
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception:
+            # Anything unforeseen still counts against the endpoint, so a half-open probe can't leak
+            metrics.incr("upstream_failures", endpoint=endpoint)
+            breaker.record_failure()
+            raise
+
+
 def _decode_polyline(encoded: str) -> list[list[float]]:
     """Decode a Google Maps encoded polyline string into [[lat, lng], ...]."""
-    points = []
-    index = 0
-    lat = 0
-    lng = 0
-    while index < len(encoded):
-        # Decode latitude
-        shift = 0
-        result = 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result |= (b & 0x1F) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        lat += (~(result >> 1) if (result & 1) else (result >> 1))
-
-        # Decode longitude
-        shift = 0
-        result = 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result |= (b & 0x1F) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        lng += (~(result >> 1) if (result & 1) else (result >> 1))
-
-        points.append([lat / 1e5, lng / 1e5])
-    return points
+    return as_points(decode_polyline(encoded))
 
 
-async def get_route_polyline(
-    waypoints: list[tuple[float, float]],
-) -> tuple[list[list[float]], float]:
-    """Get route polyline and distance (miles) for a sequence of waypoints.
+@dataclass
+class RouteGeometry:
+    polyline: list[list[float]]  # [[lat, lng], ...]
+    leg_miles: list[float]  # one per consecutive waypoint pair
+    leg_minutes: list[float | None]  # None where the leg is a straight-line estimate
+    fallback: bool = False  # some or all of it is straight lines (Directions unavailable)
 
-    Returns (polyline_coords, total_miles).
-    Falls back to straight lines + haversine if API unavailable.
-    """
-    if len(waypoints) < 2:
-        return [[w[0], w[1]] for w in waypoints], 0.0
+    @property
+    def miles(self) -> float:
+        return sum(self.leg_miles)
+
+
+_route_cache: OrderedDict[tuple, RouteGeometry] = OrderedDict()
 
-    api_key = _get_api_key()
-    if not api_key:
-        return _straight_line_fallback(waypoints)
 
-    origin = f"{waypoints[0][0]},{waypoints[0][1]}"
-    destination = f"{waypoints[-1][0]},{waypoints[-1][1]}"
+def _straight_line_route(waypoints: list[tuple[float, float]]) -> RouteGeometry:
+    return RouteGeometry(
+        polyline=[[w[0], w[1]] for w in waypoints],
+        leg_miles=[haversine_miles(a[0], a[1], b[0], b[1]) for a, b in zip(waypoints, waypoints[1:])],
+        leg_minutes=[None] * (len(waypoints) - 1),
+        fallback=True,
+    )
+
+
+def _segments(waypoints: list[tuple[float, float]], size: int = ROUTE_SEGMENT_POINTS) -> list[list[tuple[float, float]]]:
+    """Split a route into pieces of at most `size` points; each piece starts where the last one ended."""
+    return [waypoints[i:i + size] for i in range(0, len(waypoints) - 1, size - 1)]
+
+
+async def _fetch_segment(waypoints: list[tuple[float, float]], api_key: str) -> RouteGeometry:
+    """One Directions request (origin, destination, intermediate waypoints), cached by its points."""
+    key = tuple((round(lat, 5), round(lng, 5)) for lat, lng in waypoints)
+    if key in _route_cache:
+        _route_cache.move_to_end(key)
+        return _route_cache[key]
 
     params: dict[str, str] = {
-        "origin": origin,
-        "destination": destination,
+        "origin": f"{waypoints[0][0]},{waypoints[0][1]}",
+        "destination": f"{waypoints[-1][0]},{waypoints[-1][1]}",
         "key": api_key,
     }
-
-    # Add intermediate waypoints if any
     if len(waypoints) > 2:
-        intermediate = "|".join(f"{w[0]},{w[1]}" for w in waypoints[1:-1])
-        params["waypoints"] = intermediate
+        params["waypoints"] = "|".join(f"{w[0]},{w[1]}" for w in waypoints[1:-1])
 
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(
-                "https://maps.googleapis.com/maps/api/directions/json",
-                params=params,
-            )
-            data = resp.json()
+        data = await _fetch_json("directions", DIRECTIONS_URL, params)
+        if not data or data.get("status") != "OK" or not data.get("routes"):
+            return _straight_line_route(waypoints)
+        route = data["routes"][0]
+        legs = route["legs"]
+        segment = RouteGeometry(
+            polyline=_decode_polyline(route["overview_polyline"]["points"]),
+            leg_miles=[leg["distance"]["value"] / 1609.344 for leg in legs],
+            leg_minutes=[leg["duration"]["value"] / 60 if "duration" in leg else None for leg in legs],
+        )
+    except Exception:
+        return _straight_line_route(waypoints)
 
-        if data.get("status") != "OK" or not data.get("routes"):
-            return _straight_line_fallback(waypoints)
+    _route_cache[key] = segment
+    while len(_route_cache) > ROUTE_CACHE_SIZE:
+        _route_cache.popitem(last=False)
+    return segment
 
-        route = data["routes"][0]
-        # Decode overview polyline
-        polyline = _decode_polyline(route["overview_polyline"]["points"])
 
-        # Sum leg distances
-        total_meters = sum(leg["distance"]["value"] for leg in route["legs"])
-        total_miles = total_meters / 1609.344
+async def get_route(waypoints: list[tuple[float, float]]) -> RouteGeometry:
+    """Road route through a sequence of waypoints, with per-leg miles and minutes.
 
-        return polyline, total_miles
+    Routes longer than one Directions request allows are split into segments, fetched
+    concurrently and stitched back together. A segment that fails is drawn as straight lines
+    with haversine legs; the rest of the route keeps its road geometry.
+    """
+    if len(waypoints) < 2:
+        return RouteGeometry([[w[0], w[1]] for w in waypoints], [], [])
+
+    api_key = _get_api_key()
+    if not api_key:
+        return _straight_line_route(waypoints)
+
+    segments = await asyncio.gather(*[_fetch_segment(seg, api_key) for seg in _segments(waypoints)])
+    polyline: list[list[float]] = []
+    for segment in segments:
+        points = segment.polyline
+        if polyline and points and points[0] == polyline[-1]:
+            points = points[1:]
+        polyline.extend(points)
+    return RouteGeometry(
+        polyline=polyline,
+        leg_miles=[m for s in segments for m in s.leg_miles],
+        leg_minutes=[m for s in segments for m in s.leg_minutes],
+        fallback=any(s.fallback for s in segments),
+    )
 
-    except Exception:
-        return _straight_line_fallback(waypoints)
+
+async def get_route_polyline(
+    waypoints: list[tuple[float, float]],
+) -> tuple[list[list[float]], float]:
+    """Get route polyline and distance (miles) for a sequence of waypoints.
+
+    Returns (polyline_coords, total_miles).
+    Falls back to straight lines + haversine if API unavailable.
+    """
+    route = await get_route(waypoints)
+    return route.polyline, route.miles
 
 
 async def get_distance_matrix(
@@ -104,7 +255,8 @@ async def get_distance_matrix(
 ) -> list[list[dict]] | None:
     """Get drive time + distance matrix. Returns None on failure (use haversine fallback).
 
-    Returns matrix[i][j] = {"distance_miles": float, "duration_minutes": float}
+    Returns matrix[i][j] = {"distance_miles": float, "duration_minutes": float, "ok": bool}
+    (ok is False for elements Google could not route; their distance/duration are 0).
     """
     api_key = _get_api_key()
     if not api_key:
@@ -114,18 +266,12 @@ async def get_distance_matrix(
     destinations_str = "|".join(f"{d[0]},{d[1]}" for d in destinations)
 
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(
-                "https://maps.googleapis.com/maps/api/distancematrix/json",
-                params={
-                    "origins": origins_str,
-                    "destinations": destinations_str,
-                    "key": api_key,
-                },
-            )
-            data = resp.json()
-
-        if data.get("status") != "OK":
+        data = await _fetch_json("distance_matrix", DISTANCE_MATRIX_URL, {
+            "origins": origins_str,
+            "destinations": destinations_str,
+            "key": api_key,
+        }, cost=len(origins) * len(destinations))
+        if not data or data.get("status") != "OK":
             return None
 
         matrix = []
@@ -133,28 +279,15 @@ async def get_distance_matrix(
             row_data = []
             for element in row["elements"]:
                 if element.get("status") != "OK":
-                    row_data.append({"distance_miles": 0, "duration_minutes": 0})
+                    row_data.append({"distance_miles": 0, "duration_minutes": 0, "ok": False})
                 else:
                     row_data.append({
                         "distance_miles": element["distance"]["value"] / 1609.344,
                         "duration_minutes": element["duration"]["value"] / 60,
+                        "ok": True,
                     })
             matrix.append(row_data)
         return matrix
 
     except Exception:
         return None
-
-
-def _straight_line_fallback(
-    waypoints: list[tuple[float, float]],
-) -> tuple[list[list[float]], float]:
-    """Fallback: straight lines between waypoints with haversine distance."""
-    coords = [[w[0], w[1]] for w in waypoints]
-    total = 0.0
-    for i in range(len(waypoints) - 1):
-        total += haversine_miles(
-            waypoints[i][0], waypoints[i][1],
-            waypoints[i + 1][0], waypoints[i + 1][1],
-        )
-    return coords, total
@@ -0,0 +1,209 @@
+"""Streaming NDJSON ingestion for large optimization requests.
+
+An upload is one JSON object per line, each holding exactly one of:
+
+    {"ride": {...}}       a Ride
+    {"vehicle": {...}}    a Vehicle
+    {"options": {...}}    OptimizeRequest's other fields (deadline_ms, speculative, ...), at most once
+
+Lines are validated one at a time, as the body arrives, with a single cached TypeAdapter, so
+the request is never buffered whole and a bad line costs only itself: it is recorded with its
+line number and left out of the batch. Accepted points go straight into grid indexes of
+vehicle positions, pickups and dropoffs; each new point queues the deadhead legs to its
+PREFETCH_NEIGHBORS nearest counterparts (vehicles and dropoffs lead to pickups), plus each
+ride's own leg. While
+the upload is still arriving, a background task fetches those legs into the shared road-matrix
+cache, within one ROAD_MATRIX_MAX_ELEMENTS budget for the whole upload, so the optimizer finds
+the legs routes are most likely to drive already cached when the last line lands.
+"""
+
+import asyncio
+import os
+from collections.abc import AsyncIterable
+
+from pydantic import TypeAdapter, ValidationError
+
+from .deadline import Deadline
+from .directions import _get_api_key
+from .models import IngestLine, LineError, OptimizeOptions, OptimizeRequest, Ride, Vehicle
+from .road_matrix import ROAD_MATRIX_MAX_ELEMENTS, Point, _key, ensure_pairs, leg_cache
+from .spatial import GridIndex
+
+
+NDJSON_MAX_LINE_BYTES = int(os.environ.get("NDJSON_MAX_LINE_BYTES", "65536"))  # longer lines are rejected unread
+NDJSON_MAX_ERRORS = 100  # line errors kept for the response; the rest are only counted
+PREFETCH_NEIGHBORS = 8  # deadhead legs queued per new point: routes mostly chain short hops
+
+_LINE = TypeAdapter(IngestLine)
+
+
+def _describe(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in e.errors(include_url=False)
+    )
+
+
+class NdjsonIngest:
+    """Rides, vehicles and options accepted so far from one NDJSON upload, plus its rejected lines."""
+
+    def __init__(self, prefetch_legs: bool | None = None):
+        self.rides: list[Ride] = []
+        self.vehicles: list[Vehicle] = []
+        self.options: OptimizeOptions | None = None
+        self.errors: list[LineError] = []
+        self.error_count = 0
+        self.lines = 0
+        self._ride_ids: set[str] = set()
+        self._vehicle_ids: set[str] = set()
+        # Keyed by rounded point, like the leg cache
+        self.vehicle_index = GridIndex()
+        self.pickup_index = GridIndex()
+        self.dropoff_index = GridIndex()
+        self.capped = False  # the element budget ran out before every queued leg was fetched
+        self._prefetch = bool(_get_api_key()) if prefetch_legs is None else prefetch_legs
+        self._prefetch_task: asyncio.Task | None = None
+        self._budget = ROAD_MATRIX_MAX_ELEMENTS  # elements the prefetch may still request
+        self._pending: dict[tuple[Point, Point], None] = {}  # queued, not yet looked at by the prefetch
+
+    def reject(self, line: int, error: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < NDJSON_MAX_ERRORS:
+            self.errors.append(LineError(line=line, error=error))
+
+    def add_line(self, line: int, raw: bytes) -> None:
+        """Validate one line and add what it holds, or record why not."""
+        if not raw.strip():
+            return
+        try:
+            item = _LINE.validate_json(raw)
+        except ValidationError as e:
+            self.reject(line, _describe(e))
+            return
+        held = [name for name in ("ride", "vehicle", "options") if getattr(item, name) is not None]
+        if len(held) != 1:
+            self.reject(line, "expected exactly one of ride, vehicle or options")
+        elif item.ride is not None:
+            if item.ride.id in self._ride_ids:
+                self.reject(line, f"duplicate ride id {item.ride.id}")
+                return
+            self._ride_ids.add(item.ride.id)
+            self.rides.append(item.ride)
+            self._add_ride(item.ride)
+        elif item.vehicle is not None:
+            if item.vehicle.id in self._vehicle_ids:
+                self.reject(line, f"duplicate vehicle id {item.vehicle.id}")
+                return
+            self._vehicle_ids.add(item.vehicle.id)
+            self.vehicles.append(item.vehicle)
+            self._add_start(self.vehicle_index, _key((item.vehicle.current_lat, item.vehicle.current_lng)))
+        elif self.options is not None:
+            self.reject(line, "options given more than once")
+        else:
+            self.options = item.options
+
+    def _add_ride(self, ride: Ride) -> None:
+        pickup = _key((ride.pickup_lat, ride.pickup_lng))
+        dropoff = _key((ride.dropoff_lat, ride.dropoff_lng))
+        self._add_start(self.dropoff_index, dropoff)  # before its own pickup: dropoff -> own pickup is never driven
+        if self._has_room():
+            self._pending[(pickup, dropoff)] = None
+            starts = self.vehicle_index.nearest(*pickup, k=PREFETCH_NEIGHBORS)
+            starts += self.dropoff_index.nearest(*pickup, k=PREFETCH_NEIGHBORS, predicate=dropoff.__ne__)
+            for start, _ in starts:
+                self._pending[(start, pickup)] = None
+        self.pickup_index.insert(pickup, *pickup)
+
+    def _add_start(self, index: GridIndex, start: Point) -> None:
+        """Index a vehicle position or dropoff, queueing its legs to the nearest pickups so far."""
+        if self._has_room():
+            for pickup, _ in self.pickup_index.nearest(*start, k=PREFETCH_NEIGHBORS):
+                self._pending[(start, pickup)] = None
+        index.insert(start, *start)
+
+    def _has_room(self) -> bool:
+        """Whether the prefetch wants more legs; once queued legs cover the budget, later points queue none."""
+        if not self._prefetch:
+            return False
+        if len(self._pending) >= self._budget:
+            self.capped = True
+            return False
+        return True
+
+    async def feed(self, chunks: AsyncIterable[bytes]) -> None:
+        """Consume the body as it arrives, splitting it into lines across chunk boundaries."""
+        try:
+            await self._feed(chunks)
+        except BaseException:
+            self.cancel()  # client went away mid-upload: nobody will use the legs
+            raise
+
+    async def _feed(self, chunks: AsyncIterable[bytes]) -> None:
+        pending = b""
+        skipping = False  # inside an over-long line: drop bytes until its newline
+        async for chunk in chunks:
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for raw in lines:
+                self.lines += 1
+                if skipping:
+                    skipping = False
+                elif len(raw) > NDJSON_MAX_LINE_BYTES:
+                    self.reject(self.lines, f"line longer than {NDJSON_MAX_LINE_BYTES} bytes")
+                else:
+                    self.add_line(self.lines, raw)
+            if len(pending) > NDJSON_MAX_LINE_BYTES:
+                if not skipping:
+                    self.reject(self.lines + 1, f"line longer than {NDJSON_MAX_LINE_BYTES} bytes")
+                skipping = True
+                pending = b""
+            self._kick_prefetch()
+            await asyncio.sleep(0)  # let the prefetch task issue its requests between chunks
+        if pending and not skipping:
+            self.lines += 1
+            self.add_line(self.lines, pending)
+        elif skipping:
+            self.lines += 1
+        self._kick_prefetch()
+
+    def _kick_prefetch(self) -> None:
+        if self._pending and (self._prefetch_task is None or self._prefetch_task.done()):
+            self._prefetch_task = asyncio.create_task(self._prefetch_legs())
+
+    async def _prefetch_legs(self) -> None:
+        """Fetch the queued legs that aren't cached yet, until the upload's element budget is spent.
+
+        Runs until it has caught up with the upload, taking legs in the order their points arrived.
+        """
+        while self._pending:
+            legs, self._pending = list(self._pending), {}
+            missing = [leg for leg in legs if leg_cache.get(*leg) is None]
+            if len(missing) > self._budget:
+                self.capped = True
+                missing = missing[:self._budget]
+            if missing:
+                self._budget -= len(missing)
+                await ensure_pairs(missing)
+
+    async def settle(self, deadline: Deadline, share: float) -> None:
+        """Give the leg prefetch up to `share` of the deadline to finish, then stop it."""
+        task = self._prefetch_task
+        if task is not None and not task.done():
+            try:
+                await asyncio.wait_for(task, deadline.share(share))
+            except TimeoutError:
+                pass
+        if self.capped:
+            deadline.degrade("road_matrix_capped")
+
+    def cancel(self) -> None:
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+
+    def request(self) -> OptimizeRequest:
+        """The accepted lines as an OptimizeRequest (already validated: nothing is re-checked)."""
+        options = self.options or OptimizeOptions()
+        return OptimizeRequest.model_construct(rides=self.rides, vehicles=self.vehicles, **dict(options))
+
+    def rejected(self) -> dict:
+        return {"rejected_lines": self.errors, "rejected_line_count": self.error_count}
@@ -1,17 +1,120 @@
 """Claude-powered route optimizer."""
 
-import json
 import asyncio
-import anthropic
+import logging
+import os
+from dataclasses import dataclass, asdict, replace
 from .models import Ride, Vehicle, OptimizationResult, RouteAssignment
 from .geo import haversine_miles
-from .directions import get_route_polyline, get_distance_matrix
-
+from .directions import get_route
+from .deadline import Deadline
+from .heuristic import greedy_assign, is_eligible
+from .metrics import metrics
+from .repair import loads_lenient, repair_plan
+from .local_search import LOCAL_SEARCH_BUDGET_MS, DeadheadCache, improve_routes
+from .road_matrix import MileageEvaluator, ensure_matrix, leg_cache
+from .route_store import build_waypoints, route_store
+from .polyline import GeometryOptions
+from .scheduler import DEFAULT_TENANT, llm_scheduler
+from .serialization import sse_frame
+from .sse import TokenCoalescer
+
+
+logger = logging.getLogger(__name__)
 
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
+CLAUDE_FAST_MODEL = os.environ.get("CLAUDE_FAST_MODEL", "claude-haiku-4-5-20251001")
 THINKING_BUDGET = 4096
 MAX_TOKENS = 16000
 
+# Deadline budgeting: each stage gets a share of whatever budget is left when it starts
+DRIVE_TIMES_SHARE = 0.15
+ENRICHMENT_RESERVE_SHARE = 0.15  # held back from the LLM for the polyline passes
+# Per model tier: below this, don't start Claude at all — return the naive plan. A fast-tier call
+# (small model, 1k thinking budget) fits in a few seconds; deep-tier thinking needs far longer
+MIN_LLM_SECONDS = {"fast": 2.0, "standard": 5.0, "deep": 8.0}
+MIN_STAGE_SECONDS = 0.5  # below this, skip a network stage rather than start it
+LOCAL_SEARCH_SHARE = 0.05
+ROAD_MATRIX_SHARE = 0.5  # fetched while Claude thinks, so it can take a bigger slice than inline stages
+
+# Plan scoring: violations and stranded rides are priced in miles so plans compare on one number
+VIOLATION_PENALTY_MILES = 25.0
+UNASSIGNED_PENALTY_MILES = 100.0
+
+# Structured output: Claude submits its plan as this tool's input instead of free-form JSON text.
+# (Extended thinking only allows tool_choice "auto", so the prompt asks for the call explicitly.)
+ROUTE_PLAN_TOOL = {
+    "name": "submit_route_plan",
+    "description": "Submit the final route plan. Call exactly once, after reasoning through the assignments.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "assignments": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "vehicle_id": {"type": "string"},
+                        "ride_ids_in_order": {"type": "array", "items": {"type": "string"}},
+                        "reasoning": {"type": "string"},
+                    },
+                    "required": ["vehicle_id", "ride_ids_in_order", "reasoning"],
+                },
+            },
+            "overall_strategy": {"type": "string"},
+            "unassigned_rides": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["assignments", "overall_strategy", "unassigned_rides"],
+    },
+}
+
+# Compact output contract: the plan as integer indices into the prompt's ride/vehicle tables, no
+# per-vehicle prose. Explanations come later, per vehicle, from explain_assignment().
+COMPACT_PLAN_TOOL = {
+    "name": "submit_route_indices",
+    "description": "Submit the final route plan as index lists. Call exactly once.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "routes": {
+                "type": "array",
+                "description": "One entry per used vehicle: [vehicle_index, ride_index, ...] in service order.",
+                "items": {"type": "array", "items": {"type": "integer"}, "minItems": 2},
+            },
+            "strategy": {"type": "string"},
+        },
+        "required": ["routes"],
+    },
+}
+EXPLAIN_MAX_TOKENS = 400
+
+# Speculative mode always races against a clock; this is the clock when the caller set none
+SPECULATIVE_DEADLINE_SECONDS = 30.0
+
+
+def __getattr__(name: str):
+    # The SDK takes over a second to import: load it on the first Claude call, not at cold start.
+    # `optimizer.anthropic` still resolves (tests patch the client class through it).
+    if name == "anthropic":
+        import anthropic
+        return anthropic
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_claude: tuple | None = None  # (event loop, client class, client)
+
+
+def claude_client():
+    """The AsyncAnthropic client for the running event loop, built on first use and then reused."""
+    global _claude
+    import anthropic
+
+    loop = asyncio.get_running_loop()
+    factory = anthropic.AsyncAnthropic
+    if _claude is None or _claude[0] is not loop or _claude[1] is not factory:
+        _claude = (loop, factory, factory())
+    return _claude[2]
+
 
 def compute_route_miles(assignment: RouteAssignment, rides: list[Ride], vehicles: list[Vehicle]) -> float:
     """Compute total haversine miles for a single vehicle's route."""
@@ -34,40 +137,54 @@ def compute_route_miles(assignment: RouteAssignment, rides: list[Ride], vehicles
     return total
 
 
-def _build_waypoints(assignment: RouteAssignment, rides: list[Ride], vehicles: list[Vehicle]) -> list[tuple[float, float]]:
-    """Build ordered waypoints for a vehicle's route: vehicle pos → pickup1 → dropoff1 → pickup2 → dropoff2 ..."""
-    ride_map = {r.id: r for r in rides}
-    vehicle = next((v for v in vehicles if v.id == assignment.vehicle_id), None)
-    if not vehicle:
-        return []
+def _without_polylines(
+    assignments: list[RouteAssignment],
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    evaluator: MileageEvaluator | None = None,
+) -> tuple[list[RouteAssignment], float]:
+    """Degraded enrichment: no polylines (the map draws straight lines).
 
-    waypoints: list[tuple[float, float]] = [(vehicle.current_lat, vehicle.current_lng)]
-    for ride_id in assignment.ride_ids_in_order:
-        ride = ride_map.get(ride_id)
-        if ride:
-            waypoints.append((ride.pickup_lat, ride.pickup_lng))
-            waypoints.append((ride.dropoff_lat, ride.dropoff_lng))
-    return waypoints
+    Route miles come from the evaluator's cached road legs when given, else haversine.
+    """
+    miles = [evaluator.route_miles(a) if evaluator else compute_route_miles(a, rides, vehicles) for a in assignments]
+    out = [a.model_copy(update={"route_miles": round(m, 1)}) for a, m in zip(assignments, miles)]
+    return out, sum(miles)
 
 
 async def enrich_with_polylines(
-    assignments: list[RouteAssignment], rides: list[Ride], vehicles: list[Vehicle]
+    assignments: list[RouteAssignment],
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    deadline: Deadline | None = None,
+    share: float = 1.0,
+    evaluator: MileageEvaluator | None = None,
 ) -> tuple[list[RouteAssignment], float]:
-    """Add real road polylines + distances to assignments. Returns (enriched_assignments, total_road_miles)."""
-    async def enrich_one(a: RouteAssignment) -> RouteAssignment:
-        waypoints = _build_waypoints(a, rides, vehicles)
-        polyline, miles = await get_route_polyline(waypoints)
-        return RouteAssignment(
-            vehicle_id=a.vehicle_id,
-            ride_ids_in_order=a.ride_ids_in_order,
-            reasoning=a.reasoning,
-            polyline=polyline,
-            route_miles=round(miles, 1),
-        )
+    """Add real road polylines + distances to assignments. Returns (enriched_assignments, total_road_miles).
+
+    Directions' per-leg road distances go into the shared leg cache, so with an evaluator each
+    route is priced from the same legs as every other plan, with no Distance Matrix call needed.
+    With a deadline, the Directions fan-out gets `share` of the remaining budget; if that is
+    too short or runs out, falls back to straight lines and records the degradation.
+    """
+    timeout = deadline.share(share) if deadline else None
+    if timeout is not None and timeout < MIN_STAGE_SECONDS:
+        deadline.degrade("haversine_miles")
+        return _without_polylines(assignments, rides, vehicles, evaluator)
+
+    async def enrich_one(a: RouteAssignment) -> tuple[RouteAssignment, float]:
+        waypoints = build_waypoints(a, rides, vehicles)
+        route = await get_route(waypoints)
+        leg_cache.put_route(waypoints, route)
+        miles = evaluator.route_miles(a) if evaluator else route.miles
+        return a.model_copy(update={"polyline": route.polyline, "route_miles": round(miles, 1)}), miles
 
-    enriched = await asyncio.gather(*[enrich_one(a) for a in assignments])
-    total_road_miles = sum(a.route_miles for a in enriched)
-    return list(enriched), total_road_miles
+    try:
+        enriched = await asyncio.wait_for(asyncio.gather(*[enrich_one(a) for a in assignments]), timeout)
+    except TimeoutError:
+        deadline.degrade("haversine_miles")
+        return _without_polylines(assignments, rides, vehicles, evaluator)
+    return [a for a, _ in enriched], sum(m for _, m in enriched)
 
 
 def naive_assign(rides: list[Ride], vehicles: list[Vehicle]) -> tuple[list[RouteAssignment], float]:
@@ -122,45 +239,165 @@ def count_constraint_violations(assignments: list[RouteAssignment], rides: list[
     return violations
 
 
-async def _build_drive_time_context(rides: list[Ride], vehicles: list[Vehicle]) -> str | None:
-    """Get real drive times between key points to enrich the prompt."""
-    # Gather all unique points: vehicle positions + pickup/dropoff locations
-    points: list[tuple[float, float]] = []
-    point_labels: list[str] = []
+def score_plan(assignments: list[RouteAssignment], rides: list[Ride], vehicles: list[Vehicle]) -> float:
+    """Cost of a plan (lower is better): haversine miles plus penalties for violations and unassigned rides."""
+    miles = sum(compute_route_miles(a, rides, vehicles) for a in assignments)
+    violations = sum(count_constraint_violations(assignments, rides, vehicles).values())
+    assigned = {rid for a in assignments for rid in a.ride_ids_in_order}
+    unassigned = sum(1 for r in rides if r.id not in assigned)
+    return miles + VIOLATION_PENALTY_MILES * violations + UNASSIGNED_PENALTY_MILES * unassigned
+
+
+@dataclass(frozen=True)
+class ModelPolicy:
+    """Which model and how much thinking/output budget one optimization call gets."""
+    tier: str  # fast | standard | deep
+    model: str
+    thinking_budget: int
+    max_tokens: int
+    reason: str = ""
+
+
+# Base settings per tier; max_tokens is topped up for output size in choose_model_policy()
+MODEL_TIERS = {
+    "fast": ModelPolicy("fast", CLAUDE_FAST_MODEL, thinking_budget=1024, max_tokens=4096),
+    "standard": ModelPolicy("standard", CLAUDE_MODEL, thinking_budget=THINKING_BUDGET, max_tokens=MAX_TOKENS),
+    "deep": ModelPolicy("deep", CLAUDE_MODEL, thinking_budget=12000, max_tokens=20000),
+}
+# The SDK refuses non-streaming calls whose max_tokens implies a >10 minute response (~21k tokens)
+MAX_OUTPUT_TOKENS = 21000
+# Rough output cost of the plan itself (full contract): IDs per ride, prose per vehicle
+OUTPUT_TOKENS_PER_RIDE = 8
+OUTPUT_TOKENS_PER_VEHICLE = 80
+# A caller's thinking_budget is capped so at least this much of MAX_OUTPUT_TOKENS is left for the answer
+MIN_ANSWER_TOKENS = 4096
+MIN_THINKING_BUDGET = 1024  # the API's floor for budget_tokens
+
+
+# Rough prompt size for the scheduler's token quota (reconciled with real usage afterwards)
+CHARS_PER_TOKEN = 4
+
 
-    for v in vehicles:
-        points.append((v.current_lat, v.current_lng))
-        point_labels.append(f"{v.id} (current)")
+def estimate_call_tokens(prompt: str, max_tokens: int) -> int:
+    """Tokens to reserve against a tenant's quota before a call: the prompt plus the full output allowance."""
+    return len(prompt) // CHARS_PER_TOKEN + max_tokens
 
-    for r in rides:
-        points.append((r.pickup_lat, r.pickup_lng))
-        point_labels.append(f"{r.id} pickup")
+
+def _usage_tokens(usage) -> int | None:
+    if usage is None:
+        return None
+    return (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "output_tokens", 0) or 0)
+
+
+def problem_difficulty(rides: list[Ride], vehicles: list[Vehicle]) -> dict:
+    """Cheap difficulty signals for choose_model_policy().
+
+    tightness: share of (ride, available vehicle) pairs that are infeasible.
+    scarce_rides: rides with at most one eligible vehicle (the reservation problem).
+    window_density: peak number of overlapping pickup windows per available vehicle.
+    """
+    available = [v for v in vehicles if v.status.value == "available"]
+    pairs = len(rides) * len(available)
+    eligible_counts = [sum(1 for v in available if is_eligible(r, v)) for r in rides]
+    infeasible = pairs - sum(eligible_counts)
+
+    # Sweep over window start/end points to find the peak overlap (ISO strings sort chronologically)
+    edges = sorted([(r.time_window_start, 1) for r in rides] + [(r.time_window_end, -1) for r in rides])
+    peak = current = 0
+    for _, delta in edges:
+        current += delta
+        peak = max(peak, current)
+
+    return {
+        "rides": len(rides),
+        "vehicles": len(available),
+        "tightness": round(infeasible / pairs, 3) if pairs else 0.0,
+        "scarce_rides": sum(1 for n in eligible_counts if n <= 1),
+        "window_density": round(peak / len(available), 2) if available else float(peak),
+    }
+
+
+def choose_model_policy(
+    rides: list[Ride], vehicles: list[Vehicle], tier: str = "auto", thinking_budget: int | None = None
+) -> ModelPolicy:
+    """Pick model tier + thinking budget from problem difficulty, unless the caller overrides them.
+
+    Trivial batches (few rides, loose feasibility, little window overlap) go to the fast tier;
+    large, tight or crowded ones get the deep tier's thinking budget. A caller's thinking_budget is
+    capped so it leaves room for the answer under MAX_OUTPUT_TOKENS.
+    """
+    d = problem_difficulty(rides, vehicles)
+    if tier != "auto":
+        reason = f"override: {tier}"
+    elif d["rides"] <= 8 and d["scarce_rides"] == 0 and d["tightness"] < 0.3 and d["window_density"] <= 1.5:
+        tier, reason = "fast", "small batch with loose constraints"
+    elif d["rides"] > 40 or d["scarce_rides"] > 2 or d["tightness"] > 0.6 or d["window_density"] > 3:
+        tier, reason = "deep", "large or tightly constrained batch"
+    else:
+        tier, reason = "standard", "moderate batch"
+    base = MODEL_TIERS[tier]
+
+    budget = thinking_budget or base.thinking_budget
+    output_tokens = OUTPUT_TOKENS_PER_RIDE * d["rides"] + OUTPUT_TOKENS_PER_VEHICLE * d["vehicles"]
+    answer_tokens = 2 * output_tokens
+    if thinking_budget:
+        answer_tokens = max(answer_tokens, MIN_ANSWER_TOKENS)
+        cap = max(MIN_THINKING_BUDGET, MAX_OUTPUT_TOKENS - answer_tokens)
+        if budget > cap:
+            budget, reason = cap, f"{reason}; thinking budget capped at {cap}"
+    max_tokens = min(MAX_OUTPUT_TOKENS, max(base.max_tokens, budget + answer_tokens))
+    policy = ModelPolicy(tier, base.model, budget, max_tokens, reason)
+    logger.info("model policy %s (%s): model=%s thinking=%d max_tokens=%d difficulty=%s",
+                tier, reason, policy.model, budget, max_tokens, d)
+    return policy
+
+
+async def _build_drive_time_context(
+    rides: list[Ride], vehicles: list[Vehicle], deadline: Deadline | None = None
+) -> str | None:
+    """Get real drive times between key points to enrich the prompt.
+
+    Legs come from (and land in) the shared road-matrix cache, so the later mileage evaluation
+    reuses them. Skipped (returns None) when the deadline can't spare its share of the budget.
+    """
+    timeout = deadline.share(DRIVE_TIMES_SHARE) if deadline else None
+    if timeout is not None and timeout < MIN_STAGE_SECONDS:
+        deadline.degrade("skipped_drive_times")
+        return None
 
     # Only use vehicle positions as origins, ride pickups as destinations
     # to keep the matrix manageable
     vehicle_points = [(v.current_lat, v.current_lng) for v in vehicles]
     pickup_points = [(r.pickup_lat, r.pickup_lng) for r in rides]
 
-    matrix = await get_distance_matrix(vehicle_points, pickup_points)
-    if not matrix:
+    try:
+        complete = await asyncio.wait_for(ensure_matrix(vehicle_points, pickup_points), timeout)
+    except TimeoutError:
+        deadline.degrade("skipped_drive_times")
         return None
+    if not complete and deadline:
+        deadline.degrade("road_matrix_capped")
 
     lines = ["REAL DRIVE TIMES (vehicle → ride pickup):"]
-    for i, v in enumerate(vehicles):
-        for j, r in enumerate(rides):
-            d = matrix[i][j]
-            lines.append(
-                f"  {v.id} → {r.id} pickup: {d['distance_miles']:.1f} mi, {d['duration_minutes']:.0f} min"
-            )
+    for v, origin in zip(vehicles, vehicle_points):
+        for r, pickup in zip(rides, pickup_points):
+            if (leg := leg_cache.get(origin, pickup)) is not None:
+                lines.append(f"  {v.id} → {r.id} pickup: {leg[0]:.1f} mi, {leg[1]:.0f} min")
+    if len(lines) == 1:
+        return None
 
     return "\n".join(lines)
 
 
-def build_prompt(rides: list[Ride], vehicles: list[Vehicle], drive_times: str | None = None) -> str:
+def build_prompt(
+    rides: list[Ride], vehicles: list[Vehicle], drive_times: str | None = None, compact: bool = False
+) -> str:
+    """Build the dispatch prompt. `compact` numbers rides/vehicles and asks for index-only output."""
     rides_desc = []
-    for r in rides:
+    for i, r in enumerate(rides):
+        index = f"[{i}] " if compact else ""
         parts = [
-            f"  - {r.id}: pickup={r.pickup_label or f'{r.pickup_lat},{r.pickup_lng}'} → "
+            f"  - {index}{r.id}: pickup={r.pickup_label or f'{r.pickup_lat},{r.pickup_lng}'} → "
             f"dropoff={r.dropoff_label or f'{r.dropoff_lat},{r.dropoff_lng}'}",
             f"    passengers={r.passenger_count}, luggage={r.luggage_count}, "
             f"priority={r.priority.value}, service={r.service_type.value}",
@@ -171,9 +408,10 @@ def build_prompt(rides: list[Ride], vehicles: list[Vehicle], drive_times: str |
         rides_desc.append("\n".join(parts))
 
     vehicles_desc = []
-    for v in vehicles:
+    for i, v in enumerate(vehicles):
+        index = f"[{i}] " if compact else ""
         vehicles_desc.append(
-            f"  - {v.id} ({v.name}, {v.vehicle_type.value}): at ({v.current_lat}, {v.current_lng}), "
+            f"  - {index}{v.id} ({v.name}, {v.vehicle_type.value}): at ({v.current_lat}, {v.current_lng}), "
             f"pax_capacity={v.capacity}, luggage_capacity={v.luggage_capacity}, status={v.status.value}"
         )
 
@@ -181,6 +419,28 @@ def build_prompt(rides: list[Ride], vehicles: list[Vehicle], drive_times: str |
     if drive_times:
         drive_times_section = f"\n{drive_times}\n"
 
+    if compact:
+        output_section = f"""Submit your plan by calling the {COMPACT_PLAN_TOOL["name"]} tool. Refer to rides and vehicles by their [index] numbers, not their IDs, and do not explain individual routes:
+{{"routes": [[0, 4, 1], [2, 3]], "strategy": "One sentence naming any reserved vehicles"}}
+Each route is [vehicle_index, ride_index, ride_index, ...] with rides in service order.
+
+IMPORTANT: Assign ALL {len(rides)} rides (indices 0-{len(rides) - 1})."""
+    else:
+        output_section = f"""Submit your plan by calling the {ROUTE_PLAN_TOOL["name"]} tool. Its input must have this exact shape:
+{{
+  "assignments": [
+    {{
+      "vehicle_id": "V001",
+      "ride_ids_in_order": ["R001", "R005"],
+      "reasoning": "Explain grouping AND any reservation decisions."
+    }}
+  ],
+  "overall_strategy": "2-3 sentence summary including which vehicles were reserved and why",
+  "unassigned_rides": ["R999"]
+}}
+
+IMPORTANT: Assign ALL {len(rides)} rides. "unassigned_rides" MUST be an empty array []."""
+
     return f"""You are a fleet dispatch optimizer for a Portland, OR ground transportation company.
 
 Given the following ride requests and available vehicles, create optimal route assignments.
@@ -216,164 +476,592 @@ OPTIMIZATION RULES (in priority order):
 
 6. Use the real drive times provided (if available) instead of straight-line distance estimates.
 
-Respond with ONLY valid JSON in this exact format:
-{{
-  "assignments": [
-    {{
-      "vehicle_id": "V001",
-      "ride_ids_in_order": ["R001", "R005"],
-      "reasoning": "Explain grouping AND any reservation decisions."
-    }}
-  ],
-  "overall_strategy": "2-3 sentence summary including which vehicles were reserved and why",
-  "unassigned_rides": ["R999"]
-}}
+{output_section}"""
 
-IMPORTANT: Assign ALL {len(rides)} rides. "unassigned_rides" MUST be an empty array []."""
 
+def build_message_params(prompt: str, policy: ModelPolicy, compact: bool = False) -> dict:
+    """Messages API parameters for one optimization call (shared by create, stream and batch)."""
+    return {
+        "model": policy.model,
+        "max_tokens": policy.max_tokens,
+        "thinking": {"type": "enabled", "budget_tokens": policy.thinking_budget},
+        "tools": [COMPACT_PLAN_TOOL if compact else ROUTE_PLAN_TOOL],
+        "messages": [{"role": "user", "content": prompt}],
+    }
 
-def _parse_json_response(raw: str) -> OptimizationResult:
-    """Parse Claude's JSON response, handling code fences and whitespace."""
-    cleaned = raw.strip()
-    if cleaned.startswith("```"):
-        cleaned = cleaned.split("\n", 1)[1]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-    parsed = json.loads(cleaned)
-    return OptimizationResult(**parsed)
 
+def _decode_compact(data: dict, rides: list[Ride], vehicles: list[Vehicle]) -> dict:
+    """Expand a compact index plan into the full plan shape.
 
-async def optimize_stream(rides: list[Ride], vehicles: list[Vehicle]):
-    """Streaming version with extended thinking. Yields SSE events."""
-    import asyncio as _asyncio
+    Out-of-range indices become placeholder IDs so repair_plan drops and counts them.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("routes"), list):
+        raise ValueError("Plan has no routes list")
 
-    # Start drive times + naive baseline in parallel
-    drive_times_task = _asyncio.create_task(_build_drive_time_context(rides, vehicles))
-
-    naive_assignments, _ = naive_assign(rides, vehicles)
-    naive_violations = count_constraint_violations(naive_assignments, rides, vehicles)
+    def lookup(table: list, i) -> str:
+        return table[i].id if isinstance(i, int) and 0 <= i < len(table) else f"#{i}"
 
-    drive_times = await drive_times_task
-    prompt = build_prompt(rides, vehicles, drive_times)
-
-    # Stream Claude's response with extended thinking
-    client = anthropic.AsyncAnthropic()
-    json_text = ""
-    in_text_block = False
-
-    async with client.messages.stream(
-        model=CLAUDE_MODEL,
-        max_tokens=MAX_TOKENS,
-        thinking={"type": "enabled", "budget_tokens": THINKING_BUDGET},
-        messages=[{"role": "user", "content": prompt}],
-    ) as stream:
-        async for event in stream:
-            if event.type == "content_block_start":
-                if hasattr(event.content_block, "type") and event.content_block.type == "text":
-                    in_text_block = True
-            elif event.type == "content_block_stop":
-                in_text_block = False if in_text_block else in_text_block
-            elif event.type == "content_block_delta":
-                if event.delta.type == "thinking_delta":
-                    # Stream thinking tokens as readable reasoning
-                    yield f"data: {json.dumps({'type': 'token', 'text': event.delta.thinking})}\n\n"
-                elif event.delta.type == "text_delta":
-                    # Buffer text (JSON) silently
-                    json_text += event.delta.text
-
-    # Parse the JSON response
+    assignments = [
+        {
+            "vehicle_id": lookup(vehicles, route[0]),
+            "ride_ids_in_order": [lookup(rides, i) for i in route[1:]],
+            "reasoning": "",
+        }
+        for route in data["routes"]
+        if isinstance(route, list) and route
+    ]
+    return {"assignments": assignments, "overall_strategy": data.get("strategy") or ""}
+
+
+def _parse_llm_output(
+    tool_input: str | dict | None,
+    text: str,
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    compact: bool = False,
+) -> tuple[OptimizationResult, dict[str, int]]:
+    """Turn Claude's tool call (or, failing that, its text) into a complete plan.
+
+    Truncated JSON is salvaged and the plan is repaired locally rather than rejected.
+    Returns (result, repair_counts). Raises ValueError only when nothing usable came back.
+    """
+    metrics.incr("llm_responses")
     try:
-        result = _parse_json_response(json_text)
-    except (json.JSONDecodeError, Exception) as e:
-        yield f"data: {json.dumps({'type': 'error', 'message': f'Failed to parse response: {str(e)}'})}\n\n"
-        return
+        if tool_input:
+            data = tool_input if isinstance(tool_input, dict) else loads_lenient(tool_input)
+        else:
+            # The model answered in text despite the tool — accept fenced JSON as before
+            cleaned = text.strip()
+            if cleaned.startswith("```"):
+                cleaned = cleaned.split("\n", 1)[-1].removesuffix("```").strip()
+            data = loads_lenient(cleaned)
+        if compact:
+            data = _decode_compact(data, rides, vehicles)
+        result, repairs = repair_plan(data, rides, vehicles)
+    except ValueError as e:  # JSONDecodeError is a ValueError
+        metrics.incr("llm_parse_failures")
+        raise ValueError(f"Unusable model output: {e}") from e
+    if repairs:
+        metrics.incr("llm_responses_repaired")
+        for kind, n in repairs.items():
+            metrics.incr("llm_repairs", n, kind=kind)
+    return result, repairs
+
+
+def parse_message_content(
+    content: list, rides: list[Ride], vehicles: list[Vehicle], compact: bool = False
+) -> tuple[OptimizationResult, dict[str, int]]:
+    """Parse a complete (non-streamed) message's content blocks into a repaired plan."""
+    # With extended thinking: thinking block first, then the tool call (or a text block)
+    tool_input = next((b.input for b in content if b.type == "tool_use"), None)
+    json_text = next((b.text for b in content if b.type == "text"), "")
+    return _parse_llm_output(tool_input, json_text, rides, vehicles, compact)
+
+
+def build_explain_prompt(vehicle_id: str, ride_ids: list[str], rides: list[Ride], vehicles: list[Vehicle]) -> str:
+    """Prompt for a short after-the-fact explanation of one vehicle's route."""
+    ride_map = {r.id: r for r in rides}
+    vehicle = next(v for v in vehicles if v.id == vehicle_id)
+    route_desc = "\n".join(
+        f"  {n}. {r.id}: {r.pickup_label or f'{r.pickup_lat},{r.pickup_lng}'} → "
+        f"{r.dropoff_label or f'{r.dropoff_lat},{r.dropoff_lng}'}, passengers={r.passenger_count}, "
+        f"luggage={r.luggage_count}, priority={r.priority.value}, window={r.time_window_start}"
+        for n, r in enumerate((ride_map[rid] for rid in ride_ids if rid in ride_map), start=1)
+    )
+    fleet_desc = "\n".join(
+        f"  - {v.id} ({v.vehicle_type.value}): pax_capacity={v.capacity}, luggage_capacity={v.luggage_capacity}"
+        for v in vehicles
+    )
+    return f"""You are a fleet dispatcher explaining a route plan for a Portland, OR ground transportation company.
 
-    # Signal that we're now computing road routes
-    yield f"data: {json.dumps({'type': 'status', 'message': 'Computing road routes...'})}\n\n"
+Vehicle {vehicle.id} ({vehicle.name}, {vehicle.vehicle_type.value}) starts at ({vehicle.current_lat}, {vehicle.current_lng}) and serves, in order:
+{route_desc}
 
-    # Enrich with polylines — fallback to haversine on failure
-    try:
-        enriched_assignments, optimized_road_miles = await enrich_with_polylines(
-            result.assignments, rides, vehicles
+Full fleet:
+{fleet_desc}
+
+In 2-3 sentences, explain why these rides are grouped on this vehicle in this order. Call out any reservation decision (this vehicle being the only one able to carry a ride's passengers or luggage). Reply with the explanation only."""
+
+
+async def explain_assignment(
+    vehicle_id: str, ride_ids: list[str], rides: list[Ride], vehicles: list[Vehicle], tenant: str = DEFAULT_TENANT
+) -> str:
+    """Lazily generate the per-vehicle reasoning that compact-mode plans leave out."""
+    client = claude_client()
+    prompt = build_explain_prompt(vehicle_id, ride_ids, rides, vehicles)
+    async with llm_scheduler.slot(tenant, estimate_call_tokens(prompt, EXPLAIN_MAX_TOKENS)) as grant:
+        message = await client.messages.create(
+            model=CLAUDE_MODEL,
+            max_tokens=EXPLAIN_MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt}],
         )
-        result.assignments = enriched_assignments
-    except Exception:
-        optimized_road_miles = sum(compute_route_miles(a, rides, vehicles) for a in result.assignments)
+        if (used := _usage_tokens(getattr(message, "usage", None))) is not None:
+            grant.charge(used)
+    return next((b.text for b in message.content if b.type == "text"), "").strip()
+
+
+def format_sse(event: dict) -> bytes:
+    """Format an event dict as a single SSE frame; pydantic models in it are serialized directly."""
+    return sse_frame(event)
+
+
+async def improve_plan(
+    result: OptimizationResult,
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    deadline: Deadline | None = None,
+    evaluator: MileageEvaluator | None = None,
+) -> dict:
+    """Time-boxed local search on a parsed plan, in place. Returns its stats ({} when skipped).
+
+    With an evaluator, moves are scored on its cached road legs instead of haversine.
+    """
+    budget_ms = LOCAL_SEARCH_BUDGET_MS
+    if deadline is not None and deadline.bounded:
+        budget_ms = min(budget_ms, deadline.share(LOCAL_SEARCH_SHARE) * 1000)
+    if budget_ms <= 0 or not result.assignments:
+        return {}
+    cache = DeadheadCache(distance=evaluator.leg) if evaluator else None
+    # CPU-bound: run off the event loop so other streams keep flowing
+    result.assignments, stats = await asyncio.to_thread(
+        improve_routes, result.assignments, rides, vehicles, budget_ms, cache
+    )
+    if stats["miles_saved"] > 0:
+        metrics.observe("local_search_miles_saved", stats["miles_saved"])
+    return stats
 
-    try:
-        naive_enriched, naive_road_miles = await enrich_with_polylines(naive_assignments, rides, vehicles)
-    except Exception:
-        naive_enriched = naive_assignments
-        naive_road_miles = sum(compute_route_miles(a, rides, vehicles) for a in naive_assignments)
 
-    optimized_violations = count_constraint_violations(result.assignments, rides, vehicles)
+_FALLBACK_STRATEGY = {
+    "naive": "AI optimization unavailable within the latency budget; returning the round-robin baseline plan.",
+    "heuristic": "Returning the local heuristic plan: nearest eligible vehicle per ride, scarce vehicles reserved.",
+}
 
-    final_data = {
-        "result": result.model_dump(),
-        "prompt_used": prompt,
+
+def _fallback_result(assignments: list[RouteAssignment], source: str) -> OptimizationResult:
+    """Stand-in result when Claude's plan is missing, late or worse than the fallback plan."""
+    return OptimizationResult(
+        assignments=[a.model_copy() for a in assignments],
+        overall_strategy=_FALLBACK_STRATEGY[source],
+    )
+
+
+def _choose_plan(
+    llm_result: OptimizationResult | None,
+    heuristic_assignments: list[RouteAssignment] | None,
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+) -> tuple[OptimizationResult, str, dict[str, float]]:
+    """Speculative mode: keep whichever available plan scores better. Returns (result, source, scores)."""
+    scores: dict[str, float] = {}
+    if llm_result is not None:
+        scores["llm"] = round(score_plan(llm_result.assignments, rides, vehicles), 1)
+    if heuristic_assignments is not None:
+        scores["heuristic"] = round(score_plan(heuristic_assignments, rides, vehicles), 1)
+    if llm_result is not None and scores["llm"] <= scores.get("heuristic", float("inf")):
+        return llm_result, "llm", scores
+    return _fallback_result(heuristic_assignments, "heuristic"), "heuristic", scores
+
+
+async def _enrich_plan(
+    assignments: list[RouteAssignment],
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    deadline: Deadline,
+    evaluator: MileageEvaluator,
+) -> tuple[list[RouteAssignment], float]:
+    """enrich_with_polylines, falling back to straight lines on any failure."""
+    try:
+        return await enrich_with_polylines(assignments, rides, vehicles, deadline, evaluator=evaluator)
+    except Exception:
+        return _without_polylines(assignments, rides, vehicles, evaluator)
+
+
+async def finalize_plan(
+    result: OptimizationResult,
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    naive_assignments: list[RouteAssignment] | None = None,
+    deadline: Deadline | None = None,
+    evaluator: MileageEvaluator | None = None,
+    geometry: GeometryOptions | None = None,
+) -> dict:
+    """Enrich a chosen plan and the naive baseline with road routes, and compare miles + violations.
+
+    Both plans' miles come from one MileageEvaluator (cached road legs, haversine for gaps). Both
+    polyline passes run concurrently and share whatever deadline budget is left, and price each
+    route from its Directions legs; then polylines are simplified and/or encoded per `geometry`,
+    in a worker thread. With geometry.lazy the passes are skipped: routes ship with miles only, from
+    the road matrix (pass an evaluator already prepared alongside the LLM call, or its legs are
+    fetched here first), and the map fetches geometry per vehicle from
+    /routes/{run_id}/{vehicle_id}/polyline. Either way the plans are registered under `run_id`,
+    unless the route store is off (serverless): then run_id is empty and lazy falls back to eager.
+    """
+    geometry = geometry or GeometryOptions()
+    if naive_assignments is None:
+        naive_assignments, _ = naive_assign(rides, vehicles)
+    deadline = deadline or Deadline()
+    if geometry.lazy and not route_store.enabled:
+        deadline.degrade("eager_polylines")  # no store to fetch the geometry from later
+        geometry = replace(geometry, lazy=False)
+    if evaluator is None:
+        evaluator = MileageEvaluator(rides, vehicles)
+        if geometry.lazy:
+            await evaluator.prepare(deadline, DRIVE_TIMES_SHARE)
+    if geometry.lazy:
+        result.assignments, optimized_road_miles = _without_polylines(result.assignments, rides, vehicles, evaluator)
+        naive_enriched, naive_road_miles = _without_polylines(naive_assignments, rides, vehicles, evaluator)
+    else:
+        (result.assignments, optimized_road_miles), (naive_enriched, naive_road_miles) = await asyncio.gather(
+            _enrich_plan(result.assignments, rides, vehicles, deadline, evaluator),
+            _enrich_plan(naive_assignments, rides, vehicles, deadline, evaluator),
+        )
+    run_id = ""
+    if route_store.enabled:
+        run_id = route_store.add(rides, vehicles, {"optimized": result.assignments, "naive": naive_enriched}).id
+    if geometry.reshapes:
+        result.assignments = await asyncio.to_thread(geometry.apply, result.assignments)
+        naive_enriched = await asyncio.to_thread(geometry.apply, naive_enriched)
+    return {
+        "result": result,
+        "run_id": run_id,
         "naive_miles": round(naive_road_miles, 1),
         "optimized_miles": round(optimized_road_miles, 1),
-        "naive_violations": sum(naive_violations.values()),
-        "optimized_violations": sum(optimized_violations.values()),
-        "naive_assignments": [a.model_dump() for a in naive_enriched],
+        "naive_violations": sum(count_constraint_violations(naive_assignments, rides, vehicles).values()),
+        "optimized_violations": sum(count_constraint_violations(result.assignments, rides, vehicles).values()),
+        "naive_assignments": naive_enriched,
     }
 
-    yield f"data: {json.dumps({'type': 'result', 'data': final_data})}\n\n"
 
+async def _prepare_road_matrix(
+    evaluator: MileageEvaluator, deadline: Deadline, geometry: GeometryOptions | None
+) -> None:
+    """Fetch road legs while Claude thinks, if anything will read them.
 
-async def optimize(rides: list[Ride], vehicles: list[Vehicle]) -> dict:
-    """Call Claude with extended thinking to optimize routes. Returns full comparison data."""
-    # Get real drive times for the prompt (async, non-blocking)
-    drive_times = await _build_drive_time_context(rides, vehicles)
+    Eager polylines price routes from their Directions legs, so the matrix is only needed for lazy
+    polylines (no Directions call) and for scoring local-search moves.
+    """
+    lazy = geometry is not None and geometry.lazy and route_store.enabled
+    if lazy or LOCAL_SEARCH_BUDGET_MS > 0:
+        await evaluator.prepare(deadline, ROAD_MATRIX_SHARE)
 
-    prompt = build_prompt(rides, vehicles, drive_times)
 
-    # Compute naive baseline (haversine)
-    naive_assignments, naive_miles_haversine = naive_assign(rides, vehicles)
-    naive_violations = count_constraint_violations(naive_assignments, rides, vehicles)
+def _record_llm_error(error: Exception, deadline: Deadline, fallback_source: str) -> None:
+    """Speculative mode: a failed Claude call falls back to the heuristic plan, as a timeout does."""
+    logger.warning("Claude call failed, keeping the %s plan: %r", fallback_source, error)
+    metrics.incr("llm_errors")
+    deadline.degrade(f"{fallback_source}_plan")
+
 
-    # Enrich naive with real road distances
+async def _read_stream(stream, events: asyncio.Queue) -> None:
+    """Pump a Claude stream into a queue, ending with None (or the exception that stopped it)."""
     try:
-        naive_enriched, naive_road_miles = await enrich_with_polylines(naive_assignments, rides, vehicles)
-    except Exception:
-        naive_enriched = naive_assignments
-        naive_road_miles = naive_miles_haversine
-
-    client = anthropic.AsyncAnthropic()
-    message = await client.messages.create(
-        model=CLAUDE_MODEL,
-        max_tokens=MAX_TOKENS,
-        thinking={"type": "enabled", "budget_tokens": THINKING_BUDGET},
-        messages=[{"role": "user", "content": prompt}],
-    )
+        async for event in stream:
+            events.put_nowait(event)
+    except Exception as e:
+        events.put_nowait(e)
+    else:
+        events.put_nowait(None)
+
+
+async def optimize_events(
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    deadline: Deadline | None = None,
+    speculative: bool = False,
+    output_format: str = "full",
+    policy: ModelPolicy | None = None,
+    tenant: str = DEFAULT_TENANT,
+    geometry: GeometryOptions | None = None,
+):
+    """Streaming optimization with extended thinking. Yields event dicts (token/status/error/result).
+
+    Plans in provisional/result events stay pydantic models; format_sse serializes them directly.
+
+    In speculative mode a local heuristic plan is emitted first as a `provisional` event, then raced
+    against Claude: the better-scoring plan available at the deadline becomes the result.
+    output_format="compact" asks Claude for an index-only plan with no per-vehicle reasoning.
+    policy picks the model and thinking budget (default: chosen from problem difficulty).
+    tenant is the caller's account; Claude calls wait for a fair share of capacity via llm_scheduler.
+    geometry sets how route polylines are returned: lazily, simplified, encoded (see finalize_plan).
+    """
+    compact = output_format == "compact"
+    policy = policy or choose_model_policy(rides, vehicles)
+    deadline = deadline or Deadline()
+    if speculative and not deadline.bounded:
+        deadline = Deadline(SPECULATIVE_DEADLINE_SECONDS)
 
-    # With extended thinking: content[0] is thinking block, content[1] is text block
-    json_text = ""
-    for block in message.content:
-        if block.type == "text":
-            json_text = block.text
-            break
+    # Start drive times + naive baseline in parallel
+    drive_times_task = asyncio.create_task(_build_drive_time_context(rides, vehicles, deadline))
 
-    result = _parse_json_response(json_text)
+    naive_assignments, _ = naive_assign(rides, vehicles)
 
-    # Enrich with real road polylines + distances
-    try:
-        enriched_assignments, optimized_road_miles = await enrich_with_polylines(
-            result.assignments, rides, vehicles
-        )
-        result.assignments = enriched_assignments
-    except Exception:
-        optimized_road_miles = sum(compute_route_miles(a, rides, vehicles) for a in result.assignments)
+    heuristic_assignments = None
+    if speculative:
+        heuristic_assignments = greedy_assign(rides, vehicles)
+        provisional = _fallback_result(heuristic_assignments, "heuristic")
+        provisional.assignments, provisional_miles = _without_polylines(provisional.assignments, rides, vehicles)
+        yield {"type": "provisional", "data": {
+            "result": provisional,
+            "optimized_miles": round(provisional_miles, 1),
+            "optimized_violations": sum(count_constraint_violations(heuristic_assignments, rides, vehicles).values()),
+        }}
+    fallback_source = "heuristic" if speculative else "naive"
+    fallback_assignments = heuristic_assignments if speculative else naive_assignments
+
+    drive_times = await drive_times_task
+    prompt = build_prompt(rides, vehicles, drive_times, compact)
+
+    # Fill in the rest of the road-distance matrix while Claude thinks
+    evaluator = MileageEvaluator(rides, vehicles)
+    matrix_task = asyncio.create_task(_prepare_road_matrix(evaluator, deadline, geometry))
+
+    llm_result = None
+    repairs: dict[str, int] = {}
+    local_search: dict = {}
+    llm_timeout = deadline.share(1 - ENRICHMENT_RESERVE_SHARE)
+    if llm_timeout is not None and llm_timeout < MIN_LLM_SECONDS[policy.tier]:
+        deadline.degrade(f"{fallback_source}_plan")
+    else:
+        # Stream Claude's response with extended thinking
+        client = claude_client()
+        json_text = ""
+        tool_json = ""
+        timed_out = False
+        loop = asyncio.get_running_loop()
+        llm_deadline = loop.time() + llm_timeout if llm_timeout is not None else None
+
+        # Queue for a fair share of Claude capacity; the wait counts against the LLM budget
+        try:
+            grant = await asyncio.wait_for(
+                llm_scheduler.acquire(tenant, estimate_call_tokens(prompt, policy.max_tokens)), llm_timeout
+            )
+        except TimeoutError:
+            grant = None
+            timed_out = True
+
+        coalescer = TokenCoalescer()
+        llm_error = None
+        if grant is not None:
+            input_tokens = output_tokens = None
+            try:
+                async with client.messages.stream(**build_message_params(prompt, policy, compact)) as stream:
+                    # Read in a task rather than time-boxing the generator body: a timeout scope
+                    # around a `yield` would cancel our consumer instead, and waking up to flush
+                    # buffered tokens must not abort a read in flight
+                    events: asyncio.Queue = asyncio.Queue()
+                    reader = asyncio.create_task(_read_stream(stream, events))
+                    try:
+                        while True:
+                            now = loop.time()
+                            if llm_deadline is not None and now >= llm_deadline:
+                                timed_out = True
+                                break
+                            if not events.empty():
+                                event = events.get_nowait()
+                            else:
+                                timeout = coalescer.due_in(now)
+                                if llm_deadline is not None:
+                                    remaining = llm_deadline - now
+                                    timeout = remaining if timeout is None else min(timeout, remaining)
+                                try:
+                                    event = await asyncio.wait_for(events.get(), timeout)
+                                except TimeoutError:
+                                    if text := coalescer.flush():
+                                        yield {"type": "token", "text": text}
+                                    continue
+                            if event is None:
+                                break
+                            if isinstance(event, Exception):
+                                raise event
+                            if event.type == "content_block_delta":
+                                if event.delta.type == "thinking_delta":
+                                    # Stream thinking tokens as readable reasoning, several deltas per frame
+                                    if text := coalescer.add(event.delta.thinking, loop.time()):
+                                        yield {"type": "token", "text": text}
+                                elif event.delta.type == "input_json_delta":
+                                    # Buffer the tool call's JSON input silently
+                                    tool_json += event.delta.partial_json
+                                elif event.delta.type == "text_delta":
+                                    json_text += event.delta.text
+                            elif event.type == "message_start":
+                                input_tokens = event.message.usage.input_tokens
+                            elif event.type == "message_delta":
+                                output_tokens = event.usage.output_tokens  # cumulative
+                    finally:
+                        reader.cancel()
+                        await asyncio.wait((reader,))
+            except Exception as e:  # API or connection error from Claude
+                llm_error = e
+            finally:
+                if input_tokens is not None and output_tokens is not None:
+                    grant.charge(input_tokens + output_tokens)
+                grant.release()
+
+        # Whatever reasoning is still buffered goes out ahead of any status/error/result event
+        if text := coalescer.flush():
+            yield {"type": "token", "text": text}
+
+        if llm_error is not None:
+            if not speculative:
+                matrix_task.cancel()
+                yield {"type": "error", "message": f"Claude request failed: {llm_error}"}
+                return
+            _record_llm_error(llm_error, deadline, fallback_source)
+        elif timed_out:
+            deadline.degrade(f"{fallback_source}_plan")
+        else:
+            try:
+                llm_result, repairs = _parse_llm_output(tool_json, json_text, rides, vehicles, compact)
+            except ValueError as e:
+                if not speculative:
+                    matrix_task.cancel()
+                    yield {"type": "error", "message": f"Failed to parse response: {str(e)}"}
+                    return
+            else:
+                await matrix_task
+                local_search = await improve_plan(llm_result, rides, vehicles, deadline, evaluator)
+
+    if speculative:
+        result, plan_source, plan_scores = _choose_plan(llm_result, heuristic_assignments, rides, vehicles)
+    elif llm_result is not None:
+        result, plan_source, plan_scores = llm_result, "llm", {}
+    else:
+        result, plan_source, plan_scores = _fallback_result(fallback_assignments, fallback_source), fallback_source, {}
+
+    if not (geometry and geometry.lazy):
+        # Signal that we're now computing road routes
+        yield {"type": "status", "message": "Computing road routes..."}
+
+    await matrix_task
+    comparison = await finalize_plan(result, rides, vehicles, naive_assignments, deadline, evaluator, geometry)
+
+    final_data = {
+        "result": comparison["result"],
+        "prompt_used": prompt,
+        "naive_miles": comparison["naive_miles"],
+        "optimized_miles": comparison["optimized_miles"],
+        "naive_violations": comparison["naive_violations"],
+        "optimized_violations": comparison["optimized_violations"],
+        "naive_assignments": comparison["naive_assignments"],
+        "run_id": comparison["run_id"],
+        "degradations": deadline.degradations,
+        "plan_source": plan_source,
+        "plan_scores": plan_scores,
+        "repairs": repairs,
+        "local_search": local_search,
+        "model_policy": asdict(policy),
+    }
+
+    yield {"type": "result", "data": final_data}
+
+
+async def optimize_stream(
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    deadline: Deadline | None = None,
+    speculative: bool = False,
+    output_format: str = "full",
+    policy: ModelPolicy | None = None,
+    tenant: str = DEFAULT_TENANT,
+    geometry: GeometryOptions | None = None,
+):
+    """Streaming version with extended thinking. Yields SSE events."""
+    async for event in optimize_events(rides, vehicles, deadline, speculative, output_format, policy, tenant, geometry):
+        yield format_sse(event)
+
+
+async def optimize(
+    rides: list[Ride],
+    vehicles: list[Vehicle],
+    deadline: Deadline | None = None,
+    speculative: bool = False,
+    output_format: str = "full",
+    policy: ModelPolicy | None = None,
+    tenant: str = DEFAULT_TENANT,
+    geometry: GeometryOptions | None = None,
+) -> dict:
+    """Call Claude with extended thinking to optimize routes. Returns full comparison data.
+
+    In speculative mode the local heuristic runs alongside Claude and the better-scoring plan wins.
+    geometry sets how route polylines are returned: lazily, simplified, encoded (see finalize_plan).
+    """
+    compact = output_format == "compact"
+    policy = policy or choose_model_policy(rides, vehicles)
+    deadline = deadline or Deadline()
+    if speculative and not deadline.bounded:
+        deadline = Deadline(SPECULATIVE_DEADLINE_SECONDS)
+
+    # Get real drive times for the prompt (async, non-blocking)
+    drive_times = await _build_drive_time_context(rides, vehicles, deadline)
+
+    prompt = build_prompt(rides, vehicles, drive_times, compact)
 
-    optimized_violations = count_constraint_violations(result.assignments, rides, vehicles)
+    # Fill in the rest of the road-distance matrix while Claude thinks
+    evaluator = MileageEvaluator(rides, vehicles)
+    matrix_task = asyncio.create_task(_prepare_road_matrix(evaluator, deadline, geometry))
+
+    # Compute naive baseline (haversine)
+    naive_assignments, _ = naive_assign(rides, vehicles)
+
+    heuristic_assignments = greedy_assign(rides, vehicles) if speculative else None
+    fallback_source = "heuristic" if speculative else "naive"
+    fallback_assignments = heuristic_assignments if speculative else naive_assignments
+
+    llm_result = None
+    repairs: dict[str, int] = {}
+    local_search: dict = {}
+    llm_timeout = deadline.share(1 - ENRICHMENT_RESERVE_SHARE)
+    if llm_timeout is not None and llm_timeout < MIN_LLM_SECONDS[policy.tier]:
+        deadline.degrade(f"{fallback_source}_plan")
+    else:
+        client = claude_client()
+
+        async def call_claude():
+            async with llm_scheduler.slot(tenant, estimate_call_tokens(prompt, policy.max_tokens)) as grant:
+                message = await client.messages.create(**build_message_params(prompt, policy, compact))
+                if (used := _usage_tokens(getattr(message, "usage", None))) is not None:
+                    grant.charge(used)
+                return message
+
+        try:
+            # The wait for a fair scheduling turn counts against the LLM budget too
+            message = await asyncio.wait_for(call_claude(), llm_timeout)
+        except TimeoutError:
+            deadline.degrade(f"{fallback_source}_plan")
+        except Exception as e:  # API or connection error from Claude
+            if not speculative:
+                matrix_task.cancel()
+                raise
+            _record_llm_error(e, deadline, fallback_source)
+        else:
+            try:
+                llm_result, repairs = parse_message_content(message.content, rides, vehicles, compact)
+            except ValueError:
+                if not speculative:
+                    matrix_task.cancel()
+                    raise
+            else:
+                await matrix_task
+                local_search = await improve_plan(llm_result, rides, vehicles, deadline, evaluator)
+
+    if speculative:
+        result, plan_source, plan_scores = _choose_plan(llm_result, heuristic_assignments, rides, vehicles)
+    elif llm_result is not None:
+        result, plan_source, plan_scores = llm_result, "llm", {}
+    else:
+        result, plan_source, plan_scores = _fallback_result(fallback_assignments, fallback_source), fallback_source, {}
+
+    # Enrich both plans with real road polylines + distances, sharing the remaining budget
+    await matrix_task
+    comparison = await finalize_plan(result, rides, vehicles, naive_assignments, deadline, evaluator, geometry)
 
     return {
-        "result": result,
+        **comparison,
         "prompt": prompt,
-        "naive_miles": round(naive_road_miles, 1),
-        "optimized_miles": round(optimized_road_miles, 1),
-        "naive_violations": sum(naive_violations.values()),
-        "optimized_violations": sum(optimized_violations.values()),
-        "naive_assignments": naive_enriched,
+        "degradations": deadline.degradations,
+        "plan_source": plan_source,
+        "plan_scores": plan_scores,
+        "repairs": repairs,
+        "local_search": local_search,
+        "model_policy": asdict(policy),
     }
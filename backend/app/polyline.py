@@ -0,0 +1,292 @@
+"""Route geometry on the wire: Douglas–Peucker simplification and Google encoded polylines.
+
+Directions polylines carry far more points than a map can draw at the zoom it is shown at, and
+every route is sent twice (optimized and naive plan). simplify() drops points that sit within one
+screen pixel of the line at the requested zoom; encoded output replaces the [[lat, lng], ...] float
+arrays with Google's polyline string (about 6 bytes per point instead of ~40).
+"""
+
+import math
+import os
+from array import array
+from dataclasses import dataclass
+
+from .models import RouteAssignment
+
+
+METERS_PER_PIXEL_AT_ZOOM_0 = 156543.03392  # Web Mercator, 256-px tiles, at the equator
+METERS_PER_DEGREE_LAT = 110_540.0
+METERS_PER_DEGREE_LNG_AT_EQUATOR = 111_320.0
+SIMPLIFY_PIXELS = 1.0  # points closer than this to the simplified line are invisible anyway
+SIMPLIFY_MIN_POINTS = int(os.environ.get("POLYLINE_SIMPLIFY_MIN_POINTS", "64"))  # shorter polylines go out as they are
+MAX_ZOOM = 22
+VECTORIZE_MIN_BYTES = 2048  # below this numpy's per-call overhead outweighs the Python loop
+BATCH_CHUNK_BYTES = 32 * 1024  # encoded bytes per vectorized pass in decode_polylines
+
+
+def tolerance_meters(zoom: int, lat: float) -> float:
+    """Ground size of SIMPLIFY_PIXELS screen pixels at this zoom and latitude."""
+    return SIMPLIFY_PIXELS * METERS_PER_PIXEL_AT_ZOOM_0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def simplify(points: list[list[float]], tolerance: float) -> list[list[float]]:
+    """Douglas–Peucker: keep the endpoints and every point more than `tolerance` meters off the line.
+
+    A radial pass first drops points within `tolerance` of the last kept one (dense stretches of
+    a road polyline), which leaves Douglas–Peucker far fewer points to scan. Works on a local
+    equirectangular projection (accurate at city scale) with an explicit stack, so long routes
+    don't hit the recursion limit.
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    lng_scale = METERS_PER_DEGREE_LNG_AT_EQUATOR * math.cos(math.radians(points[0][0]))
+    tolerance_sq = tolerance * tolerance
+
+    lat_scale = METERS_PER_DEGREE_LAT
+    lx, ly = points[0][1] * lng_scale, points[0][0] * lat_scale
+    kept, xs, ys = [points[0]], [lx], [ly]
+    for p in points[1:-1]:
+        x, y = p[1] * lng_scale, p[0] * lat_scale
+        ddx, ddy = x - lx, y - ly
+        if ddx * ddx + ddy * ddy > tolerance_sq:
+            kept.append(p)
+            xs.append(x)
+            ys.append(y)
+            lx, ly = x, y
+    kept.append(points[-1])
+    xs.append(points[-1][1] * lng_scale)
+    ys.append(points[-1][0] * lat_scale)
+
+    n = len(kept)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        seg_sq = dx * dx + dy * dy
+        worst, worst_sq = -1, tolerance_sq
+        for i in range(first + 1, last):
+            px, py = xs[i] - ax, ys[i] - ay
+            if seg_sq:
+                t = (px * dx + py * dy) / seg_sq
+                if t > 1.0:
+                    px, py = px - dx, py - dy
+                elif t > 0.0:
+                    px, py = px - t * dx, py - t * dy
+            d_sq = px * px + py * py
+            if d_sq > worst_sq:
+                worst, worst_sq = i, d_sq
+        if worst > 0:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [p for p, k in zip(kept, keep) if k]
+
+
+def simplify_for_zoom(points: list[list[float]], zoom: int) -> list[list[float]]:
+    if len(points) < 3:
+        return points
+    return simplify(points, tolerance_meters(zoom, points[0][0]))
+
+
+def _encode_value(value: int, out: list[str]) -> None:
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_polyline(points: list[list[float]]) -> str:
+    """Google's encoded polyline format (1e-5 degree precision); inverse of decode_polyline."""
+    out: list[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = round(lat * 1e5), round(lng * 1e5)
+        _encode_value(ilat - prev_lat, out)
+        _encode_value(ilng - prev_lng, out)
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
+
+
+def _decode_bytes(data: bytes) -> array:
+    """Pure-Python decode straight off the bytes buffer into one preallocated array('d').
+
+    Every point takes at least two bytes, so len // 2 points is an upper bound; the unused tail
+    is trimmed at the end instead of growing a list per point.
+    """
+    out = array("d", bytes(8 * (len(data) // 2 * 2)))
+    n = 0
+    lat = lng = 0
+    index, end = 0, len(data)
+    while index < end:
+        shift = result = 0
+        while True:
+            b = data[index] - 63
+            index += 1
+            result |= (b & 0x1F) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        lat += ~(result >> 1) if result & 1 else result >> 1
+
+        shift = result = 0
+        while True:
+            b = data[index] - 63
+            index += 1
+            result |= (b & 0x1F) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        lng += ~(result >> 1) if result & 1 else result >> 1
+
+        out[n] = lat / 1e5
+        out[n + 1] = lng / 1e5
+        n += 2
+    del out[n:]
+    return out
+
+
+def decode_polyline(encoded: str | bytes) -> array:
+    """Decode a Google encoded polyline into a flat array('d') [lat0, lng0, lat1, lng1, ...].
+
+    Long polylines go through the vectorized decoder when numpy is installed.
+    """
+    data = encoded.encode("ascii") if isinstance(encoded, str) else encoded
+    np = _numpy()
+    if np is not None and len(data) >= VECTORIZE_MIN_BYTES:
+        out = array("d")
+        out.frombytes(memoryview(_decode_many_numpy(np, data, [0])[0]).cast("B"))
+        return out
+    return _decode_bytes(data)
+
+
+def as_points(coords) -> list[list[float]]:
+    """List-of-[lat, lng] view of a flat coordinate array (the format RouteAssignment.polyline uses)."""
+    it = iter(coords)
+    return [[lat, lng] for lat, lng in zip(it, it)]
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np
+
+
+def _decode_many_numpy(np, data: bytes, starts: list[int]) -> tuple:
+    """Vectorized decode of concatenated polylines; `starts` are each one's byte offset.
+
+    Returns numpy arrays (coords, point_offsets): polyline i is points point_offsets[i] up to
+    point_offsets[i + 1]. Each value is assembled from its first 5-bit chunk, then only the values
+    still running get their next chunk, pass by pass: road deltas rarely need more than two bytes,
+    so this touches the data about twice instead of building full-size shift arrays. int32 throughout: a 1e-5
+    degree coordinate needs 26 bits, so neither the shifted chunks nor the running sums overflow.
+    """
+    chunks = np.frombuffer(data, dtype=np.uint8) - np.uint8(63)
+    ends = np.flatnonzero(chunks < 0x20)  # last 5-bit chunk of each value
+    coords = np.empty(len(ends), dtype=np.float64)
+    # A polyline's first value is the count of values ending before its first byte
+    point_offsets = np.searchsorted(ends, np.asarray(starts + [len(chunks)])) // 2
+    if not len(ends):
+        return coords, point_offsets
+    chunks &= 0x1F
+    firsts = np.empty_like(ends)
+    firsts[0] = 0
+    firsts[1:] = ends[:-1] + 1
+    raw = chunks[firsts].astype(np.int32)
+    running = np.flatnonzero(firsts < ends)
+    shift = 5
+    while len(running):
+        positions = firsts[running] + shift // 5
+        raw[running] |= chunks[positions].astype(np.int32) << shift
+        running = running[positions < ends[running]]
+        shift += 5
+    del chunks, firsts
+    deltas = (raw >> 1) ^ -(raw & 1)
+
+    for column in (0, 1):
+        totals = np.cumsum(deltas[column::2], dtype=np.int32)
+        if len(starts) > 1:
+            base = np.concatenate(([0], totals))[point_offsets[:-1]]
+            totals -= np.repeat(base, np.diff(point_offsets)).astype(np.int32)
+        np.divide(totals, 1e5, out=coords[column::2])
+    return coords, point_offsets
+
+
+def decode_polylines(encoded: list[str | bytes]) -> tuple[array, array]:
+    """Batch decode: (coords, offsets) where polyline i is coords[offsets[i]:offsets[i + 1]].
+
+    With numpy installed, polylines are decoded in vectorized passes over up to BATCH_CHUNK_BYTES
+    of them at a time, each appended to the shared buffer: short routes share a pass, and the
+    temporaries stay cache-sized however big the batch is. Without numpy each polyline is decoded
+    off its bytes and appended.
+    """
+    parts = [e.encode("ascii") if isinstance(e, str) else e for e in encoded]
+    np = _numpy()
+    if np is None:
+        coords, offsets = array("d"), array("q", [0])
+        for part in parts:
+            coords.extend(_decode_bytes(part))
+            offsets.append(len(coords))
+        return coords, offsets
+
+    out, offsets = array("d"), array("q", [0])
+    first = 0
+    while first < len(parts):
+        last, size = first + 1, len(parts[first])
+        while last < len(parts) and size + len(parts[last]) <= BATCH_CHUNK_BYTES:
+            size += len(parts[last])
+            last += 1
+        starts, total = [], 0
+        for part in parts[first:last]:
+            starts.append(total)
+            total += len(part)
+        data = parts[first] if last == first + 1 else b"".join(parts[first:last])
+        coords, point_offsets = _decode_many_numpy(np, data, starts)
+        # Appended while the pass is still in cache; the shared buffer grows in place
+        offsets.extend((len(out) + 2 * point_offsets[1:]).tolist())
+        out.frombytes(memoryview(coords).cast("B"))
+        first = last
+    return out, offsets
+
+
+@dataclass(frozen=True)
+class GeometryOptions:
+    """How route geometry goes out with a result.
+
+    lazy: no polylines at all (fetched per vehicle from /routes/...); encoded: Google polyline
+    strings in `encoded_polyline` instead of float arrays; zoom: simplify for this map zoom
+    (None → full resolution).
+    """
+
+    lazy: bool = False
+    encoded: bool = False
+    zoom: int | None = None
+
+    @property
+    def reshapes(self) -> bool:
+        """Whether shape() does any work: CPU-bound on long routes, so callers run it in a thread."""
+        return self.encoded or self.zoom is not None
+
+    def shape(self, polyline: list[list[float]]) -> tuple[list[list[float]], str]:
+        """(points, encoded) for one polyline; exactly one of them is non-empty when there is geometry."""
+        points = polyline
+        if self.zoom is not None and len(polyline) >= SIMPLIFY_MIN_POINTS:
+            points = simplify_for_zoom(polyline, self.zoom)
+        if self.encoded:
+            return [], encode_polyline(points)
+        return points, ""
+
+    def apply(self, assignments: list[RouteAssignment]) -> list[RouteAssignment]:
+        out = []
+        for a in assignments:
+            if not a.polyline:
+                out.append(a)
+                continue
+            points, encoded = self.shape(a.polyline)
+            out.append(a.model_copy(update={"polyline": points, "encoded_polyline": encoded}))
+        return out
@@ -0,0 +1,125 @@
+"""Local repair of Claude's route plans: salvage truncated JSON, drop unknown IDs, insert missing rides."""
+
+import json
+
+from .geo import haversine_miles
+from .heuristic import is_eligible
+from .models import Ride, Vehicle, VehicleStatus, OptimizationResult, RouteAssignment
+
+
+# How many trailing elements we are willing to cut off a truncated JSON document
+MAX_SALVAGE_CUTS = 8
+
+INSERTED_REASONING = "Inserted by local repair (missing from the model's plan)."
+
+
+def _close_open_json(text: str) -> str:
+    """Append the quotes/brackets needed to close whatever is still open at the end of `text`."""
+    stack: list[str] = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    closed = text + ('"' if in_string else "")
+    return closed.rstrip().rstrip(",:") + "".join(reversed(stack))
+
+
+def loads_lenient(raw: str):
+    """json.loads, falling back to closing a truncated document (e.g. cut off at max_tokens).
+
+    Partial trailing elements are cut back to the previous comma until the document parses.
+    Raises the original JSONDecodeError if nothing can be salvaged.
+    """
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        error = e
+    cut = len(raw)
+    for _ in range(MAX_SALVAGE_CUTS):
+        try:
+            return json.loads(_close_open_json(raw[:cut]))
+        except json.JSONDecodeError:
+            cut = raw.rfind(",", 0, cut)
+            if cut <= 0:
+                break
+    raise error
+
+
+def _insertion_cost(route: list[Ride], vehicle: Vehicle, ride: Ride) -> float:
+    """Extra deadhead miles from appending `ride` after the vehicle's last dropoff."""
+    if route:
+        lat, lng = route[-1].dropoff_lat, route[-1].dropoff_lng
+    else:
+        lat, lng = vehicle.current_lat, vehicle.current_lng
+    return haversine_miles(lat, lng, ride.pickup_lat, ride.pickup_lng)
+
+
+def repair_plan(data: dict, rides: list[Ride], vehicles: list[Vehicle]) -> tuple[OptimizationResult, dict[str, int]]:
+    """Turn a possibly-invalid plan dict into a complete OptimizationResult.
+
+    Unknown vehicle IDs, unknown ride IDs and duplicate rides are dropped; every ride left out is
+    appended to the cheapest eligible available vehicle. Returns (result, repair_counts) where
+    repair_counts only lists the repairs that were actually needed.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("assignments"), list):
+        raise ValueError("Plan has no assignments list")
+
+    ride_map = {r.id: r for r in rides}
+    vehicle_map = {v.id: v for v in vehicles}
+    counts = {"unknown_vehicles": 0, "unknown_rides": 0, "duplicate_rides": 0, "inserted_rides": 0}
+
+    routes: dict[str, list[Ride]] = {}
+    reasoning: dict[str, str] = {}
+    seen: set[str] = set()
+    for a in data["assignments"]:
+        if not isinstance(a, dict) or a.get("vehicle_id") not in vehicle_map:
+            counts["unknown_vehicles"] += 1
+            continue
+        vid = a["vehicle_id"]
+        route = routes.setdefault(vid, [])
+        reasoning[vid] = " ".join(filter(None, [reasoning.get(vid), str(a.get("reasoning") or "")]))
+        for rid in a.get("ride_ids_in_order") or []:
+            if rid not in ride_map:
+                counts["unknown_rides"] += 1
+            elif rid in seen:
+                counts["duplicate_rides"] += 1
+            else:
+                seen.add(rid)
+                route.append(ride_map[rid])
+
+    available = [v for v in vehicles if v.status == VehicleStatus.AVAILABLE] or vehicles
+    for ride in rides:
+        if ride.id in seen or not available:
+            continue
+        candidates = [v for v in available if is_eligible(ride, v)] or [
+            max(available, key=lambda v: (v.capacity, v.luggage_capacity))
+        ]
+        chosen = min(candidates, key=lambda v: _insertion_cost(routes.get(v.id, []), v, ride))
+        routes.setdefault(chosen.id, []).append(ride)
+        if INSERTED_REASONING not in reasoning.get(chosen.id, ""):
+            reasoning[chosen.id] = " ".join(filter(None, [reasoning.get(chosen.id), INSERTED_REASONING]))
+        seen.add(ride.id)
+        counts["inserted_rides"] += 1
+
+    result = OptimizationResult(
+        assignments=[
+            RouteAssignment(vehicle_id=vid, ride_ids_in_order=[r.id for r in route], reasoning=reasoning.get(vid, ""))
+            for vid, route in routes.items()
+            if route
+        ],
+        overall_strategy=str(data.get("overall_strategy") or ""),
+        unassigned_rides=[r.id for r in rides if r.id not in seen],
+    )
+    return result, {k: v for k, v in counts.items() if v}
@@ -0,0 +1,162 @@
+"""Optimization runs kept for on-demand route geometry.
+
+Every finished plan is stored as a RouteRun so the map can fetch each vehicle's road polyline when
+it needs it (GET /routes/{run_id}/{vehicle_id}/polyline) instead of the result waiting on one
+Directions call per route. Fetched routes are cached on the run, concurrent requests for the
+same route share one call, and prefetch() walks the fleet in viewport order in the background.
+
+Runs live in this process's memory, so /routes/... only works where follow-up requests reach the
+process that served the plan. Serverless deployments (api/index.py on Vercel, which sets VERCEL)
+make no such promise, so there the store is off: runs aren't kept, and lazy requests get their
+geometry inline instead (see finalize_plan).
+"""
+
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from .directions import RouteGeometry, get_route
+from .metrics import metrics
+from .models import Ride, Vehicle, RouteAssignment
+
+
+ROUTE_RUNS_RETAIN = int(os.environ.get("ROUTE_RUNS_RETAIN", "256"))  # runs kept for polyline lookups
+# "memory" keeps runs in this process; "off" disables /routes/... and lazy polylines
+ROUTE_STORE = os.environ.get("ROUTE_STORE", "off" if os.environ.get("VERCEL") else "memory")
+PREFETCH_CONCURRENCY = 4  # Directions calls in flight per run while prefetching
+
+Viewport = tuple[float, float, float, float]  # south, west, north, east
+
+
+def build_waypoints(assignment: RouteAssignment, rides: list[Ride], vehicles: list[Vehicle]) -> list[tuple[float, float]]:
+    """Build ordered waypoints for a vehicle's route: vehicle pos → pickup1 → dropoff1 → pickup2 → dropoff2 ..."""
+    ride_map = {r.id: r for r in rides}
+    vehicle = next((v for v in vehicles if v.id == assignment.vehicle_id), None)
+    if not vehicle:
+        return []
+
+    waypoints: list[tuple[float, float]] = [(vehicle.current_lat, vehicle.current_lng)]
+    for ride_id in assignment.ride_ids_in_order:
+        ride = ride_map.get(ride_id)
+        if ride:
+            waypoints.append((ride.pickup_lat, ride.pickup_lng))
+            waypoints.append((ride.dropoff_lat, ride.dropoff_lng))
+    return waypoints
+
+
+def _in_viewport(point: tuple[float, float], viewport: Viewport) -> bool:
+    south, west, north, east = viewport
+    return south <= point[0] <= north and west <= point[1] <= east
+
+
+@dataclass
+class RouteRun:
+    id: str
+    rides: list[Ride]
+    vehicles: list[Vehicle]
+    plans: dict[str, dict[str, RouteAssignment]]  # plan → vehicle_id → assignment
+    routes: dict[tuple[str, str], RouteGeometry] = field(default_factory=dict)
+    _pending: dict[tuple[str, str], asyncio.Task] = field(default_factory=dict, repr=False)
+    _queue: list[tuple[str, str]] = field(default_factory=list, repr=False)
+    _workers: set[asyncio.Task] = field(default_factory=set, repr=False)
+
+    def waypoints(self, plan: str, vehicle_id: str) -> list[tuple[float, float]]:
+        return build_waypoints(self.plans[plan][vehicle_id], self.rides, self.vehicles)
+
+    async def _fetch(self, key: tuple[str, str]) -> RouteGeometry:
+        route = await get_route(self.waypoints(*key))
+        # Straight-line segments mean Directions was unavailable: serve them, but try again next time
+        if not route.fallback:
+            self.routes[key] = route
+        metrics.incr("route_polylines_fetched", plan=key[0])
+        return route
+
+    async def route(self, plan: str, vehicle_id: str) -> RouteGeometry:
+        """Road geometry for one route: cached, joined to an in-flight fetch, or fetched now."""
+        key = (plan, vehicle_id)
+        if key in self.routes:
+            metrics.incr("route_polyline_cache_hits")
+            return self.routes[key]
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shielded: a client that hangs up doesn't cancel the fetch other callers are waiting on
+        return await asyncio.shield(task)
+
+    def prefetch_order(
+        self, plan: str, viewport: Viewport | None = None, vehicle_ids: list[str] | None = None
+    ) -> list[str]:
+        """Vehicles to fetch, most wanted first: named ones, then routes touching the viewport,
+        then the rest by distance of their start from the viewport centre."""
+        assignments = self.plans[plan]
+        named = [vid for vid in dict.fromkeys(vehicle_ids or []) if vid in assignments]
+        rest = [vid for vid in assignments if vid not in named]
+        if viewport is not None:
+            center = ((viewport[0] + viewport[2]) / 2, (viewport[1] + viewport[3]) / 2)
+
+            def rank(vid: str) -> tuple[bool, float]:
+                points = self.waypoints(plan, vid)
+                visible = any(_in_viewport(p, viewport) for p in points)
+                start = points[0] if points else center
+                return not visible, (start[0] - center[0]) ** 2 + (start[1] - center[1]) ** 2
+
+            rest.sort(key=rank)
+        return named + rest
+
+    def prefetch(self, plan: str, viewport: Viewport | None = None, vehicle_ids: list[str] | None = None) -> list[str]:
+        """Fetch uncached polylines in the background in prefetch_order, replacing any earlier order
+        (the viewport moved). Returns the vehicle IDs queued."""
+        order = [
+            vid for vid in self.prefetch_order(plan, viewport, vehicle_ids)
+            if (plan, vid) not in self.routes and (plan, vid) not in self._pending
+        ]
+        self._queue[:] = [(plan, vid) for vid in order]
+        while len(self._workers) < min(PREFETCH_CONCURRENCY, len(self._queue)):
+            worker = asyncio.ensure_future(self._drain())
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+        return order
+
+    async def _drain(self) -> None:
+        while self._queue:
+            await self.route(*self._queue.pop(0))
+
+    async def wait_prefetched(self) -> None:
+        """Until the background prefetch queue is empty (tests, batch callers)."""
+        while self._workers:
+            await asyncio.gather(*self._workers)
+
+
+class RouteStore:
+    """The last ROUTE_RUNS_RETAIN runs, oldest evicted first. `enabled` is False where runs can't be kept."""
+
+    def __init__(self, retain: int = ROUTE_RUNS_RETAIN, enabled: bool = ROUTE_STORE == "memory"):
+        self.retain = retain
+        self.enabled = enabled
+        self.runs: OrderedDict[str, RouteRun] = OrderedDict()
+
+    def add(
+        self, rides: list[Ride], vehicles: list[Vehicle], plans: dict[str, list[RouteAssignment]]
+    ) -> RouteRun:
+        """Register a finished plan. Eagerly fetched geometry is already in the Directions segment
+        cache, so the first lookup of each route is cheap."""
+        run = RouteRun(
+            id=uuid.uuid4().hex[:12],
+            rides=rides,
+            vehicles=vehicles,
+            plans={plan: {a.vehicle_id: a for a in assignments} for plan, assignments in plans.items()},
+        )
+        self.runs[run.id] = run
+        while len(self.runs) > self.retain:
+            self.runs.popitem(last=False)
+        return run
+
+    def get(self, run_id: str) -> RouteRun | None:
+        return self.runs.get(run_id)
+
+
+route_store = RouteStore()
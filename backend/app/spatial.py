@@ -0,0 +1,172 @@
+"""Grid spatial index over lat/lng points: k-nearest and radius queries without a full scan.
+
+Points are projected onto a local equirectangular plane (miles) and bucketed into square cells.
+Queries walk rings of cells outward from the query point and refine candidates with the exact
+haversine distance, so results match a brute-force scan. The projection shrinks east-west
+distances by cos(lat) / cos(ref_lat), so the ring bounds are scaled by the smallest cos(lat)
+the index or query covers; that keeps them true lower bounds at regional scale too. Build one per request from the problem's
+coordinates; insert/remove keep it current as vehicles move.
+"""
+
+import math
+from collections.abc import Callable, Hashable, Iterable
+
+from .columnar import RideColumns, VehicleColumns
+from .geo import haversine_miles
+from .models import Ride, Vehicle, VehicleStatus
+
+
+DEFAULT_CELL_MILES = 0.5
+MILES_PER_DEGREE_LAT = 69.05
+# Covers the small-angle error of the projected bound (under 1% for longitude spans below ~25°)
+PROJECTION_SLACK = 0.99
+
+
+class GridIndex:
+    def __init__(self, cell_miles: float = DEFAULT_CELL_MILES, ref_lat: float = 45.5):
+        self.cell_miles = cell_miles
+        self.ref_lat = ref_lat
+        self._miles_per_degree_lng = MILES_PER_DEGREE_LAT * math.cos(math.radians(ref_lat))
+        self._cells: dict[tuple[int, int], dict[Hashable, tuple[float, float]]] = {}
+        self._where: dict[Hashable, tuple[int, int]] = {}
+        self._bounds: tuple[int, int, int, int] | None = None  # min cx, min cy, max cx, max cy seen
+        self._max_abs_lat = abs(ref_lat)  # farthest from the equator seen: where cos(lat) is smallest
+
+    @classmethod
+    def from_points(cls, points: Iterable[tuple[Hashable, float, float]], cell_miles: float = DEFAULT_CELL_MILES) -> "GridIndex":
+        points = list(points)
+        ref_lat = sum(p[1] for p in points) / len(points) if points else 45.5
+        index = cls(cell_miles, ref_lat)
+        for key, lat, lng in points:
+            index.insert(key, lat, lng)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return (
+            math.floor(lng * self._miles_per_degree_lng / self.cell_miles),
+            math.floor(lat * MILES_PER_DEGREE_LAT / self.cell_miles),
+        )
+
+    def insert(self, key: Hashable, lat: float, lng: float) -> None:
+        """Add a point, or move it if `key` is already indexed."""
+        if key in self._where:
+            self.remove(key)
+        cell = self._cell(lat, lng)
+        self._max_abs_lat = max(self._max_abs_lat, abs(lat))
+        self._cells.setdefault(cell, {})[key] = (lat, lng)
+        self._where[key] = cell
+        cx, cy = cell
+        if self._bounds is None:
+            self._bounds = (cx, cy, cx, cy)
+        else:
+            x0, y0, x1, y1 = self._bounds
+            self._bounds = (min(x0, cx), min(y0, cy), max(x1, cx), max(y1, cy))
+
+    def remove(self, key: Hashable) -> None:
+        cell = self._where.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def _ring_miles(self, lat: float) -> float:
+        """Lower bound on the true distance from a query at `lat` to anything one more ring out."""
+        cos_min = math.cos(math.radians(min(89.9, max(self._max_abs_lat, abs(lat)))))
+        scale = min(1.0, cos_min / math.cos(math.radians(self.ref_lat)))
+        return self.cell_miles * scale * PROJECTION_SLACK
+
+    def _ring(self, center: tuple[int, int], r: int) -> Iterable[tuple[int, int]]:
+        cx, cy = center
+        if r == 0:
+            yield center
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def _max_ring(self, center: tuple[int, int]) -> int:
+        if self._bounds is None:
+            return -1
+        x0, y0, x1, y1 = self._bounds
+        cx, cy = center
+        return max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 1,
+        max_miles: float | None = None,
+        predicate: Callable[[Hashable], bool] | None = None,
+    ) -> list[tuple[Hashable, float]]:
+        """Up to k (key, miles) pairs closest to (lat, lng), nearest first.
+
+        `predicate` filters candidates (e.g. eligibility); `max_miles` caps the search radius.
+        """
+        center = self._cell(lat, lng)
+        ring_miles = self._ring_miles(lat)
+        found: list[tuple[float, Hashable]] = []
+        last_ring = self._max_ring(center)
+        for r in range(last_ring + 1):
+            for cell in self._ring(center, r):
+                for key, (plat, plng) in self._cells.get(cell, {}).items():
+                    if predicate is not None and not predicate(key):
+                        continue
+                    found.append((haversine_miles(lat, lng, plat, plng), key))
+            # Anything in ring r+1 or beyond is at least r cells away from the query point
+            bound = r * ring_miles
+            if max_miles is not None and bound > max_miles:
+                break
+            if len(found) >= k:
+                found.sort(key=lambda f: f[0])
+                if found[k - 1][0] <= bound:
+                    break
+        found.sort(key=lambda f: f[0])
+        if max_miles is not None:
+            found = [f for f in found if f[0] <= max_miles]
+        return [(key, d) for d, key in found[:k]]
+
+    def within(self, lat: float, lng: float, miles: float) -> list[tuple[Hashable, float]]:
+        """All (key, miles) pairs within `miles` of (lat, lng), nearest first."""
+        center = self._cell(lat, lng)
+        rings = min(math.ceil(miles / self._ring_miles(lat)), self._max_ring(center))
+        found = []
+        for r in range(rings + 1):
+            for cell in self._ring(center, r):
+                for key, (plat, plng) in self._cells.get(cell, {}).items():
+                    d = haversine_miles(lat, lng, plat, plng)
+                    if d <= miles:
+                        found.append((key, d))
+        found.sort(key=lambda f: f[1])
+        return found
+
+
+def vehicle_index(vehicles: list[Vehicle] | VehicleColumns, cell_miles: float = DEFAULT_CELL_MILES) -> GridIndex:
+    """Index of available vehicles' current positions, keyed by vehicle ID."""
+    if isinstance(vehicles, VehicleColumns):
+        available = vehicles.code("status", VehicleStatus.AVAILABLE)
+        points = (
+            p[:3] for p in zip(vehicles.id, vehicles.current_lat, vehicles.current_lng, vehicles.status)
+            if p[3] == available
+        )
+    else:
+        points = ((v.id, v.current_lat, v.current_lng) for v in vehicles if v.status == VehicleStatus.AVAILABLE)
+    return GridIndex.from_points(points, cell_miles)
+
+
+def pickup_index(rides: list[Ride] | RideColumns, cell_miles: float = DEFAULT_CELL_MILES) -> GridIndex:
+    """Index of ride pickups, keyed by ride ID."""
+    if isinstance(rides, RideColumns):
+        return GridIndex.from_points(zip(rides.id, rides.pickup_lat, rides.pickup_lng), cell_miles)
+    return GridIndex.from_points(((r.id, r.pickup_lat, r.pickup_lng) for r in rides), cell_miles)
@@ -0,0 +1,74 @@
+"""Memory and construction time: list[Ride] vs RideColumns, 50k-ride historical batch.
+
+"bytes/ride" is tracemalloc's count of what each representation keeps alive. Construction
+starts from the JSON-decoded records (one dict per ride, as json.loads of an upload gives)
+and is best of REPEATS; "to models" is the way back from columns.
+
+    cd backend && uv run python -m benchmarks.bench_columnar
+"""
+
+import json
+import time
+import tracemalloc
+
+from pydantic import TypeAdapter
+
+from app.columnar import RideColumns
+from app.matching import first_leg_cost_matrix
+from app.models import Ride
+from app.spatial import pickup_index
+from tests.synthetic import make_batch
+
+N_RIDES = 50_000
+N_VEHICLES = 200
+REPEATS = 3
+
+
+def best_ms(fn, repeats: int = REPEATS) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def retained_bytes(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main() -> None:
+    rides, vehicles = make_batch(N_RIDES, N_VEHICLES)
+    records = json.loads(TypeAdapter(list[Ride]).dump_json(rides))
+    columns = RideColumns.from_records(records)
+    print(f"{N_RIDES:,} rides, {N_VEHICLES} vehicles\n")
+
+    rows = [
+        ("list[Ride]", lambda: TypeAdapter(list[Ride]).validate_python(records)),
+        ("RideColumns", lambda: RideColumns.from_records(records)),
+    ]
+    print(f"{'representation':<16}{'bytes/ride':>12}{'build ms':>10}")
+    for name, build in rows:
+        print(f"{name:<16}{retained_bytes(build) / N_RIDES:>12.0f}{best_ms(build):>10.0f}")
+    print(f"{'columns → models':<16}{'':>12}{best_ms(columns.to_models):>10.0f}")
+    print(f"{'models → columns':<16}{'':>12}{best_ms(lambda: RideColumns.from_models(rides)):>10.0f}")
+
+    print(f"\n{'routine':<28}{'list ms':>9}{'columns ms':>12}")
+    subset = rides[:5_000]
+    for name, fn in [
+        ("pickup_index", pickup_index),
+        ("first_leg_cost_matrix (5k)", lambda r: first_leg_cost_matrix(r, vehicles)),
+    ]:
+        arg = columns if name == "pickup_index" else RideColumns.from_models(subset)
+        models = rides if name == "pickup_index" else subset
+        print(f"{name:<28}{best_ms(lambda: fn(models)):>9.0f}{best_ms(lambda: fn(arg)):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
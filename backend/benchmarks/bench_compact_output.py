@@ -0,0 +1,108 @@
+"""Output size of the full vs compact (index-only) plan contracts.
+
+Offline (default): renders the plan each contract would produce for the same assignment — the local
+heuristic's — and estimates output tokens and generation time from a fixed decode rate.
+--live: sends both prompts to Claude and reports measured usage.output_tokens and wall time.
+
+    cd backend && uv run python -m benchmarks.bench_compact_output [--live]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+
+from app.heuristic import greedy_assign
+from app.optimizer import (
+    CLAUDE_MODEL, COMPACT_PLAN_TOOL, MAX_TOKENS, ROUTE_PLAN_TOOL, THINKING_BUDGET, build_prompt,
+)
+from app.seed import SCENARIOS
+from tests.synthetic import make_batch
+
+# Typical decode throughput for the model; only used for the offline time estimate
+OUTPUT_TOKENS_PER_SECOND = 60.0
+
+# Representative per-vehicle reasoning and strategy, at the length Claude usually writes them
+SAMPLE_REASONING = (
+    "Reserved this vehicle for the largest party because it is the only one with enough seats; "
+    "the remaining pickups sit in the same neighborhood cluster, sequenced so each dropoff is "
+    "close to the next pickup to minimize deadhead miles while keeping urgent rides first."
+)
+SAMPLE_STRATEGY = (
+    "Reserved the high-capacity vehicles for the large parties and heavy-luggage airport runs. "
+    "Clustered the remaining rides geographically and ordered each route by priority and time window."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE-like count: identifier/number runs and individual punctuation marks."""
+    return len(re.findall(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]", text))
+
+
+def full_output(assignments) -> str:
+    return json.dumps({
+        "assignments": [
+            {"vehicle_id": a.vehicle_id, "ride_ids_in_order": a.ride_ids_in_order, "reasoning": SAMPLE_REASONING}
+            for a in assignments
+        ],
+        "overall_strategy": SAMPLE_STRATEGY,
+        "unassigned_rides": [],
+    })
+
+
+def compact_output(assignments, rides, vehicles) -> str:
+    ride_index = {r.id: i for i, r in enumerate(rides)}
+    vehicle_index = {v.id: i for i, v in enumerate(vehicles)}
+    return json.dumps({
+        "routes": [[vehicle_index[a.vehicle_id]] + [ride_index[rid] for rid in a.ride_ids_in_order] for a in assignments],
+        "strategy": SAMPLE_STRATEGY.split(". ")[0] + ".",
+    }, separators=(",", ":"))
+
+
+def batches():
+    for key, s in SCENARIOS.items():
+        yield key, s["rides"], s["vehicles"]
+    yield "synthetic_200", *make_batch(200, 20)
+
+
+def offline() -> None:
+    print(f"{'batch':<16}{'rides':>6}{'full tok':>10}{'compact tok':>13}{'cut':>7}{'full s':>9}{'compact s':>11}")
+    for name, rides, vehicles in batches():
+        assignments = greedy_assign(rides, vehicles)
+        full = estimate_tokens(full_output(assignments))
+        compact = estimate_tokens(compact_output(assignments, rides, vehicles))
+        print(
+            f"{name:<16}{len(rides):>6}{full:>10}{compact:>13}{1 - compact / full:>7.0%}"
+            f"{full / OUTPUT_TOKENS_PER_SECOND:>9.1f}{compact / OUTPUT_TOKENS_PER_SECOND:>11.1f}"
+        )
+
+
+async def live() -> None:
+    import anthropic
+
+    client = anthropic.AsyncAnthropic()
+    print(f"{'batch':<16}{'format':<9}{'output tok':>11}{'seconds':>9}")
+    for name, rides, vehicles in batches():
+        for compact in (False, True):
+            start = time.perf_counter()
+            message = await client.messages.create(
+                model=CLAUDE_MODEL,
+                max_tokens=MAX_TOKENS,
+                thinking={"type": "enabled", "budget_tokens": THINKING_BUDGET},
+                tools=[COMPACT_PLAN_TOOL if compact else ROUTE_PLAN_TOOL],
+                messages=[{"role": "user", "content": build_prompt(rides, vehicles, compact=compact)}],
+            )
+            elapsed = time.perf_counter() - start
+            label = "compact" if compact else "full"
+            print(f"{name:<16}{label:<9}{message.usage.output_tokens:>11}{elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="call Claude (needs ANTHROPIC_API_KEY)")
+    args = parser.parse_args()
+    if args.live:
+        asyncio.run(live())
+    else:
+        offline()
@@ -0,0 +1,31 @@
+"""First-leg matching time: vectorized cost matrix + linear_sum_assignment on square fleets.
+
+    cd backend && uv run --extra solver python -m benchmarks.bench_matching
+"""
+
+import time
+
+from app.matching import first_leg_cost_matrix, match_first_leg
+from tests.synthetic import make_batch
+
+SIZES = [50, 100, 250, 500, 1000]
+REPEATS = 5
+
+
+def main() -> None:
+    print(f"{'size':>10}{'matrix ms':>11}{'total ms':>10}{'matched':>9}")
+    for n in SIZES:
+        rides, vehicles = make_batch(n, n)
+        matrix_ms = total_ms = float("inf")
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            first_leg_cost_matrix(rides, vehicles)
+            matrix_ms = min(matrix_ms, (time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            assignments = match_first_leg(rides, vehicles)
+            total_ms = min(total_ms, (time.perf_counter() - start) * 1000)
+        print(f"{f'{n}x{n}':>10}{matrix_ms:>11.1f}{total_ms:>10.1f}{len(assignments):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Result payload size and serialization time: raw vs simplified vs encoded polylines, 50-vehicle plan.
+
+Routes are synthetic road-like paths (winding grid streets sampled every ~50 m) through each
+vehicle's waypoints, so both plans carry thousands of points per route the way decoded
+Directions polylines do.
+
+    cd backend && uv run python -m benchmarks.bench_polyline
+"""
+
+import json
+import math
+import random
+import time
+
+from app.directions import _decode_polyline
+from app.heuristic import greedy_assign
+from app.optimizer import naive_assign
+from app.polyline import GeometryOptions
+from app.route_store import build_waypoints
+from tests.synthetic import make_batch
+
+N_RIDES = 250
+N_VEHICLES = 50
+STEP_DEGREES = 0.0005  # ~50 m between points
+WIGGLE_DEGREES = 0.0001  # streets bend up to ~10 m off the straight line
+REPEATS = 5
+
+
+def road_like(waypoints, rng: random.Random) -> list[list[float]]:
+    """Winding grid-street path between consecutive waypoints: north/south first, then east/west."""
+    points = [[waypoints[0][0], waypoints[0][1]]]
+    for (lat1, lng1), (lat2, lng2) in zip(waypoints, waypoints[1:]):
+        for start, end, axis in ((lat1, lat2, 0), (lng1, lng2, 1)):
+            steps = max(1, int(abs(end - start) / STEP_DEGREES))
+            base = points[-1][1 - axis]
+            period = rng.uniform(10, 40)  # points per bend
+            for i in range(1, steps + 1):
+                point = [0.0, 0.0]
+                point[axis] = start + (end - start) * i / steps
+                point[1 - axis] = base + WIGGLE_DEGREES * math.sin(math.pi * i / period) * (i < steps)
+                points.append(point)
+    return points
+
+
+def payload(optimized, naive) -> dict:
+    return {
+        "result": {"assignments": [a.model_dump() for a in optimized], "overall_strategy": "", "unassigned_rides": []},
+        "naive_assignments": [a.model_dump() for a in naive],
+    }
+
+
+def main() -> None:
+    rng = random.Random(3)
+    rides, vehicles = make_batch(N_RIDES, N_VEHICLES)
+    plans = []
+    for assignments in (greedy_assign(rides, vehicles), naive_assign(rides, vehicles)[0]):
+        plans.append([
+            a.model_copy(update={"polyline": road_like(build_waypoints(a, rides, vehicles), rng)})
+            for a in assignments
+        ])
+    total_points = sum(len(a.polyline) for plan in plans for a in plan)
+    print(f"{len(plans[0])} optimized + {len(plans[1])} naive routes, {total_points:,} points\n")
+
+    modes = [("raw points", None)] + [
+        (f"simplified z{zoom}", GeometryOptions(zoom=zoom)) for zoom in (16, 14, 12)
+    ] + [("encoded z16", GeometryOptions(zoom=16, encoded=True)), ("encoded z12", GeometryOptions(zoom=12, encoded=True))]
+
+    print(f"{'mode':<16}{'points':>10}{'bytes':>12}{'shape ms':>10}{'json ms':>9}{'size':>7}")
+    baseline = None
+    for name, options in modes:
+        start = time.perf_counter()
+        shaped = plans if options is None else [options.apply(plan) for plan in plans]
+        shape_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            body = json.dumps(payload(*shaped)).encode()
+        json_ms = (time.perf_counter() - start) * 1000 / REPEATS
+        points = sum(len(a.polyline) or len(_decode_polyline(a.encoded_polyline)) for plan in shaped for a in plan)
+        baseline = baseline or len(body)
+        print(f"{name:<16}{points:>10,}{len(body):>12,}{shape_ms:>10.1f}{json_ms:>9.1f}{len(body) / baseline:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Polyline decode: per-character ord() into a list per point vs the bytes/array decoder vs batch.
+
+10k-point synthetic road polylines (the size a long Directions route decodes to), one route and
+a 50-route batch, plus 200 short routes (300 points, under the vectorizing threshold on their
+own). "pure Python" rows force the no-numpy path. Peak memory is tracemalloc's high-water mark
+for the decoded result. Fails if the batch decoder is slower than decoding route by route.
+
+    cd backend && uv run python -m benchmarks.bench_polyline_decode
+"""
+
+import random
+import time
+import tracemalloc
+
+from app import polyline
+from app.polyline import as_points, decode_polyline, decode_polylines, encode_polyline
+
+POINTS = 10_000
+ROUTES = 50
+SHORT_POINTS = 300
+SHORT_ROUTES = 200
+REPEATS = 5
+COMPARE_REPEATS = 20
+NOISE = 1.1  # best-of-n timings on a shared machine still jitter by a few percent
+
+
+def decode_ord(encoded: str) -> list[list[float]]:
+    """The original directions._decode_polyline: ord() per character, a fresh list per point."""
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        for is_lng in (False, True):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if is_lng:
+                lng += delta
+            else:
+                lat += delta
+        points.append([lat / 1e5, lng / 1e5])
+    return points
+
+
+def road(rng: random.Random, n: int = POINTS) -> str:
+    lat, lng = 45.5, -122.7
+    points = []
+    for _ in range(n):
+        lat += rng.uniform(-0.0004, 0.0004)
+        lng += rng.uniform(-0.0004, 0.0004)
+        points.append([lat, lng])
+    return encode_polyline(points)
+
+
+def measure(fn) -> tuple[float, int]:
+    """Best-of-REPEATS wall time and the peak traced allocation of one run."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    ms = min(times) * 1000
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return ms, peak
+
+
+def best_interleaved(a, b) -> tuple[float, float]:
+    """Best-of-COMPARE_REPEATS ms for two functions run alternately, so drift hits both alike."""
+    times_a, times_b = [], []
+    for _ in range(COMPARE_REPEATS):
+        for fn, times in ((a, times_a), (b, times_b)):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return min(times_a) * 1000, min(times_b) * 1000
+
+
+def main() -> None:
+    rng = random.Random(7)
+    routes = [road(rng) for _ in range(ROUTES)]
+    short = [road(rng, SHORT_POINTS) for _ in range(SHORT_ROUTES)]
+    one = routes[0]
+    print(f"{POINTS:,} points per route, {len(one):,} encoded bytes\n")
+
+    cases = [
+        ("1 route: ord() -> lists", lambda: decode_ord(one)),
+        ("1 route: array('d')", lambda: decode_polyline(one)),
+        ("1 route: array + list view", lambda: as_points(decode_polyline(one))),
+        (f"{ROUTES} routes: ord() -> lists", lambda: [decode_ord(r) for r in routes]),
+        (f"{ROUTES} routes: array('d') each", lambda: [decode_polyline(r) for r in routes]),
+        (f"{ROUTES} routes: batch", lambda: decode_polylines(routes)),
+        (f"{SHORT_ROUTES} short: array('d') each", lambda: [decode_polyline(r) for r in short]),
+        (f"{SHORT_ROUTES} short: batch", lambda: decode_polylines(short)),
+        ("1 route: pure Python", lambda: polyline._decode_bytes(one.encode())),
+        (f"{ROUTES} routes: batch, pure Python", None),
+    ]
+    print(f"{'decoder':<34}{'ms':>9}{'peak KiB':>11}")
+    numpy = polyline._numpy
+    for name, fn in cases:
+        if fn is None:
+            polyline._numpy = lambda: None
+            fn = lambda: decode_polylines(routes)  # noqa: E731
+        ms, peak = measure(fn)
+        print(f"{name:<34}{ms:>9.2f}{peak / 1024:>11,.0f}")
+    polyline._numpy = numpy
+
+    print()
+    for label, batch in ((f"{ROUTES} routes", routes), (f"{SHORT_ROUTES} short", short)):
+        batch_ms, each_ms = best_interleaved(lambda: decode_polylines(batch), lambda: [decode_polyline(r) for r in batch])
+        print(f"{label}: batch {batch_ms:.2f} ms vs one at a time {each_ms:.2f} ms")
+        assert batch_ms <= each_ms * NOISE, f"{label}: batch decode is slower than decoding one at a time"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Final-result serialization: stdlib json vs pydantic-core vs orjson, 100-vehicle plan.
+
+Both plans carry road-like polylines simplified at the default zoom, as /optimize returns
+them. "stdlib" rows are the old paths: jsonable_encoder + json.dumps for the response
+model, and json.dumps of model_dump() dicts for the SSE result frame.
+
+    cd backend && uv run python -m benchmarks.bench_serialization
+"""
+
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app import serialization
+from app.heuristic import greedy_assign
+from app.models import OptimizationResult, OptimizeResponse
+from app.optimizer import naive_assign
+from app.polyline import GeometryOptions
+from app.route_store import build_waypoints
+from app.serialization import dumps, sse_frame
+from benchmarks.bench_polyline import road_like
+from tests.synthetic import make_batch
+
+N_RIDES = 500
+N_VEHICLES = 100
+REPEATS = 10
+TOKEN_FRAMES = 10_000
+
+
+def best_ms(fn, repeats: int = REPEATS) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main() -> None:
+    rng = random.Random(3)
+    rides, vehicles = make_batch(N_RIDES, N_VEHICLES)
+    plans = [
+        GeometryOptions().apply([
+            a.model_copy(update={"polyline": road_like(build_waypoints(a, rides, vehicles), rng)}) for a in assignments
+        ])
+        for assignments in (greedy_assign(rides, vehicles), naive_assign(rides, vehicles)[0])
+    ]
+    result = OptimizationResult(assignments=plans[0], overall_strategy="", unassigned_rides=[])
+    response = OptimizeResponse(
+        result=result, prompt_used="x" * 20_000, naive_miles=0, optimized_miles=0, naive_assignments=plans[1]
+    )
+    event = {"type": "result", "data": {"result": result, "naive_assignments": plans[1], "prompt_used": "x" * 20_000}}
+
+    def stdlib_response():
+        return json.dumps(jsonable_encoder(response), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    def stdlib_frame():
+        data = {**event["data"], "result": result.model_dump(), "naive_assignments": [a.model_dump() for a in plans[1]]}
+        return f"data: {json.dumps({'type': 'result', 'data': data})}\n\n".encode()
+
+    points = sum(len(a.polyline) for plan in plans for a in plan)
+    print(f"{N_VEHICLES} vehicles, {N_RIDES} rides, {points:,} polyline points, {len(stdlib_response()):,} bytes\n")
+
+    token = {"type": "token", "text": "the van "}
+    rows = [("stdlib", stdlib_response, stdlib_frame, lambda: f"data: {json.dumps(token)}\n\n".encode())]
+    backends = ["pydantic"]
+    try:
+        import orjson  # noqa: F401
+        backends.append("orjson")
+    except ImportError:
+        print("(orjson not installed: pip install '.[fast-json]')\n")
+    for backend in backends:
+        rows.append((backend, lambda: dumps(response), lambda: sse_frame(event), lambda: sse_frame(token)))
+
+    print(f"{'encoder':<10}{'response ms':>13}{'SSE result ms':>15}{'token frame µs':>16}")
+    for backend, encode_response, encode_frame, encode_token in rows:
+        serialization.JSON_BACKEND = backend if backend != "stdlib" else "auto"
+        response_ms = best_ms(encode_response)
+        frame_ms = best_ms(encode_frame)
+        token_us = best_ms(lambda: [encode_token() for _ in range(TOKEN_FRAMES)], 3) * 1000 / TOKEN_FRAMES
+        print(f"{backend:<10}{response_ms:>13.2f}{frame_ms:>15.2f}{token_us:>16.2f}")
+    serialization.JSON_BACKEND = "auto"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Grid index vs brute-force scan for k-nearest and radius queries over 10k points.
+
+    cd backend && uv run python -m benchmarks.bench_spatial
+"""
+
+import random
+import time
+
+from app.geo import haversine_miles
+from app.spatial import GridIndex
+from tests.synthetic import LAT_RANGE, LNG_RANGE
+
+N_POINTS = 10_000
+N_QUERIES = 500
+K = 5
+RADIUS_MILES = 1.0
+
+
+def brute_nearest(points, lat, lng, k):
+    return sorted((haversine_miles(lat, lng, plat, plng), key) for key, plat, plng in points)[:k]
+
+
+def brute_within(points, lat, lng, miles):
+    return [key for key, plat, plng in points if haversine_miles(lat, lng, plat, plng) <= miles]
+
+
+def main() -> None:
+    rng = random.Random(1)
+    points = [(i, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for i in range(N_POINTS)]
+    queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for _ in range(N_QUERIES)]
+
+    start = time.perf_counter()
+    index = GridIndex.from_points(points)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    def timed(fn):
+        start = time.perf_counter()
+        results = [fn(lat, lng) for lat, lng in queries]
+        return results, (time.perf_counter() - start) * 1000 / N_QUERIES
+
+    grid_knn, grid_knn_ms = timed(lambda lat, lng: index.nearest(lat, lng, K))
+    brute_knn, brute_knn_ms = timed(lambda lat, lng: brute_nearest(points, lat, lng, K))
+    grid_rad, grid_rad_ms = timed(lambda lat, lng: index.within(lat, lng, RADIUS_MILES))
+    brute_rad, brute_rad_ms = timed(lambda lat, lng: brute_within(points, lat, lng, RADIUS_MILES))
+
+    assert [[k for k, _ in r] for r in grid_knn] == [[k for _, k in r] for r in brute_knn]
+    assert [sorted(k for k, _ in r) for r in grid_rad] == [sorted(r) for r in brute_rad]
+
+    print(f"{N_POINTS} points, {N_QUERIES} queries; grid built in {build_ms:.1f} ms")
+    print(f"{'query':<16}{'grid ms':>9}{'brute ms':>10}{'speedup':>9}")
+    print(f"{f'{K}-nearest':<16}{grid_knn_ms:>9.3f}{brute_knn_ms:>10.3f}{brute_knn_ms / grid_knn_ms:>8.0f}x")
+    print(f"{f'within {RADIUS_MILES} mi':<16}{grid_rad_ms:>9.3f}{brute_rad_ms:>10.3f}{brute_rad_ms / grid_rad_ms:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Server CPU per /optimize-stream viewer: one SSE frame per thinking delta vs coalesced frames.
+
+Load harness: the app runs under uvicorn in a child process, against an offline Claude that
+streams DELTAS short thinking deltas DELTA_SECONDS apart (BURST at a time). Google Maps and local search are
+off, and the Claude scheduler admits every stream at once. STREAMS clients then read
+/optimize-stream concurrently over real sockets. CPU is the server's process time for the
+run divided by STREAMS, best of ROUNDS. The "no thinking" row is the rest of the pipeline
+(HTTP, prompt, plan, finalize); "stream ms" subtracts it to leave the token stream's own cost.
+
+    cd backend && uv run python -m benchmarks.bench_sse_coalesce
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+
+STREAMS = 50
+DELTAS = 400
+DELTA_SECONDS = 0.002
+BURST = 8  # deltas that arrive together, as when one network read carries several SSE events
+DELTA_TEXT = "the van "
+ROUNDS = 3
+PORT = 8765
+
+
+class StreamingClaude:
+    """Offline AsyncAnthropic: thinking deltas at a steady rate, then the plan as text."""
+
+    def __init__(self, deltas: int, plan: str):
+        self.deltas = deltas
+        self.plan = plan
+        self.messages = SimpleNamespace(stream=self._stream)
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def _stream(self, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for i in range(self.deltas):
+            if i % BURST == 0:
+                await asyncio.sleep(DELTA_SECONDS * BURST)
+            yield SimpleNamespace(
+                type="content_block_delta", delta=SimpleNamespace(type="thinking_delta", thinking=DELTA_TEXT)
+            )
+        yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=self.plan))
+
+
+def serve(deltas: int) -> None:
+    """Child process: the app with an offline Claude, plus an endpoint reporting its own CPU time."""
+    import uvicorn
+
+    from app import optimizer
+    from app.api import app
+    from app.heuristic import greedy_assign
+    from app.scheduler import FairScheduler
+    from app.seed import SEED_RIDES, SEED_VEHICLES
+
+    plan = [
+        a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"})
+        for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)
+    ]
+    optimizer.anthropic.AsyncAnthropic = StreamingClaude(
+        deltas, json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    )
+    optimizer.LOCAL_SEARCH_BUDGET_MS = 0
+    # Every viewer streams at once: no Claude concurrency or token quota in the way
+    optimizer.llm_scheduler = FairScheduler(max_concurrency=STREAMS, tenant_concurrency=STREAMS, tokens_per_minute=10**9)
+    app.add_api_route("/_bench/cpu", lambda: {"cpu": time.process_time()})
+    uvicorn.run(app, port=PORT, log_level="warning")
+
+
+async def load(base: str) -> tuple[float, int, int]:
+    """(server CPU ms per stream, frames per stream, bytes per stream)"""
+    from app.seed import SEED_RIDES, SEED_VEHICLES
+
+    body = {"rides": [r.model_dump() for r in SEED_RIDES], "vehicles": [v.model_dump() for v in SEED_VEHICLES]}
+    limits = httpx.Limits(max_connections=STREAMS)
+    async with httpx.AsyncClient(base_url=base, timeout=None, limits=limits) as client:
+
+        async def one() -> tuple[int, int]:
+            frames = size = 0
+            async with client.stream("POST", "/optimize-stream", json=body) as response:
+                async for chunk in response.aiter_raw():
+                    frames += chunk.count(b"data: ")
+                    size += len(chunk)
+            return frames, size
+
+        await asyncio.gather(*[one() for _ in range(STREAMS)])  # warm-up
+        runs = []
+        for _ in range(ROUNDS):
+            before = (await client.get("/_bench/cpu")).json()["cpu"]
+            results = await asyncio.gather(*[one() for _ in range(STREAMS)])
+            cpu_ms = ((await client.get("/_bench/cpu")).json()["cpu"] - before) * 1000 / STREAMS
+            runs.append((cpu_ms, *results[0]))
+        return min(runs)
+
+
+def measure(deltas: int, flush_ms: int, flush_bytes: int) -> tuple[float, int, int]:
+    env = {**os.environ, "SSE_FLUSH_MS": str(flush_ms), "SSE_FLUSH_BYTES": str(flush_bytes), "GOOGLE_MAPS_API_KEY": ""}
+    child = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_sse_coalesce", "--serve", str(deltas)], env=env)
+    base = f"http://127.0.0.1:{PORT}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base}/health")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        return asyncio.run(load(base))
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def main() -> None:
+    print(
+        f"{STREAMS} concurrent streams, {DELTAS} deltas of {len(DELTA_TEXT)} bytes every {DELTA_SECONDS * 1000:.0f} ms"
+        f" in bursts of {BURST}\n"
+    )
+    print(f"{'mode':<26}{'CPU ms/stream':>14}{'stream ms':>11}{'frames':>8}{'bytes':>9}")
+    rows = [("no thinking", 0, 50, 1024), ("frame per delta", DELTAS, 0, 1024)] + [
+        (f"coalesced {ms} ms / {size} B", DELTAS, ms, size) for ms, size in ((50, 1024), (100, 4096))
+    ]
+    baseline = None
+    for name, deltas, flush_ms, flush_bytes in rows:
+        cpu_ms, frames, size = measure(deltas, flush_ms, flush_bytes)
+        baseline = cpu_ms if baseline is None else baseline
+        print(f"{name:<26}{cpu_ms:>14.1f}{cpu_ms - baseline:>11.1f}{frames:>8}{size:>9,}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--serve"]:
+        serve(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app import directions, optimizer
+
+
+class FakeStream:
+    def __init__(self, events, delay: float = 0.0, error: Exception | None = None):
+        self._events = events
+        self._delay = delay
+        self._error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for event in self._events:
+            if self._delay:
+                await asyncio.sleep(self._delay)
+            yield event
+        if self._error is not None:
+            raise self._error
+
+
+class FakeClaude:
+    """Stand-in for anthropic.AsyncAnthropic: replays canned thinking + tool call/text for stream() and create()."""
+
+    def __init__(self):
+        self.thinking: str | list[str] = "Considering the vehicles..."  # a list streams one delta per item
+        self.delay = 0.0  # seconds before each streamed event
+        self.text = ""
+        self.tool_json: str | None = None  # raw tool input JSON, streamed in small chunks
+        self.error: Exception | None = None  # raised by create(), and by stream() after its events
+        self.calls: list[dict] = []
+        self.messages = SimpleNamespace(stream=self._stream, create=self._create)
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def _stream(self, **kwargs):
+        self.calls.append(kwargs)
+        thinking = [self.thinking] if isinstance(self.thinking, str) else self.thinking
+        events = [
+            SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="thinking_delta", thinking=t))
+            for t in thinking
+        ] + [SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=self.text))]
+        if self.tool_json is not None:
+            events += [
+                SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="input_json_delta", partial_json=self.tool_json[i:i + 7]))
+                for i in range(0, len(self.tool_json), 7)
+            ]
+        return FakeStream(events, self.delay, self.error)
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        content = [
+            SimpleNamespace(type="thinking", thinking="".join(self.thinking)),
+            SimpleNamespace(type="text", text=self.text),
+        ]
+        if self.tool_json is not None:
+            content.append(SimpleNamespace(type="tool_use", input=json.loads(self.tool_json)))
+        return SimpleNamespace(content=content)
+
+
+@pytest.fixture
+def fake_claude(monkeypatch):
+    """Offline Claude: set `.text` to the model's answer. Also disables Google Maps calls."""
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    fake = FakeClaude()
+    monkeypatch.setattr(optimizer.anthropic, "AsyncAnthropic", fake)
+    return fake
+
+
+@pytest.fixture
+def no_local_search(monkeypatch):
+    """Ship Claude's plan exactly as parsed (tests that assert on the raw plan)."""
+    monkeypatch.setattr(optimizer, "LOCAL_SEARCH_BUDGET_MS", 0)
+
+
+@pytest.fixture
+def google(monkeypatch):
+    """Route directions.py HTTP calls to a handler; returns the list of requests seen."""
+    monkeypatch.setenv("GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr(directions, "RETRY_BUDGET_SECONDS", 5.0)
+    monkeypatch.setattr(directions, "_client", None)
+    directions._route_cache.clear()
+    for bucket in directions._LIMITERS.values():
+        bucket.tokens = bucket.capacity
+    for breaker in directions._BREAKERS.values():
+        breaker.reset()
+    seen: list[httpx.Request] = []
+    state = {"handler": None}
+    real_client = httpx.AsyncClient
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return state["handler"](request)
+
+    monkeypatch.setattr(
+        directions.httpx, "AsyncClient",
+        lambda **kw: real_client(transport=httpx.MockTransport(handler), **kw),
+    )
+    yield state, seen
+    for breaker in directions._BREAKERS.values():
+        breaker.reset()
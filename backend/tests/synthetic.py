@@ -0,0 +1,72 @@
+"""Deterministic synthetic Portland batches (rides + a mixed fleet) for tests and benchmarks."""
+
+import random
+
+from app.models import Ride, Vehicle, Priority, ServiceType, VehicleStatus, VehicleType
+
+
+# Rough Portland metro bounding box (matches the seed-data coordinate checks)
+LAT_RANGE = (45.40, 45.62)
+LNG_RANGE = (-122.85, -122.50)
+
+FLEET_MIX = [
+    # (type, pax capacity, luggage capacity, weight)
+    (VehicleType.SEDAN, 4, 3, 5),
+    (VehicleType.SUV, 6, 6, 3),
+    (VehicleType.VAN, 8, 10, 1),
+    (VehicleType.SPRINTER, 12, 15, 1),
+]
+
+
+def _point(rng: random.Random) -> tuple[float, float]:
+    return round(rng.uniform(*LAT_RANGE), 5), round(rng.uniform(*LNG_RANGE), 5)
+
+
+def make_rides(n: int, seed: int = 7) -> list[Ride]:
+    rng = random.Random(seed)
+    rides = []
+    for i in range(n):
+        (plat, plng), (dlat, dlng) = _point(rng), _point(rng)
+        minute = rng.randrange(0, 12 * 60, 5)
+        start = f"2026-02-28T{6 + minute // 60:02d}:{minute % 60:02d}:00"
+        end_minute = minute + 30
+        end = f"2026-02-28T{6 + end_minute // 60:02d}:{end_minute % 60:02d}:00"
+        rides.append(Ride(
+            id=f"S{i + 1:05d}",
+            pickup_lat=plat,
+            pickup_lng=plng,
+            dropoff_lat=dlat,
+            dropoff_lng=dlng,
+            time_window_start=start,
+            time_window_end=end,
+            passenger_count=rng.choices([1, 2, 3, 4, 5, 6, 7], weights=[30, 25, 15, 12, 8, 6, 4])[0],
+            priority=rng.choices(list(Priority), weights=[20, 50, 22, 8])[0],
+            service_type=rng.choice(list(ServiceType)),
+            luggage_count=rng.choices([0, 1, 2, 3, 4, 6, 8], weights=[25, 25, 20, 12, 10, 5, 3])[0],
+            pickup_label=f"Synthetic pickup {i + 1}",
+            dropoff_label=f"Synthetic dropoff {i + 1}",
+        ))
+    return rides
+
+
+def make_vehicles(n: int, seed: int = 11) -> list[Vehicle]:
+    rng = random.Random(seed)
+    vehicles = []
+    for i in range(n):
+        vtype, capacity, luggage, _ = rng.choices(FLEET_MIX, weights=[m[3] for m in FLEET_MIX])[0]
+        lat, lng = _point(rng)
+        vehicles.append(Vehicle(
+            id=f"V{i + 1:04d}",
+            name=f"{vtype.value.title()} {i + 1}",
+            current_lat=lat,
+            current_lng=lng,
+            capacity=capacity,
+            status=VehicleStatus.AVAILABLE,
+            vehicle_type=vtype,
+            luggage_capacity=luggage,
+        ))
+    return vehicles
+
+
+def make_batch(n_rides: int, n_vehicles: int, seed: int = 7) -> tuple[list[Ride], list[Vehicle]]:
+    return make_rides(n_rides, seed), make_vehicles(n_vehicles, seed + 1)
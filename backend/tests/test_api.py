@@ -25,3 +25,35 @@ async def test_seed_returns_data(client):
     assert "vehicles" in data
     assert len(data["rides"]) >= 8
     assert len(data["vehicles"]) >= 3
+
+
+@pytest.mark.asyncio
+async def test_explain_returns_reasoning(client, fake_claude):
+    fake_claude.text = "Reserved the van for the party of seven."
+    seed = (await client.get("/seed")).json()
+    resp = await client.post("/explain", json={
+        **seed,
+        "vehicle_id": "V003",
+        "ride_ids_in_order": ["R011"],
+    })
+    assert resp.status_code == 200
+    assert resp.json() == {"vehicle_id": "V003", "reasoning": "Reserved the van for the party of seven."}
+    assert "R011" in fake_claude.calls[0]["messages"][0]["content"]
+
+
+@pytest.mark.asyncio
+async def test_explain_rejects_unknown_vehicle(client):
+    seed = (await client.get("/seed")).json()
+    resp = await client.post("/explain", json={**seed, "vehicle_id": "V999", "ride_ids_in_order": []})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_seed_pages_rides(client):
+    whole = (await client.get("/seed")).json()
+    page = (await client.get("/seed?offset=2&limit=3")).json()
+    assert page["rides"] == whole["rides"][2:5]
+    assert page["vehicles"] == whole["vehicles"]
+    assert (page["total_rides"], page["offset"], page["limit"]) == (len(whole["rides"]), 2, 3)
+    assert (await client.get("/seed?offset=999")).json()["rides"] == []
+    assert (await client.get("/seed?limit=0")).status_code == 422
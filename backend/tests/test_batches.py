@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import api
+from app.batches import BatchStore, LocalMessageBatches
+from app.models import OptimizeRequest
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+def _request(**kwargs) -> OptimizeRequest:
+    return OptimizeRequest(rides=SEED_RIDES, vehicles=SEED_VEHICLES, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_end_to_end_against_local_api(fake_claude):
+    fake_claude.tool_json = json.dumps({
+        "assignments": [{"vehicle_id": "V003", "ride_ids_in_order": ["R011"], "reasoning": "Van for the big party"}],
+        "overall_strategy": "Reserve the van",
+        "unassigned_rides": [],
+    })
+    store = BatchStore(LocalMessageBatches(), poll_seconds=0.01)
+    run = store.start({"acct_a": _request(), "acct_b": _request(model_tier="fast")})
+    await store.wait(run.id)
+
+    summary = run.summary()
+    assert summary["status"] == "ended"
+    assert summary["succeeded"] == 2
+    assert len(fake_claude.calls) == 2
+    assert all("stream" not in call for call in fake_claude.calls)
+    for result in summary["results"].values():
+        assigned = sorted(rid for a in result["result"]["assignments"] for rid in a["ride_ids_in_order"])
+        assert assigned == sorted(r.id for r in SEED_RIDES)  # repaired: missing rides inserted
+        assert result["repairs"]["inserted_rides"] == len(SEED_RIDES) - 1
+        assert result["optimized_miles"] > 0
+
+
+@pytest.mark.asyncio
+async def test_batch_records_per_request_errors(fake_claude):
+    fake_claude.text = "Sorry, no plan today."
+    store = BatchStore(LocalMessageBatches(), poll_seconds=0.01)
+    run = await store.wait(store.start({"acct_a": _request()}).id)
+    assert run.status == "ended"
+    assert run.summary()["failed"] == 1
+    assert "error" in run.results["acct_a"]
+
+
+class StuckBatches:
+    async def create(self, requests):
+        await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+async def test_finished_runs_are_evicted_oldest_first(fake_claude):
+    fake_claude.text = "Sorry, no plan today."
+    store = BatchStore(StuckBatches(), poll_seconds=0.01, retain=2)
+    pending = store.start({"acct_a": _request()})
+    await asyncio.sleep(0)  # its submit is now waiting on StuckBatches
+    store._batches_api = LocalMessageBatches()
+
+    finished = [(await store.wait(store.start({"acct_a": _request()}).id)).id for _ in range(3)]
+    assert store.get(finished[0]) is None
+    assert [store.get(rid) is not None for rid in finished[1:]] == [True, True]
+    assert store.get(pending.id) is pending and pending.status == "submitting"
+    for task in store._tasks:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_batch_api_submit_and_poll(fake_claude, monkeypatch):
+    fake_claude.text = json.dumps({"assignments": [], "overall_strategy": "", "unassigned_rides": []})
+    monkeypatch.setattr(api, "batch_store", BatchStore(LocalMessageBatches(), poll_seconds=0.01))
+    client = AsyncClient(transport=ASGITransport(app=api.app), base_url="http://test")
+    payload = {"requests": {"acct_a": _request().model_dump(mode="json")}}
+
+    submitted = await client.post("/batches", json=payload)
+    assert submitted.status_code == 202
+    batch_id = submitted.json()["batch_id"]
+    await api.batch_store.wait(batch_id)
+    polled = (await client.get(f"/batches/{batch_id}")).json()
+    assert polled["status"] == "ended"
+    assert set(polled["results"]) == {"acct_a"}
+
+    bad = {"requests": {"not valid!": _request().model_dump(mode="json")}}
+    assert (await client.post("/batches", json=bad)).status_code == 400
+    assert (await client.get("/batches/missing")).status_code == 404
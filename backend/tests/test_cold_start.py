@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# What Vercel imports on a cold start: api/index.py, which loads the synced copy of app.api
+ENTRY_POINT = Path(__file__).resolve().parents[2] / "api"
+# The framework alone: the floor any entry point pays, measured the same way on the same machine
+FRAMEWORK = "fastapi, fastapi.middleware.cors, fastapi.responses, dotenv"
+DEFERRED_MODULES = ("anthropic", "httpx", "app.seed")  # loaded by the first request that needs them
+# Over the framework floor the app adds ~100 modules and ~0.6x fastapi's import time here; the
+# eager Anthropic SDK added ~2,350 more modules and took it to ~11x. The budgets leave room for
+# app growth, not for a heavy dependency coming back.
+MAX_EXTRA_MODULES = 200
+MAX_TIME_RATIO = 2.5
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """Cumulative import time in µs per module imported by `statement`, from `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ENTRY_POINT, capture_output=True, text=True, check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_entry_point_cold_start_against_the_framework_floor():
+    entry = import_times("import index")
+    framework = import_times(f"import {FRAMEWORK}")
+    assert [m for m in DEFERRED_MODULES if m in entry] == []
+    assert len(entry.keys() - framework.keys()) < MAX_EXTRA_MODULES
+    # Both numbers come from the same process, so machine speed cancels out
+    assert entry["index"] / entry["fastapi"] < MAX_TIME_RATIO
@@ -0,0 +1,78 @@
+import json
+import sys
+
+import pytest
+
+from app.columnar import RideColumns, StringColumn, VehicleColumns
+from app.models import Priority, VehicleStatus
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from app.spatial import pickup_index, vehicle_index
+from tests.synthetic import make_batch
+
+
+def test_round_trip_through_models_and_records():
+    rides, vehicles = make_batch(200, 20)
+    columns = RideColumns.from_models(rides)
+    assert len(columns) == 200
+    assert columns.to_models() == rides
+    assert columns[7] == rides[7] and columns[-1] == rides[-1]
+    assert VehicleColumns.from_models(vehicles).to_models() == vehicles
+
+    records = [json.loads(r.model_dump_json(exclude_defaults=True)) for r in SEED_RIDES]
+    assert RideColumns.from_records(records).to_models() == SEED_RIDES
+
+
+def test_typed_storage():
+    columns = RideColumns.from_models(SEED_RIDES)
+    assert columns.pickup_lat.typecode == "d"
+    assert columns.priority.typecode == "b"
+    assert columns.member("priority", 0) == SEED_RIDES[0].priority
+    assert columns.priority[0] == columns.code("priority", SEED_RIDES[0].priority)
+    assert list(columns.id) == [r.id for r in SEED_RIDES]
+
+    big = RideColumns.from_models(make_batch(2_000, 1)[0])
+    assert sys.getsizeof(big) / len(big) < 300
+
+
+def test_string_column():
+    strings = StringColumn(["", "Hawthorne", "", "Portland Int’l"])
+    assert list(strings) == ["", "Hawthorne", "", "Portland Int’l"]
+    assert strings[-1] == "Portland Int’l" and strings[1:3] == ["Hawthorne", ""]
+    assert len(StringColumn()) == 0
+
+
+def test_from_records_names_the_bad_row():
+    records = [json.loads(r.model_dump_json()) for r in SEED_RIDES[:4]]
+    with pytest.raises(ValueError, match="row 2: invalid priority: 'asap'"):
+        RideColumns.from_records([*records[:2], {**records[2], "priority": "asap"}])
+    with pytest.raises(ValueError, match="row 1: pickup_lat is required"):
+        RideColumns.from_records([records[0], {k: v for k, v in records[1].items() if k != "pickup_lat"}])
+    with pytest.raises(ValueError, match="row 0: invalid passenger_count"):
+        RideColumns.from_records([{**records[0], "passenger_count": 2.5}])
+    with pytest.raises(ValueError, match="row 3: invalid id"):
+        RideColumns.from_records([*records[:3], {**records[3], "id": 4}])
+
+
+def test_spatial_indexes_accept_columns():
+    rides, vehicles = make_batch(300, 40)
+    vehicles[0] = vehicles[0].model_copy(update={"status": VehicleStatus.OFF_DUTY})
+    for build, items, columns in [
+        (pickup_index, rides, RideColumns.from_models(rides)),
+        (vehicle_index, vehicles, VehicleColumns.from_models(vehicles)),
+    ]:
+        a, b = build(items), build(columns)
+        assert len(a) == len(b)
+        assert a.nearest(45.52, -122.68, k=5) == b.nearest(45.52, -122.68, k=5)
+
+
+def test_cost_matrix_accepts_columns():
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("scipy")
+    from app.matching import first_leg_cost_matrix, match_first_leg
+
+    rides, vehicles = make_batch(60, 12)
+    rides[0] = rides[0].model_copy(update={"priority": Priority.URGENT})
+    columns = RideColumns.from_models(rides), VehicleColumns.from_models(vehicles)
+    assert np.array_equal(first_leg_cost_matrix(rides, vehicles), first_leg_cost_matrix(*columns))
+    assert match_first_leg(rides, vehicles) == match_first_leg(*columns)
+    assert match_first_leg(SEED_RIDES, SEED_VEHICLES)
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.api import app
+from app.compression import CompressionMiddleware, choose_encoding
+from app.heuristic import greedy_assign
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+@pytest.fixture
+def client():
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+def test_choose_encoding_honours_q_zero():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_seed_etag_and_not_modified(client):
+    plain = await client.get("/seed", headers={"Accept-Encoding": "identity"})
+    etag = plain.headers["etag"]
+    assert etag.startswith('"') and "content-encoding" not in plain.headers
+    assert plain.json()["rides"][0]["id"] == SEED_RIDES[0].id
+
+    zipped = await client.get("/seed", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] != etag
+    assert zipped.json() == plain.json()
+
+    for tag in (etag, zipped.headers["etag"], f'"other", W/{etag}'):
+        again = await client.get("/seed", headers={"If-None-Match": tag})
+        assert again.status_code == 304 and again.content == b""
+    assert (await client.get("/seed", headers={"If-None-Match": '"stale"'})).status_code == 200
+    assert (await client.get("/seed?scenario=airport_rush", headers={"If-None-Match": etag})).status_code == 200
+
+    scenarios = await client.get("/scenarios")
+    assert (await client.get("/scenarios", headers={"If-None-Match": scenarios.headers["etag"]})).status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_brotli_when_available(client):
+    pytest.importorskip("brotli")
+    response = await client.get("/seed", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["vehicles"][0]["id"] == SEED_VEHICLES[0].id
+
+
+@pytest.mark.asyncio
+async def test_optimize_result_compressed_but_stream_is_not(client, fake_claude):
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    body = {"rides": [r.model_dump() for r in SEED_RIDES], "vehicles": [v.model_dump() for v in SEED_VEHICLES]}
+    headers = {"Accept-Encoding": "gzip"}
+
+    response = await client.post("/optimize", json=body, headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["result"]["assignments"]
+
+    stream = await client.post("/optimize-stream", json=body, headers=headers)
+    assert "content-encoding" not in stream.headers
+    assert stream.text.startswith("data: ")
+
+
+@pytest.mark.asyncio
+async def test_middleware_passes_streams_and_small_bodies_through():
+    async def chunks():
+        yield b'{"a": ['
+        yield b"1" * 4000
+        yield b"]}"
+
+    inner = Starlette(routes=[
+        Route("/small", lambda request: JSONResponse({"ok": True})),
+        Route("/large", lambda request: JSONResponse({"pad": "x" * 4000})),
+        Route("/stream", lambda request: StreamingResponse(chunks(), media_type="application/json")),
+    ])
+    client = AsyncClient(transport=ASGITransport(app=CompressionMiddleware(inner)), base_url="http://test")
+    headers = {"Accept-Encoding": "gzip"}
+    assert "content-encoding" not in (await client.get("/small", headers=headers)).headers
+    assert "content-encoding" not in (await client.get("/stream", headers=headers)).headers
+
+    large = await client.get("/large", headers=headers)
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert int(large.headers["content-length"]) < 200
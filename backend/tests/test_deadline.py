@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import optimizer
+from app.api import app
+from app.deadline import Deadline
+from app.heuristic import greedy_assign
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """No Google key, and fail loudly if anything tries to reach Claude."""
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+
+    def no_claude(*args, **kwargs):
+        raise AssertionError("Claude should not be called")
+
+    monkeypatch.setattr(optimizer.anthropic, "AsyncAnthropic", no_claude)
+
+
+def test_deadline_shares_remaining_budget():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.share(0.5) == 5
+    clock.now = 6
+    assert deadline.remaining() == 4
+    assert deadline.share(0.5) == 2
+    clock.now = 20
+    assert deadline.remaining() == 0
+
+
+def test_unbounded_deadline_never_times_out():
+    deadline = Deadline.from_ms(None)
+    assert not deadline.bounded
+    assert deadline.share(0.1) is None
+
+
+def test_degradations_are_recorded_once():
+    deadline = Deadline(1)
+    deadline.degrade("naive_plan")
+    deadline.degrade("naive_plan")
+    assert deadline.degradations == ["naive_plan"]
+
+
+@pytest.mark.asyncio
+async def test_short_deadline_returns_naive_plan(offline):
+    data = await optimizer.optimize(SEED_RIDES, SEED_VEHICLES, Deadline.from_ms(1000))
+    assert data["degradations"] == ["skipped_drive_times", "naive_plan"]
+    assigned = {rid for a in data["result"].assignments for rid in a.ride_ids_in_order}
+    assert assigned == {r.id for r in SEED_RIDES}
+    assert data["optimized_miles"] == data["naive_miles"]
+
+
+@pytest.mark.asyncio
+async def test_deadline_header_reaches_pipeline(offline):
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    payload = {
+        "rides": [r.model_dump(mode="json") for r in SEED_RIDES],
+        "vehicles": [v.model_dump(mode="json") for v in SEED_VEHICLES],
+    }
+    resp = await client.post("/optimize", json=payload, headers={"X-Deadline-Ms": "1000"})
+    assert resp.status_code == 200
+    assert "naive_plan" in resp.json()["degradations"]
+
+
+@pytest.mark.asyncio
+async def test_tight_deadline_still_calls_a_fast_tier_model(fake_claude, no_local_search):
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+
+    fast = await optimizer.optimize(SEED_RIDES, SEED_VEHICLES, Deadline.from_ms(3000), policy=optimizer.MODEL_TIERS["fast"])
+    assert fast["plan_source"] == "llm" and len(fake_claude.calls) == 1
+
+    deep = await optimizer.optimize(SEED_RIDES, SEED_VEHICLES, Deadline.from_ms(3000), policy=optimizer.MODEL_TIERS["deep"])
+    assert deep["plan_source"] == "naive" and "naive_plan" in deep["degradations"]
+    assert len(fake_claude.calls) == 1
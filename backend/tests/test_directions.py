@@ -0,0 +1,189 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import directions
+from app.metrics import metrics
+from app.resilience import CircuitBreaker, RetryBudget, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+WAYPOINTS = [(45.5152, -122.6784), (45.5898, -122.5951)]
+
+
+def test_token_bucket_limits_burst():
+    clock = FakeClock()
+    bucket = TokenBucket("test", rate=2, capacity=2, clock=clock)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now = 0.5
+    assert bucket.try_acquire()
+
+
+def test_token_bucket_charges_per_element():
+    clock = FakeClock()
+    bucket = TokenBucket("test", rate=100, capacity=100, clock=clock)
+    assert bucket.try_acquire(60)
+    assert not bucket.try_acquire(60)
+    clock.now = 0.2
+    assert bucket.try_acquire(60)
+    clock.now = 10
+    assert bucket.try_acquire(500)  # larger than the bucket: waits for a full one, then goes
+
+
+def test_retry_budget_caps_attempts():
+    budget = RetryBudget(max_retries=2, max_seconds=10, base_delay=0.01)
+    assert budget.next_delay() is not None
+    assert budget.next_delay() is not None
+    assert budget.next_delay() is None
+
+
+def test_circuit_breaker_opens_then_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()  # single half-open probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_transient_error_is_retried(google):
+    state, seen = google
+    responses = iter([
+        httpx.Response(503),
+        httpx.Response(200, json={
+            "status": "OK",
+            "routes": [{
+                "overview_polyline": {"points": "_p~iF~ps|U_ulLnnqC"},
+                "legs": [{"distance": {"value": 16093}}],
+            }],
+        }),
+    ])
+    state["handler"] = lambda request: next(responses)
+
+    polyline, miles = await directions.get_route_polyline(WAYPOINTS)
+    assert len(seen) == 2
+    assert polyline == [[38.5, -120.2], [40.7, -120.95]]
+    assert miles == pytest.approx(10.0, abs=0.01)
+
+
+def test_token_bucket_lock_follows_the_event_loop():
+    bucket = TokenBucket("test", rate=1000, capacity=1)
+
+    async def twice():
+        await asyncio.gather(bucket.acquire(), bucket.acquire())
+
+    asyncio.run(twice())
+    asyncio.run(twice())  # a lock made on the first loop would fail here
+
+
+@pytest.mark.asyncio
+async def test_non_object_body_is_a_failure_that_frees_the_probe(google):
+    state, seen = google
+    state["handler"] = lambda request: httpx.Response(200, json=["not", "an", "object"])
+    breaker = directions._BREAKERS["directions"]
+    breaker.state, breaker._opened_at = CircuitBreaker.OPEN, -breaker.reset_seconds
+    directions.start_retry_budget().max_retries = 0
+
+    assert await directions._fetch_json("directions", directions.DIRECTIONS_URL, {}) is None
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker._probe_in_flight
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_is_shared_across_a_requests_calls(google):
+    state, seen = google
+    state["handler"] = lambda request: httpx.Response(503)
+    budget = directions.start_retry_budget()
+    budget.base_delay = 0.001
+
+    for _ in range(3):
+        assert await directions._fetch_json("directions", directions.DIRECTIONS_URL, {}) is None
+    assert budget.retries == directions.MAX_RETRIES
+    assert len(seen) == 3 + directions.MAX_RETRIES  # one attempt per call, retries only until the budget ran out
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_short_circuits_to_fallback(google):
+    state, seen = google
+    state["handler"] = lambda request: httpx.Response(500)
+    breaker = directions._BREAKERS["directions"]
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    before = metrics.counter("upstream_short_circuited", endpoint="directions")
+    polyline, miles = await directions.get_route_polyline(WAYPOINTS)
+    assert seen == []
+    fallback = directions._straight_line_route(WAYPOINTS)
+    assert (polyline, miles) == (fallback.polyline, fallback.miles)
+    assert metrics.counter("upstream_short_circuited", endpoint="directions") == before + 1
+    assert metrics.gauge("upstream_breaker_state", endpoint="directions") == 2
+
+
+def _route_handler(fail_origin: str | None = None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if params["origin"] == fail_origin:
+            return httpx.Response(200, json={"status": "ZERO_RESULTS"})
+        stops = len(params["waypoints"].split("|")) if "waypoints" in params else 0
+        return httpx.Response(200, json={"status": "OK", "routes": [{
+            "overview_polyline": {"points": "_p~iF~ps|U_ulLnnqC"},
+            "legs": [{"distance": {"value": 1609.344}, "duration": {"value": 120}}] * (stops + 1),
+        }]})
+    return handler
+
+
+LONG_ROUTE = [(45.50 + i / 1000, -122.65 + i / 1000) for i in range(31)]  # a vehicle with 15 rides
+
+
+def test_segments_overlap_and_fit_the_limit():
+    segments = directions._segments(LONG_ROUTE)
+    assert [len(s) for s in segments] == [27, 5]
+    assert segments[0][-1] == segments[1][0]
+    assert directions._segments(LONG_ROUTE[:2]) == [LONG_ROUTE[:2]]
+
+
+@pytest.mark.asyncio
+async def test_long_route_is_split_and_stitched(google):
+    state, seen = google
+    state["handler"] = _route_handler()
+    route = await directions.get_route(LONG_ROUTE)
+    assert len(seen) == 2
+    assert all(len(r.url.params["waypoints"].split("|")) <= 25 for r in seen)
+    assert seen[1].url.params["origin"] == seen[0].url.params["destination"]
+    assert not route.fallback
+    assert len(route.leg_miles) == len(LONG_ROUTE) - 1
+    assert route.miles == pytest.approx(30.0)
+    assert route.leg_minutes == [2.0] * 30
+    assert len(route.polyline) == 4
+
+    await directions.get_route(LONG_ROUTE)
+    assert len(seen) == 2  # both segments cached
+
+
+@pytest.mark.asyncio
+async def test_failed_segment_falls_back_alone(google):
+    state, _ = google
+    state["handler"] = _route_handler(fail_origin="{},{}".format(*LONG_ROUTE[26]))
+    route = await directions.get_route(LONG_ROUTE)
+    assert route.fallback
+    assert route.leg_miles[:26] == pytest.approx([1.0] * 26)
+    assert route.leg_minutes[26:] == [None] * 4
+    assert route.polyline[-1] == list(LONG_ROUTE[-1])
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import ingest
+from app.api import app
+from app.geo import haversine_miles
+from app.heuristic import greedy_assign
+from app.ingest import NdjsonIngest
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+def ndjson_lines() -> list[bytes]:
+    return (
+        [json.dumps({"options": {"output_format": "full"}}).encode()]
+        + [b'{"vehicle":' + v.model_dump_json().encode() + b"}" for v in SEED_VEHICLES]
+        + [b'{"ride":' + r.model_dump_json().encode() + b"}" for r in SEED_RIDES]
+    )
+
+
+async def chunked(data: bytes, size: int, delay: float = 0.0):
+    for i in range(0, len(data), size):
+        if delay:
+            await asyncio.sleep(delay)
+        yield data[i:i + size]
+
+
+@pytest.mark.asyncio
+async def test_lines_split_across_chunks_and_bad_lines_reported():
+    lines = ndjson_lines()
+    lines[3] = b'{"ride": {"id": "X1"}}'
+    lines.insert(5, b"")
+    lines.insert(6, b"not json")
+    lines.append(lines[-1])  # duplicate ride id
+    lines.append(b'{"ride": ' + SEED_RIDES[0].model_dump_json().encode() + b', "vehicle": null, "extra": 1}')
+    ingest_ = NdjsonIngest(prefetch_legs=False)
+    await ingest_.feed(chunked(b"\r\n".join(lines), 37))
+
+    assert len(ingest_.vehicles) == len(SEED_VEHICLES) - 1
+    assert [r.id for r in ingest_.rides] == [r.id for r in SEED_RIDES]
+    assert ingest_.options.output_format == "full"
+    errors = {e.line: e.error for e in ingest_.errors}
+    assert "ride.pickup_lat: Field required" in errors[4]
+    assert "Invalid JSON" in errors[7]
+    assert errors[len(lines) - 1] == f"duplicate ride id {SEED_RIDES[-1].id}"
+    assert "extra: Extra inputs are not permitted" in errors[len(lines)]
+    assert ingest_.error_count == 4 and ingest_.lines == len(lines)
+
+
+@pytest.mark.asyncio
+async def test_overlong_lines_are_rejected_without_buffering(monkeypatch):
+    monkeypatch.setattr(ingest, "NDJSON_MAX_LINE_BYTES", 600)
+    lines = ndjson_lines()[:3] + [b'{"ride": {"notes": "' + b"x" * 5000 + b'"}}'] + ndjson_lines()[3:]
+    ingest_ = NdjsonIngest(prefetch_legs=False)
+    await ingest_.feed(chunked(b"\n".join(lines), 100))
+    assert [(e.line, e.error) for e in ingest_.errors] == [(4, "line longer than 600 bytes")]
+    assert len(ingest_.rides) == len(SEED_RIDES)
+
+    ingest_ = NdjsonIngest(prefetch_legs=False)
+    await ingest_.feed(chunked(b"\n".join([*ndjson_lines(), b"{" * 1000]), 64))
+    assert ingest_.error_count == 1 and ingest_.errors[0].line == len(ndjson_lines()) + 1
+
+
+@pytest.mark.asyncio
+async def test_legs_are_prefetched_while_the_upload_arrives(monkeypatch):
+    batches: list[list] = []
+
+    async def fake_ensure_pairs(pairs):
+        batches.append(pairs)
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(ingest, "ensure_pairs", fake_ensure_pairs)
+    ingest.leg_cache.clear()
+    ingest_ = NdjsonIngest(prefetch_legs=True)
+    await ingest_.feed(chunked(b"\n".join(ndjson_lines()), 400, delay=0.01))
+    await ingest_.settle(ingest.Deadline(5), 1.0)
+
+    ride_legs = {(ingest._key((r.pickup_lat, r.pickup_lng)), ingest._key((r.dropoff_lat, r.dropoff_lng))) for r in SEED_RIDES}
+    fetched = [leg for batch in batches for leg in batch]
+    assert len(batches) > 1 and not ride_legs <= set(batches[0])  # started before the last ride arrived
+    assert ride_legs <= set(fetched) and len(fetched) == len(set(fetched))
+    assert len(ingest_.pickup_index) == len({leg[0] for leg in ride_legs})
+    assert len(ingest_.dropoff_index) == len({leg[1] for leg in ride_legs})
+    assert len(ingest_.vehicle_index) == len({ingest._key((v.current_lat, v.current_lng)) for v in SEED_VEHICLES})
+    # Every pickup gets its nearest vehicle queued, whichever of the two arrived first
+    for r in SEED_RIDES:
+        pickup = ingest._key((r.pickup_lat, r.pickup_lng))
+        nearest = min(SEED_VEHICLES, key=lambda v: haversine_miles(v.current_lat, v.current_lng, *pickup))
+        assert (ingest._key((nearest.current_lat, nearest.current_lng)), pickup) in fetched
+    assert not ingest_.capped
+
+
+@pytest.mark.asyncio
+async def test_prefetch_stays_within_one_element_budget(monkeypatch):
+    fetched: list = []
+
+    async def fake_ensure_pairs(pairs):
+        fetched.extend(pairs)
+
+    monkeypatch.setattr(ingest, "ensure_pairs", fake_ensure_pairs)
+    monkeypatch.setattr(ingest, "ROAD_MATRIX_MAX_ELEMENTS", 20)
+    ingest.leg_cache.clear()
+    ingest_ = NdjsonIngest(prefetch_legs=True)
+    await ingest_.feed(chunked(b"\n".join(ndjson_lines()), 200, delay=0.001))
+    deadline = ingest.Deadline(5)
+    await ingest_.settle(deadline, 1.0)
+    assert len(fetched) == 20
+    assert ingest_.capped and "road_matrix_capped" in deadline.degradations
+
+
+@pytest.mark.asyncio
+async def test_optimize_ndjson_endpoint(fake_claude):
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    body = b"\n".join([*ndjson_lines(), b'{"ride": {"id": "bad"}}']) + b"\n"
+
+    response = await client.post("/optimize-ndjson", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["result"]["assignments"]
+    assert data["rejected_line_count"] == 1 and data["rejected_lines"][0]["line"] == len(ndjson_lines()) + 1
+
+    empty = await client.post("/optimize-ndjson", content=b'{"ride": {}}\n')
+    assert empty.status_code == 400
+    assert empty.json()["detail"]["rejected_lines"][0]["line"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bad_deadline_header_is_rejected_before_the_upload_is_read(fake_claude):
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    read = False
+
+    async def body():
+        nonlocal read
+        read = True
+        yield b"\n".join(ndjson_lines())
+
+    response = await client.post("/optimize-ndjson", content=body(), headers={"X-Deadline-Ms": "0"})
+    assert response.status_code == 400
+    assert not read
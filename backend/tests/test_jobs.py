@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import api
+from app.jobs import JobQueue, QueueFullError
+from app.models import OptimizeRequest
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+def _request() -> OptimizeRequest:
+    return OptimizeRequest(rides=SEED_RIDES, vehicles=SEED_VEHICLES)
+
+
+async def _fake_runner(request: OptimizeRequest, tenant: str):
+    yield {"type": "token", "text": "thinking"}
+    await asyncio.sleep(0.01)
+    yield {"type": "result", "data": {"rides": len(request.rides)}}
+
+
+async def _wait_done(queue: JobQueue, job_id: str):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job.done:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError("job did not finish")
+
+
+@pytest.mark.asyncio
+async def test_job_runs_to_completion():
+    queue = JobQueue(_fake_runner, workers=1, maxsize=4)
+    job = queue.submit(_request())
+    assert job.status == "queued"
+    job = await _wait_done(queue, job.id)
+    assert job.status == "succeeded"
+    assert job.result == {"rides": len(SEED_RIDES)}
+    types = [e["type"] for e in job.events]
+    assert types == ["job", "job", "token", "result", "job"]
+
+
+@pytest.mark.asyncio
+async def test_job_failure_is_recorded():
+    async def broken(request, tenant):
+        raise RuntimeError("upstream down")
+        yield  # pragma: no cover
+
+    queue = JobQueue(broken, workers=1, maxsize=4)
+    job = await _wait_done(queue, queue.submit(_request()).id)
+    assert job.status == "failed"
+    assert "upstream down" in job.error
+
+
+@pytest.mark.asyncio
+async def test_queue_full_rejects_with_retry_after():
+    gate = asyncio.Event()
+
+    async def blocked(request, tenant):
+        await gate.wait()
+        yield {"type": "result", "data": {}}
+
+    queue = JobQueue(blocked, workers=1, maxsize=1)
+    queue.submit(_request())
+    await asyncio.sleep(0)  # worker picks up the first job
+    queue.submit(_request())  # fills the single queue slot
+    with pytest.raises(QueueFullError) as exc:
+        queue.submit(_request())
+    assert exc.value.retry_after >= 1
+    gate.set()
+
+
+@pytest.mark.asyncio
+async def test_follow_replays_and_streams_events():
+    queue = JobQueue(_fake_runner, workers=1, maxsize=4)
+    job = queue.submit(_request())
+    events = [e async for e in queue.follow(job)]
+    assert events[0] == {"type": "job", "status": "queued"}
+    assert events[-1] == {"type": "job", "status": "succeeded"}
+
+
+@pytest.mark.asyncio
+async def test_job_api_submit_poll_and_429(monkeypatch):
+    gate = asyncio.Event()
+
+    async def blocked(request, tenant):
+        await gate.wait()
+        yield {"type": "result", "data": {"ok": True}}
+
+    monkeypatch.setattr(api, "job_queue", JobQueue(blocked, workers=1, maxsize=1))
+    client = AsyncClient(transport=ASGITransport(app=api.app), base_url="http://test")
+    payload = _request().model_dump(mode="json")
+
+    first = await client.post("/jobs", json=payload)
+    assert first.status_code == 202
+    job_id = first.json()["job_id"]
+    await asyncio.sleep(0)
+    assert (await client.post("/jobs", json=payload)).status_code == 202
+
+    rejected = await client.post("/jobs", json=payload)
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) >= 1
+
+    gate.set()
+    await _wait_done(api.job_queue, job_id)
+    polled = await client.get(f"/jobs/{job_id}")
+    assert polled.json()["status"] == "succeeded"
+    assert polled.json()["result"] == {"ok": True}
+
+    assert (await client.get("/jobs/missing")).status_code == 404
+    snapshot = (await client.get("/metrics")).json()
+    assert "jobs_wait_seconds" in snapshot["histograms"]
@@ -0,0 +1,65 @@
+import json
+import random
+
+import pytest
+
+from app.heuristic import greedy_assign
+from app.local_search import improve_routes
+from app.models import Priority, RouteAssignment
+from app.optimizer import compute_route_miles, count_constraint_violations, optimize
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from tests.synthetic import make_batch
+
+
+def _miles(assignments, rides, vehicles) -> float:
+    return sum(compute_route_miles(a, rides, vehicles) for a in assignments)
+
+
+def _assigned(assignments) -> list[str]:
+    return sorted(rid for a in assignments for rid in a.ride_ids_in_order)
+
+
+def test_shuffled_route_is_resequenced():
+    rides, vehicles = make_batch(8, 1, seed=4)
+    rides = [r.model_copy(update={"priority": Priority.MEDIUM, "passenger_count": 1, "luggage_count": 0}) for r in rides]
+    order = [r.id for r in rides]
+    random.Random(1).shuffle(order)
+    plan = [RouteAssignment(vehicle_id=vehicles[0].id, ride_ids_in_order=order, reasoning="Claude's reasoning")]
+
+    improved, stats = improve_routes(plan, rides, vehicles, budget_ms=500)
+    assert stats["miles_saved"] > 0
+    assert stats["passes"][0]["miles_saved"] > 0
+    assert _miles(plan, rides, vehicles) - _miles(improved, rides, vehicles) == pytest.approx(stats["miles_saved"], abs=1e-2)
+    assert improved[0].locally_improved
+    assert improved[0].reasoning == "Claude's reasoning"
+    assert _assigned(improved) == sorted(order)
+
+
+def test_moves_never_add_violations():
+    rides, vehicles = make_batch(60, 8, seed=5)
+    plan = greedy_assign(rides, vehicles)
+    improved, stats = improve_routes(plan, rides, vehicles, budget_ms=300)
+    before = sum(count_constraint_violations(plan, rides, vehicles).values())
+    assert sum(count_constraint_violations(improved, rides, vehicles).values()) <= before
+    assert _assigned(improved) == _assigned(plan)
+    assert _miles(improved, rides, vehicles) <= _miles(plan, rides, vehicles) + 1e-6
+
+
+def test_budget_is_respected():
+    rides, vehicles = make_batch(300, 20, seed=6)
+    _, stats = improve_routes(greedy_assign(rides, vehicles), rides, vehicles, budget_ms=20)
+    assert stats["elapsed_ms"] < 200
+    _, stats = improve_routes(greedy_assign(rides, vehicles), rides, vehicles, budget_ms=0)
+    assert stats["passes"] == []
+
+
+@pytest.mark.asyncio
+async def test_optimize_reports_local_search(fake_claude):
+    reversed_plan = [
+        a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) | {"ride_ids_in_order": a.ride_ids_in_order[::-1]}
+        for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)
+    ]
+    fake_claude.text = json.dumps({"assignments": reversed_plan, "overall_strategy": "", "unassigned_rides": []})
+    data = await optimize(SEED_RIDES, SEED_VEHICLES)
+    assert data["local_search"]["passes"]
+    assert data["local_search"]["miles_saved"] >= 0
@@ -0,0 +1,74 @@
+import itertools
+import time
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import api
+from app.geo import haversine_miles
+from app.matching import first_leg_cost_matrix, match_first_leg
+from app.models import Priority
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from tests.synthetic import make_batch
+
+pytest.importorskip("scipy")
+
+
+def test_cost_matrix_is_haversine_for_urgent_eligible_pairs():
+    rides, vehicles = make_batch(3, 2)
+    rides = [r.model_copy(update={"priority": Priority.URGENT, "passenger_count": 1, "luggage_count": 0}) for r in rides]
+    cost = first_leg_cost_matrix(rides, vehicles)
+    assert cost.shape == (2, 3)
+    v, r = vehicles[1], rides[2]
+    assert cost[1, 2] == pytest.approx(haversine_miles(v.current_lat, v.current_lng, r.pickup_lat, r.pickup_lng))
+
+
+def test_matching_is_optimal_against_brute_force():
+    rides, vehicles = make_batch(5, 5, seed=2)
+    cost = first_leg_cost_matrix(rides, vehicles)
+    best = min(sum(cost[i, p[i]] for i in range(5)) for p in itertools.permutations(range(5)))
+
+    assignments = match_first_leg(rides, vehicles)
+    index = {r.id: j for j, r in enumerate(rides)}
+    total = sum(cost[int(a.vehicle_id[1:]) - 1, index[a.ride_ids_in_order[0]]] for a in assignments)
+    unmatched = 5 - len(assignments)
+    assert total + unmatched * 1e6 == pytest.approx(best)
+
+
+def test_urgent_pickup_wins_the_only_car():
+    ride = SEED_RIDES[0]
+    far_urgent = ride.model_copy(update={"id": "URG", "priority": Priority.URGENT, "pickup_lat": ride.pickup_lat + 0.02})
+    near_low = ride.model_copy(update={"id": "LOW", "priority": Priority.LOW})
+    vehicle = next(v for v in SEED_VEHICLES if v.capacity >= ride.passenger_count and v.status.value == "available")
+    vehicle = vehicle.model_copy(update={"current_lat": ride.pickup_lat, "current_lng": ride.pickup_lng})
+    [assignment] = match_first_leg([near_low, far_urgent], [vehicle])
+    assert assignment.ride_ids_in_order == ["URG"]
+
+
+def test_500_by_500_is_fast_and_respects_eligibility():
+    rides, vehicles = make_batch(500, 500)
+    start = time.perf_counter()
+    assignments = match_first_leg(rides, vehicles)
+    assert time.perf_counter() - start < 2.0
+    ride_map, vehicle_map = {r.id: r for r in rides}, {v.id: v for v in vehicles}
+    for a in assignments:
+        r, v = ride_map[a.ride_ids_in_order[0]], vehicle_map[a.vehicle_id]
+        assert r.passenger_count <= v.capacity and r.luggage_count <= v.luggage_capacity
+    assert len({a.ride_ids_in_order[0] for a in assignments}) == len(assignments)
+
+
+@pytest.mark.asyncio
+async def test_first_leg_endpoint(monkeypatch):
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    client = AsyncClient(transport=ASGITransport(app=api.app), base_url="http://test")
+    payload = {
+        "rides": [r.model_dump(mode="json") for r in SEED_RIDES],
+        "vehicles": [v.model_dump(mode="json") for v in SEED_VEHICLES],
+    }
+    response = await client.post("/optimize-first-leg", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["plan_source"] == "matching"
+    assert all(len(a["ride_ids_in_order"]) == 1 for a in data["result"]["assignments"])
+    matched = len(data["result"]["assignments"]) + len(data["result"]["unassigned_rides"])
+    assert matched == len(SEED_RIDES)
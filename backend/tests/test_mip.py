@@ -0,0 +1,60 @@
+import sys
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import api
+from app.heuristic import greedy_assign, is_eligible
+from app.mip import plan_objective, solve_assignment
+from app.optimizer import count_constraint_violations
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from tests.synthetic import make_batch
+
+pytest.importorskip("scipy")
+
+
+def _payload(rides, vehicles) -> dict:
+    return {
+        "rides": [r.model_dump(mode="json") for r in rides],
+        "vehicles": [v.model_dump(mode="json") for v in vehicles],
+    }
+
+
+def test_mip_assigns_every_eligible_ride_within_constraints():
+    solution = solve_assignment(SEED_RIDES, SEED_VEHICLES)
+    assert solution.status == "optimal"
+    assigned = sorted(rid for a in solution.assignments for rid in a.ride_ids_in_order)
+    assert assigned == sorted(r.id for r in SEED_RIDES)
+    assert sum(count_constraint_violations(solution.assignments, SEED_RIDES, SEED_VEHICLES).values()) == 0
+
+
+def test_mip_is_at_least_as_good_as_the_heuristic():
+    rides, vehicles = make_batch(30, 8, seed=3)
+    solution = solve_assignment(rides, vehicles, time_limit=5)
+    vehicle_map = {v.id: v for v in vehicles}
+    ride_map = {r.id: r for r in rides}
+    for a in solution.assignments:
+        assert all(is_eligible(ride_map[rid], vehicle_map[a.vehicle_id]) for rid in a.ride_ids_in_order)
+    mip = plan_objective(solution.assignments, rides, vehicles)
+    assert mip == pytest.approx(solution.objective, abs=1e-2)
+    assert mip <= plan_objective(greedy_assign(rides, vehicles), rides, vehicles) + 1e-6
+
+
+@pytest.mark.asyncio
+async def test_optimize_mip_endpoint(monkeypatch):
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    client = AsyncClient(transport=ASGITransport(app=api.app), base_url="http://test")
+
+    response = await client.post("/optimize-mip", json=_payload(SEED_RIDES, SEED_VEHICLES))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["plan_source"] == "mip"
+    assert data["solver"]["status"] == "optimal"
+    assert data["optimized_miles"] > 0
+
+    too_big = await client.post("/optimize-mip", json=_payload(*make_batch(31, 5)))
+    assert too_big.status_code == 400
+
+    monkeypatch.setitem(sys.modules, "scipy.optimize", None)
+    missing = await client.post("/optimize-mip", json=_payload(SEED_RIDES, SEED_VEHICLES))
+    assert missing.status_code == 501
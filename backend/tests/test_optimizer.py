@@ -1,6 +1,16 @@
-from app.optimizer import build_prompt, naive_assign
+import json
+
+import pytest
+
+from app.optimizer import (
+    build_prompt, naive_assign, count_constraint_violations, score_plan, optimize, optimize_events,
+    problem_difficulty, choose_model_policy, CLAUDE_MODEL, THINKING_BUDGET, MAX_OUTPUT_TOKENS, MIN_ANSWER_TOKENS,
+)
+from app.heuristic import greedy_assign
+from app.metrics import metrics
 from app.geo import haversine_miles
 from app.seed import SEED_RIDES, SEED_VEHICLES, AIRPORT_RUSH_RIDES, AIRPORT_RUSH_VEHICLES, SCENARIOS
+from tests.synthetic import make_batch
 
 
 def test_build_prompt_includes_all_ride_ids():
@@ -60,3 +70,163 @@ def test_scenarios_registry():
         assert "rides" in s
         assert "vehicles" in s
         assert len(s["rides"]) >= 8
+
+
+def test_greedy_assign_assigns_all_rides_without_violations():
+    for rides, vehicles in [(SEED_RIDES, SEED_VEHICLES), (AIRPORT_RUSH_RIDES, AIRPORT_RUSH_VEHICLES)]:
+        assignments = greedy_assign(rides, vehicles)
+        assigned = sorted(rid for a in assignments for rid in a.ride_ids_in_order)
+        assert assigned == sorted(r.id for r in rides)
+        assert sum(count_constraint_violations(assignments, rides, vehicles).values()) == 0
+
+
+def test_score_plan_prefers_heuristic_over_naive():
+    naive, _ = naive_assign(SEED_RIDES, SEED_VEHICLES)
+    heuristic = greedy_assign(SEED_RIDES, SEED_VEHICLES)
+    assert score_plan(heuristic, SEED_RIDES, SEED_VEHICLES) < score_plan(naive, SEED_RIDES, SEED_VEHICLES)
+    # Dropping a ride is priced in
+    assert score_plan(heuristic[1:], SEED_RIDES, SEED_VEHICLES) > score_plan(heuristic, SEED_RIDES, SEED_VEHICLES)
+
+
+@pytest.mark.asyncio
+async def test_speculative_stream_sends_provisional_and_survives_bad_json(fake_claude):
+    fake_claude.text = "not json"
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES, speculative=True)]
+    assert events[0]["type"] == "provisional"
+    result = events[-1]
+    assert result["type"] == "result"
+    assert result["data"]["plan_source"] == "heuristic"
+    assert "llm" not in result["data"]["plan_scores"]
+
+
+@pytest.mark.asyncio
+async def test_speculative_falls_back_when_claude_fails(fake_claude):
+    fake_claude.error = ConnectionError("overloaded")
+    before = metrics.counter("llm_errors")
+
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES, speculative=True)]
+    assert [events[0]["type"], events[-1]["type"]] == ["provisional", "result"]
+    assert events[-1]["data"]["plan_source"] == "heuristic"
+    assert "heuristic_plan" in events[-1]["data"]["degradations"]
+
+    data = await optimize(SEED_RIDES, SEED_VEHICLES, speculative=True)
+    assert data["plan_source"] == "heuristic"
+    assert metrics.counter("llm_errors") == before + 2
+
+
+@pytest.mark.asyncio
+async def test_claude_failure_without_speculation_is_an_error_event(fake_claude):
+    fake_claude.error = ConnectionError("overloaded")
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES)]
+    assert events[-1] == {"type": "error", "message": "Claude request failed: overloaded"}
+    with pytest.raises(ConnectionError):
+        await optimize(SEED_RIDES, SEED_VEHICLES)
+
+
+@pytest.mark.asyncio
+async def test_speculative_keeps_better_llm_plan(fake_claude, no_local_search):
+    heuristic = greedy_assign(SEED_RIDES, SEED_VEHICLES)
+    fake_claude.text = json.dumps({
+        "assignments": [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in heuristic],
+        "overall_strategy": "Same as the heuristic",
+        "unassigned_rides": [],
+    })
+    data = await optimize(SEED_RIDES, SEED_VEHICLES, speculative=True)
+    assert data["plan_source"] == "llm"  # ties go to Claude
+    assert data["plan_scores"]["llm"] == data["plan_scores"]["heuristic"]
+
+
+@pytest.mark.asyncio
+async def test_stream_consumes_tool_input_and_repairs(fake_claude):
+    fake_claude.tool_json = json.dumps({
+        "assignments": [{"vehicle_id": "V003", "ride_ids_in_order": ["R011", "R404"], "reasoning": "Reserved the van"}],
+        "overall_strategy": "Van reserved for R011",
+        "unassigned_rides": [],
+    })[:-20]  # truncated mid-document, as when max_tokens cuts the call short
+    before = metrics.counter("llm_responses_repaired")
+
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES)]
+    assert fake_claude.calls[0]["tools"][0]["name"] == "submit_route_plan"
+    data = events[-1]["data"]
+    assert events[-1]["type"] == "result"
+    assigned = sorted(rid for a in data["result"].assignments for rid in a.ride_ids_in_order)
+    assert assigned == sorted(r.id for r in SEED_RIDES)
+    assert data["repairs"]["inserted_rides"] == len(SEED_RIDES) - 1
+    assert metrics.counter("llm_responses_repaired") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_unusable_output_is_a_parse_failure(fake_claude):
+    fake_claude.text = "Sorry, no plan today."
+    before = metrics.counter("llm_parse_failures")
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES)]
+    assert events[-1]["type"] == "error"
+    assert metrics.counter("llm_parse_failures") == before + 1
+
+
+def test_build_prompt_compact_numbers_rides_and_vehicles():
+    prompt = build_prompt(SEED_RIDES, SEED_VEHICLES, compact=True)
+    assert f"[0] {SEED_RIDES[0].id}:" in prompt
+    assert f"[{len(SEED_VEHICLES) - 1}] {SEED_VEHICLES[-1].id} (" in prompt
+    assert "submit_route_indices" in prompt
+    assert '"reasoning"' not in prompt
+
+
+@pytest.mark.asyncio
+async def test_compact_output_is_decoded_from_indices(fake_claude, no_local_search):
+    # Van (index 2) takes R011 (index 10); index 99 is out of range and gets dropped
+    routes = [[2, 10, 99], [0] + list(range(0, 5)), [1] + list(range(5, 10))]
+    fake_claude.tool_json = json.dumps({"routes": routes, "strategy": "Van reserved"})
+
+    data = await optimize(SEED_RIDES, SEED_VEHICLES, output_format="compact")
+    assert fake_claude.calls[0]["tools"][0]["name"] == "submit_route_indices"
+    by_vehicle = {a.vehicle_id: a.ride_ids_in_order for a in data["result"].assignments}
+    assert by_vehicle[SEED_VEHICLES[2].id] == [SEED_RIDES[10].id]
+    assert all(a.reasoning == "" for a in data["result"].assignments)
+    assert data["repairs"] == {"unknown_rides": 1}
+    assert data["result"].overall_strategy == "Van reserved"
+
+
+def test_problem_difficulty_flags_scarce_rides():
+    d = problem_difficulty(SEED_RIDES, SEED_VEHICLES)
+    assert d["rides"] == len(SEED_RIDES)
+    assert d["vehicles"] == len(SEED_VEHICLES)
+    assert d["scarce_rides"] >= 1  # R011's party of 7 only fits the van
+    assert 0 < d["tightness"] < 1
+
+
+def test_model_policy_scales_with_difficulty():
+    small = choose_model_policy(SEED_RIDES[:3], SEED_VEHICLES)
+    assert small.tier == "fast"
+    assert small.thinking_budget < THINKING_BUDGET
+
+    rides, vehicles = make_batch(120, 10)
+    large = choose_model_policy(rides, vehicles)
+    assert large.tier == "deep"
+    assert large.thinking_budget > THINKING_BUDGET
+    assert large.thinking_budget < large.max_tokens <= MAX_OUTPUT_TOKENS
+
+
+def test_model_policy_override():
+    policy = choose_model_policy(SEED_RIDES[:3], SEED_VEHICLES, tier="standard", thinking_budget=2048)
+    assert policy.tier == "standard"
+    assert policy.model == CLAUDE_MODEL
+    assert policy.thinking_budget == 2048
+    assert policy.reason == "override: standard"
+
+
+def test_model_policy_caps_an_oversized_thinking_budget():
+    policy = choose_model_policy(SEED_RIDES, SEED_VEHICLES, tier="deep", thinking_budget=50000)
+    assert policy.max_tokens <= MAX_OUTPUT_TOKENS
+    assert policy.max_tokens - policy.thinking_budget >= MIN_ANSWER_TOKENS
+    assert policy.reason.endswith(f"thinking budget capped at {policy.thinking_budget}")
+
+
+@pytest.mark.asyncio
+async def test_policy_is_sent_to_claude(fake_claude):
+    fake_claude.text = "not json"
+    policy = choose_model_policy(SEED_RIDES, SEED_VEHICLES, tier="fast")
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES, speculative=True, policy=policy)]
+    assert fake_claude.calls[0]["model"] == policy.model
+    assert fake_claude.calls[0]["thinking"]["budget_tokens"] == policy.thinking_budget
+    assert events[-1]["data"]["model_policy"]["tier"] == "fast"
@@ -0,0 +1,96 @@
+import json
+import random
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.api import app
+from app.directions import _decode_polyline
+from app.heuristic import greedy_assign
+from app import polyline
+from app.polyline import (
+    SIMPLIFY_MIN_POINTS, GeometryOptions, as_points, decode_polyline, decode_polylines, encode_polyline, simplify,
+    simplify_for_zoom, tolerance_meters,
+)
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+GOOGLE_EXAMPLE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_encode_matches_google_example_and_round_trips():
+    points = [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+    assert encode_polyline(points) == GOOGLE_EXAMPLE
+    assert _decode_polyline(encode_polyline(points)) == points
+
+
+def _random_route(rng: random.Random, n: int) -> list[list[float]]:
+    lat, lng = 45.5, -122.7
+    points = []
+    for _ in range(n):
+        lat += rng.uniform(-0.01, 0.01)
+        lng += rng.uniform(-0.01, 0.01)
+        points.append([round(lat, 5), round(lng, 5)])
+    return points
+
+
+def test_array_decoder_matches_list_decoder():
+    route = _random_route(random.Random(1), 500)
+    encoded = encode_polyline(route)
+    coords = decode_polyline(encoded)
+    assert coords.typecode == "d" and len(coords) == 1000
+    assert as_points(coords) == route
+    assert decode_polyline(encoded.encode()) == coords
+    assert len(decode_polyline("")) == 0
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_batch_decode_matches_one_at_a_time(monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(polyline, "_numpy", lambda: None)
+    rng = random.Random(2)
+    encoded = [encode_polyline(_random_route(rng, n)) for n in (3, 0, 250, 1)] + [GOOGLE_EXAMPLE]
+    coords, offsets = decode_polylines(encoded)
+    assert len(offsets) == len(encoded) + 1
+    for i, e in enumerate(encoded):
+        assert coords[offsets[i]:offsets[i + 1]] == decode_polyline(e)
+
+
+def test_simplify_drops_straight_runs_and_keeps_corners():
+    # East along one street, then north: only the ends and the corner matter
+    line = [[45.5, -122.7 + i * 0.0001] for i in range(50)] + [[45.5 + i * 0.0001, -122.6951] for i in range(1, 50)]
+    assert simplify(line, 1.0) == [line[0], line[49], line[-1]]
+    assert simplify(line[:2], 1.0) == line[:2]
+
+
+def test_geometry_simplifies_only_long_polylines_for_a_requested_zoom():
+    wiggle = [[45.5 + (0.00003 if i % 2 else 0), -122.7 + i * 0.0002] for i in range(200)]
+    assert GeometryOptions().shape(wiggle) == (wiggle, "")
+    assert not GeometryOptions().reshapes
+    assert len(GeometryOptions(zoom=12).shape(wiggle)[0]) == 2
+    short = wiggle[:SIMPLIFY_MIN_POINTS - 1]
+    assert GeometryOptions(zoom=12).shape(short) == (short, "")
+
+
+def test_tolerance_grows_as_zoom_falls():
+    wiggle = [[45.5 + (0.00003 if i % 2 else 0), -122.7 + i * 0.0002] for i in range(200)]  # ~3 m zigzag
+    assert tolerance_meters(12, 45.5) == pytest.approx(16 * tolerance_meters(16, 45.5))
+    assert len(simplify_for_zoom(wiggle, 20)) == len(wiggle)
+    assert len(simplify_for_zoom(wiggle, 12)) == 2
+
+
+@pytest.mark.asyncio
+async def test_optimize_can_return_encoded_polylines(fake_claude):
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    response = await client.post("/optimize", json={
+        "rides": [r.model_dump() for r in SEED_RIDES],
+        "vehicles": [v.model_dump() for v in SEED_VEHICLES],
+        "polyline_format": "encoded",
+        "zoom": 12,
+    })
+    data = response.json()
+    for a in data["result"]["assignments"] + data["naive_assignments"]:
+        assert a["polyline"] == []
+        assert _decode_polyline(a["encoded_polyline"])
+    assert GeometryOptions().shape([[45.5, -122.7], [45.6, -122.6]]) == ([[45.5, -122.7], [45.6, -122.6]], "")
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from app.repair import loads_lenient, repair_plan
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+def test_loads_lenient_closes_truncated_json():
+    raw = '{"assignments": [{"vehicle_id": "V001", "ride_ids_in_order": ["R001", "R0'
+    data = loads_lenient(raw)
+    assert data["assignments"][0]["vehicle_id"] == "V001"
+    assert data["assignments"][0]["ride_ids_in_order"][0] == "R001"
+
+
+def test_loads_lenient_raises_on_garbage():
+    with pytest.raises(json.JSONDecodeError):
+        loads_lenient("I could not produce a plan")
+
+
+def test_repair_drops_unknown_ids_and_inserts_missing_rides():
+    data = {
+        "assignments": [
+            {"vehicle_id": "V001", "ride_ids_in_order": ["R001", "R999", "R002"], "reasoning": "NE cluster"},
+            {"vehicle_id": "V404", "ride_ids_in_order": ["R003"], "reasoning": "ghost vehicle"},
+            {"vehicle_id": "V002", "ride_ids_in_order": ["R002"], "reasoning": "duplicate"},
+        ],
+        "overall_strategy": "Cluster",
+    }
+    result, repairs = repair_plan(data, SEED_RIDES, SEED_VEHICLES)
+    assert repairs == {
+        "unknown_vehicles": 1,
+        "unknown_rides": 1,
+        "duplicate_rides": 1,
+        "inserted_rides": len(SEED_RIDES) - 2,
+    }
+    assigned = [rid for a in result.assignments for rid in a.ride_ids_in_order]
+    assert sorted(assigned) == sorted(r.id for r in SEED_RIDES)
+    assert result.unassigned_rides == []
+    assert result.assignments[0].ride_ids_in_order[:2] == ["R001", "R002"]
+
+
+def test_repair_of_valid_plan_is_a_no_op():
+    data = {
+        "assignments": [{"vehicle_id": "V003", "ride_ids_in_order": [r.id for r in SEED_RIDES], "reasoning": "all"}],
+        "overall_strategy": "One van",
+        "unassigned_rides": [],
+    }
+    result, repairs = repair_plan(data, SEED_RIDES, SEED_VEHICLES)
+    assert repairs == {}
+    assert result.assignments[0].reasoning == "all"
@@ -0,0 +1,178 @@
+import httpx
+import pytest
+
+from app import road_matrix
+from app.geo import haversine_miles
+from app.models import OptimizationResult
+from app.optimizer import compute_route_miles, finalize_plan, naive_assign, optimize
+from app.polyline import GeometryOptions
+from app.deadline import Deadline
+from app.road_matrix import MileageEvaluator, ensure_matrix, ensure_pairs, leg_cache
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+ROAD_FACTOR = 1.3  # the fake Distance Matrix reports roads 30% longer than the crow flies
+
+
+def _points(param: str) -> list[tuple[float, float]]:
+    return [tuple(map(float, p.split(","))) for p in param.split("|")]
+
+
+def distance_matrix(request: httpx.Request) -> httpx.Response:
+    origins, destinations = _points(request.url.params["origins"]), _points(request.url.params["destinations"])
+    rows = [
+        {"elements": [
+            {"status": "OK", "distance": {"value": haversine_miles(*o, *d) * ROAD_FACTOR * 1609.344}, "duration": {"value": 600}}
+            for d in destinations
+        ]}
+        for o in origins
+    ]
+    return httpx.Response(200, json={"status": "OK", "rows": rows})
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    leg_cache.clear()
+    yield
+    leg_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_matrix_is_chunked_and_cached(google):
+    state, seen = google
+    state["handler"] = distance_matrix
+    origins = [(v.current_lat, v.current_lng) for v in SEED_VEHICLES]
+    pickups = [(r.pickup_lat, r.pickup_lng) for r in SEED_RIDES]
+
+    await ensure_matrix(origins, pickups)
+    assert seen
+    for request in seen:
+        o, d = _points(request.url.params["origins"]), _points(request.url.params["destinations"])
+        assert len(o) <= 25 and len(d) <= 25 and len(o) * len(d) <= 100
+    assert len(leg_cache) == len(set(origins)) * len(set(pickups))
+
+    requests = len(seen)
+    await ensure_matrix(origins, pickups)
+    assert len(seen) == requests
+
+
+@pytest.mark.asyncio
+async def test_unroutable_elements_are_not_cached(google):
+    state, _ = google
+    state["handler"] = lambda request: httpx.Response(200, json={"status": "OK", "rows": [
+        {"elements": [{"status": "ZERO_RESULTS"}]},
+    ]})
+    await ensure_matrix([(45.5, -122.6)], [(45.6, -122.7)])
+    assert len(leg_cache) == 0
+
+
+def _elements(seen) -> int:
+    return sum(len(_points(r.url.params["origins"])) * len(_points(r.url.params["destinations"])) for r in seen)
+
+
+@pytest.mark.asyncio
+async def test_over_limit_fetch_takes_nearest_legs_up_to_the_cap(google, monkeypatch):
+    state, seen = google
+    state["handler"] = distance_matrix
+    monkeypatch.setattr(road_matrix, "ROAD_MATRIX_MAX_ELEMENTS", 10)
+    origins = [(45.5, -122.6 + i / 100) for i in range(4)]
+    destinations = [(45.5, -122.6 + i / 100 + 0.001) for i in range(4)]
+    assert await ensure_matrix(origins, destinations) is False
+    assert _elements(seen) == len(leg_cache) == 10
+    for o, d in zip(origins, destinations):
+        assert leg_cache.get(o, d) is not None  # every origin got its nearest destination
+
+
+@pytest.mark.asyncio
+async def test_pairs_request_only_the_legs_they_need(google):
+    state, seen = google
+    state["handler"] = distance_matrix
+    ride_legs = [((r.pickup_lat, r.pickup_lng), (r.dropoff_lat, r.dropoff_lng)) for r in SEED_RIDES]
+    assert await ensure_pairs(ride_legs) is True
+    assert _elements(seen) == len({(o, d) for o, d in ride_legs})
+    assert all(leg_cache.get(o, d) is not None for o, d in ride_legs)
+
+
+@pytest.mark.asyncio
+async def test_capped_prepare_records_a_degradation(google, monkeypatch):
+    state, seen = google
+    state["handler"] = distance_matrix
+    monkeypatch.setattr(road_matrix, "ROAD_MATRIX_MAX_ELEMENTS", 30)
+    deadline = Deadline(30)
+    await MileageEvaluator(SEED_RIDES, SEED_VEHICLES).prepare(deadline)
+    assert _elements(seen) <= 30
+    assert deadline.degradations == ["road_matrix_capped"]
+    ride = SEED_RIDES[0]
+    assert leg_cache.get((ride.pickup_lat, ride.pickup_lng), (ride.dropoff_lat, ride.dropoff_lng)) is not None
+
+
+@pytest.mark.asyncio
+async def test_evaluator_uses_road_legs(google):
+    state, _ = google
+    state["handler"] = distance_matrix
+    naive, _ = naive_assign(SEED_RIDES, SEED_VEHICLES)
+    evaluator = MileageEvaluator(SEED_RIDES, SEED_VEHICLES)
+    await evaluator.prepare()
+    for a in naive:
+        assert evaluator.route_miles(a) == pytest.approx(compute_route_miles(a, SEED_RIDES, SEED_VEHICLES) * ROAD_FACTOR)
+    assert evaluator.fallback_legs == 0
+
+
+@pytest.mark.asyncio
+async def test_evaluator_falls_back_to_haversine(monkeypatch):
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    naive, _ = naive_assign(SEED_RIDES, SEED_VEHICLES)
+    evaluator = MileageEvaluator(SEED_RIDES, SEED_VEHICLES)
+    await evaluator.prepare()
+    assert evaluator.route_miles(naive[0]) == pytest.approx(compute_route_miles(naive[0], SEED_RIDES, SEED_VEHICLES))
+    assert evaluator.fallback_legs > 0
+
+
+def directions(request: httpx.Request) -> httpx.Response:
+    """Fake Directions: one leg per waypoint pair, ROAD_FACTOR longer than the crow flies."""
+    params = request.url.params
+    points = _points(params["origin"]) + (_points(params["waypoints"]) if "waypoints" in params else [])
+    points += _points(params["destination"])
+    legs = [
+        {"distance": {"value": haversine_miles(*a, *b) * ROAD_FACTOR * 1609.344}, "duration": {"value": 600}}
+        for a, b in zip(points, points[1:])
+    ]
+    return httpx.Response(200, json={"status": "OK", "routes": [{
+        "overview_polyline": {"points": "_p~iF~ps|U_ulLnnqC"}, "legs": legs,
+    }]})
+
+
+@pytest.mark.asyncio
+async def test_eager_finalize_takes_miles_from_directions_legs(google):
+    state, seen = google
+    state["handler"] = directions
+    naive, _ = naive_assign(SEED_RIDES, SEED_VEHICLES)
+    result = OptimizationResult(assignments=naive[:2], overall_strategy="")
+    comparison = await finalize_plan(result, SEED_RIDES, SEED_VEHICLES, naive)
+    assert not [r for r in seen if "distancematrix" in r.url.path]
+    expected = sum(compute_route_miles(a, SEED_RIDES, SEED_VEHICLES) for a in naive) * ROAD_FACTOR
+    assert comparison["naive_miles"] == pytest.approx(expected, abs=0.1)
+    assert comparison["result"].assignments[0].polyline == [[38.5, -120.2], [40.7, -120.95]]
+
+
+@pytest.mark.asyncio
+async def test_lazy_finalize_takes_miles_from_the_matrix(google):
+    state, seen = google
+    state["handler"] = distance_matrix
+    naive, _ = naive_assign(SEED_RIDES, SEED_VEHICLES)
+    result = OptimizationResult(assignments=naive[:2], overall_strategy="")
+    comparison = await finalize_plan(result, SEED_RIDES, SEED_VEHICLES, naive, geometry=GeometryOptions(lazy=True))
+    assert seen and all("distancematrix" in r.url.path for r in seen)
+    expected = sum(compute_route_miles(a, SEED_RIDES, SEED_VEHICLES) for a in naive) * ROAD_FACTOR
+    assert comparison["naive_miles"] == pytest.approx(expected, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_eager_optimize_skips_the_matrix_without_local_search(fake_claude, google, no_local_search):
+    state, seen = google
+    state["handler"] = lambda r: distance_matrix(r) if "distancematrix" in r.url.path else directions(r)
+    fake_claude.text = "not json"
+    await optimize(SEED_RIDES, SEED_VEHICLES, speculative=True)
+    # Only the prompt's drive times (vehicles → pickups) hit the matrix; route miles come from Directions
+    origins = {p for r in seen if "distancematrix" in r.url.path for p in _points(r.url.params["origins"])}
+    assert origins <= {(v.current_lat, v.current_lng) for v in SEED_VEHICLES}
+    assert any("directions" in r.url.path for r in seen)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.api import app
+from app.heuristic import greedy_assign
+from app.route_store import RouteStore, build_waypoints, route_store
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+ROUTE = {"status": "OK", "routes": [{
+    "overview_polyline": {"points": "_p~iF~ps|U_ulLnnqC"},
+    "legs": [{"distance": {"value": 16093}}],
+}]}
+
+
+def directions_only(counter: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "distancematrix" in request.url.path:
+            return httpx.Response(200, json={"status": "REQUEST_DENIED"})
+        counter.append(request)
+        return httpx.Response(200, json=ROUTE)
+    return handler
+
+
+def _plan():
+    return greedy_assign(SEED_RIDES, SEED_VEHICLES)
+
+
+@pytest.mark.asyncio
+async def test_lazy_result_then_polyline_on_demand(fake_claude, google):
+    state, _ = google
+    directions_calls: list = []
+    state["handler"] = directions_only(directions_calls)
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in _plan()]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+    payload = {
+        "rides": [r.model_dump() for r in SEED_RIDES],
+        "vehicles": [v.model_dump() for v in SEED_VEHICLES],
+        "polylines": "lazy",
+    }
+    data = (await client.post("/optimize", json=payload)).json()
+    assert directions_calls == []
+    assert data["run_id"]
+    assert all(a["polyline"] == [] and a["route_miles"] > 0 for a in data["result"]["assignments"])
+
+    vehicle_id = data["result"]["assignments"][0]["vehicle_id"]
+    url = f"/routes/{data['run_id']}/{vehicle_id}/polyline"
+    first = (await client.get(url)).json()
+    assert first["polyline"] == [[38.5, -120.2], [40.7, -120.95]]
+    assert first["route_miles"] == data["result"]["assignments"][0]["route_miles"]
+    await client.get(url)
+    assert len(directions_calls) == 1
+
+    assert (await client.get(f"{url}?plan=planned")).status_code == 400
+    assert (await client.get(f"/routes/nope/{vehicle_id}/polyline")).status_code == 404
+    assert (await client.get(f"/routes/{data['run_id']}/V999/polyline")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_lazy_falls_back_to_eager_where_runs_are_not_kept(fake_claude, google, monkeypatch):
+    state, _ = google
+    directions_calls: list = []
+    state["handler"] = directions_only(directions_calls)
+    monkeypatch.setattr(route_store, "enabled", False)
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in _plan()]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    runs_before = len(route_store.runs)
+
+    payload = {
+        "rides": [r.model_dump() for r in SEED_RIDES],
+        "vehicles": [v.model_dump() for v in SEED_VEHICLES],
+        "polylines": "lazy",
+    }
+    data = (await client.post("/optimize", json=payload)).json()
+    assert data["run_id"] == "" and "eager_polylines" in data["degradations"]
+    assert all(a["polyline"] for a in data["result"]["assignments"])
+    assert len(route_store.runs) == runs_before
+
+    vehicle_id = data["result"]["assignments"][0]["vehicle_id"]
+    assert (await client.get(f"/routes/any/{vehicle_id}/polyline")).status_code == 501
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_fetch(google):
+    state, _ = google
+    directions_calls: list = []
+    state["handler"] = directions_only(directions_calls)
+    run = RouteStore().add(SEED_RIDES, SEED_VEHICLES, {"optimized": _plan()})
+    vehicle_id = next(iter(run.plans["optimized"]))
+    results = await asyncio.gather(*[run.route("optimized", vehicle_id) for _ in range(5)])
+    assert len(directions_calls) == 1
+    assert all(r == results[0] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_starts_with_the_viewport(google):
+    state, _ = google
+    directions_calls: list = []
+    state["handler"] = directions_only(directions_calls)
+    plan = _plan()
+    run = RouteStore().add(SEED_RIDES, SEED_VEHICLES, {"optimized": plan})
+    target = plan[-1]
+    lat, lng = build_waypoints(target, SEED_RIDES, SEED_VEHICLES)[0]
+    viewport = (lat - 0.001, lng - 0.001, lat + 0.001, lng + 0.001)
+
+    order = run.prefetch("optimized", viewport)
+    assert order[0] == target.vehicle_id
+    assert run.prefetch_order("optimized", viewport, vehicle_ids=[plan[0].vehicle_id])[0] == plan[0].vehicle_id
+
+    await run.wait_prefetched()
+    assert len(directions_calls) == len(plan)
+    assert run.prefetch("optimized", viewport) == []
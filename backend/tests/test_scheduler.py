@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import api
+from app.metrics import metrics
+from app.scheduler import OTHER_TENANT, FairScheduler, parse_tenant_weights
+from app.seed import SEED_RIDES, SEED_VEHICLES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _grant_order(scheduler: FairScheduler, requests: list[tuple[str, int]]) -> list[str]:
+    """Queue all requests behind one held slot, then release one at a time and record who runs."""
+    blocker = await scheduler.acquire("blocker", 1)
+    order = []
+
+    async def call(tenant, cost):
+        async with scheduler.slot(tenant, cost):
+            order.append(tenant)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(call(t, c)) for t, c in requests]
+    await asyncio.sleep(0)
+    blocker.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_parse_tenant_weights():
+    assert parse_tenant_weights("acme=4, beta=2,") == {"acme": 4.0, "beta": 2.0}
+    assert parse_tenant_weights("") == {}
+
+
+@pytest.mark.asyncio
+async def test_small_tenant_is_not_starved_by_a_burst():
+    scheduler = FairScheduler(max_concurrency=1, weights={})
+    order = await _grant_order(scheduler, [("big", 1000)] * 5 + [("small", 1000)])
+    assert order.index("small") <= 1
+
+
+@pytest.mark.asyncio
+async def test_weights_split_capacity():
+    scheduler = FairScheduler(max_concurrency=1, weights={"gold": 2})
+    order = await _grant_order(scheduler, [("gold", 100)] * 6 + [("basic", 100)] * 6)
+    assert order[:6].count("gold") == 4
+
+
+@pytest.mark.asyncio
+async def test_tenant_concurrency_limit():
+    scheduler = FairScheduler(max_concurrency=4, tenant_concurrency=1, weights={})
+    first = await scheduler.acquire("acme", 10)
+    waiting = asyncio.create_task(scheduler.acquire("acme", 10))
+    other = await asyncio.wait_for(scheduler.acquire("beta", 10), 1)  # other tenants are unaffected
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    first.release()
+    (await asyncio.wait_for(waiting, 1)).release()
+    other.release()
+    assert scheduler.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute_quota_and_refund():
+    scheduler = FairScheduler(tokens_per_minute=60000, weights={})  # 1000 tokens/second
+    grant = await scheduler.acquire("acme", 60000)
+    start = time.monotonic()
+    (await scheduler.acquire("acme", 100)).release()
+    assert time.monotonic() - start >= 0.08
+
+    grant.charge(1000)  # real usage was far below the reservation
+    grant.release()
+    assert scheduler.tenants["acme"].tokens > 50000
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = FairScheduler(max_concurrency=1, weights={})
+    held = await scheduler.acquire("acme", 1)
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(scheduler.acquire("beta", 1), 0.01)
+    assert not scheduler.tenants["beta"].waiters
+    held.release()
+    assert scheduler.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_unlisted_tenants_are_bounded_and_evicted_when_idle():
+    clock = FakeClock()
+    scheduler = FairScheduler(weights={"gold": 2}, max_tracked=2, idle_seconds=60, clock=clock)
+    for name in ("t1", "t2", "t3", "gold"):
+        (await scheduler.acquire(name, 10)).release()
+    assert set(scheduler.tenants) == {"t1", "t2", OTHER_TENANT, "gold"}  # t3 had to share
+    assert "llm_tenant_inflight{tenant=t1}" in metrics.snapshot()["gauges"]
+
+    clock.now = 30
+    (await scheduler.acquire("t2", 10)).release()
+    clock.now = 70
+    (await scheduler.acquire("t4", 10)).release()  # t1 idled out; t2 was active 40 s ago
+    assert set(scheduler.tenants) == {"t2", "t4", OTHER_TENANT, "gold"}
+    assert "llm_tenant_inflight{tenant=t1}" not in metrics.snapshot()["gauges"]
+
+    held = await scheduler.acquire("t2", 10)
+    clock.now = 1000
+    (await scheduler.acquire("t5", 10)).release()  # t4 goes; t2 is busy, however long ago it started
+    assert set(scheduler.tenants) == {"t2", "t5", OTHER_TENANT, "gold"}
+    held.release()
+
+
+@pytest.mark.asyncio
+async def test_tenant_header_and_wait_metrics(fake_claude):
+    fake_claude.text = json.dumps({"assignments": [], "overall_strategy": "", "unassigned_rides": []})
+    client = AsyncClient(transport=ASGITransport(app=api.app), base_url="http://test")
+    payload = {
+        "rides": [r.model_dump(mode="json") for r in SEED_RIDES],
+        "vehicles": [v.model_dump(mode="json") for v in SEED_VEHICLES],
+    }
+    response = await client.post("/optimize", json=payload, headers={"X-Tenant-Id": "acme"})
+    assert response.status_code == 200
+    assert "llm_queue_wait_seconds{tenant=acme}" in metrics.snapshot()["histograms"]
+
+    rejected = await client.post("/optimize", json=payload, headers={"X-Tenant-Id": "not a tenant!"})
+    assert rejected.status_code == 400
@@ -1,3 +1,5 @@
+import pytest
+
 from app.seed import SEED_RIDES, SEED_VEHICLES
 
 
@@ -26,3 +28,44 @@ def test_no_duplicate_ids():
 def test_seed_data_counts():
     assert len(SEED_RIDES) >= 8
     assert len(SEED_VEHICLES) >= 3
+
+
+def test_jsonl_file_pages_and_mmaps_large_files(tmp_path, monkeypatch):
+    from app import seed
+
+    path = tmp_path / "big.rides.jsonl"
+    seed.write_jsonl(path, SEED_RIDES * 3)
+    small = seed.JsonlFile(path)
+    assert len(small) == len(SEED_RIDES) * 3
+    assert isinstance(small._data, bytes)
+
+    monkeypatch.setattr(seed, "MMAP_MIN_BYTES", 0)
+    mapped = seed.JsonlFile(path)
+    assert not isinstance(mapped._data, bytes)
+    assert mapped.lines(2, 3) == small.lines(2, 3)
+    assert seed._RIDES.validate_json(mapped.json_array(1, 2)) == SEED_RIDES[1:3]
+    assert mapped.lines(len(mapped) - 1, 10) == small.lines(len(small) - 1)
+    assert mapped.lines(len(mapped) + 5) == []
+
+
+def test_jsonl_file_skips_blank_lines(tmp_path):
+    from app import seed
+
+    path = tmp_path / "edited.rides.jsonl"
+    lines = [r.model_dump_json().encode() for r in SEED_RIDES[:3]]
+    path.write_bytes(b"\n" + lines[0] + b"\r\n  \n" + lines[1] + b"\n\n" + lines[2] + b"\r\n\r\n")
+    jsonl = seed.JsonlFile(path)
+    assert len(jsonl) == 3
+    assert jsonl.lines() == lines
+    assert seed._RIDES.validate_json(jsonl.json_array()) == SEED_RIDES[:3]
+
+
+def test_legacy_names_and_dict_access():
+    from app import seed
+
+    downtown = seed.SCENARIOS["downtown_mix"]
+    assert seed.DOWNTOWN_MIX_RIDES is downtown["rides"] is SEED_RIDES
+    assert seed.AIRPORT_RUSH_VEHICLES is seed.SCENARIOS["airport_rush"].vehicles
+    assert "label" in downtown and "nope" not in downtown
+    with pytest.raises(AttributeError):
+        seed.NOPE_RIDES
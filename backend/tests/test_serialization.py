@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app import serialization
+from app.api import app
+from app.heuristic import greedy_assign
+from app.models import OptimizationResult
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from app.serialization import dumps, sse_frame
+
+
+@pytest.fixture(params=["orjson", "pydantic"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(serialization, "JSON_BACKEND", request.param)
+    return request.param
+
+
+def test_dumps_matches_model_dump(backend):
+    plan = OptimizationResult(assignments=greedy_assign(SEED_RIDES, SEED_VEHICLES), overall_strategy="", unassigned_rides=[])
+    event = {"type": "result", "data": {"result": plan, "naive_assignments": plan.assignments, "scores": {"llm": 1.5}}}
+    expected = {"type": "result", "data": {
+        "result": plan.model_dump(mode="json"),
+        "naive_assignments": [a.model_dump(mode="json") for a in plan.assignments],
+        "scores": {"llm": 1.5},
+    }}
+    assert json.loads(dumps(event)) == expected
+    assert json.loads(dumps(plan)) == expected["data"]["result"]
+
+    frame = sse_frame({"type": "token", "text": "héllo"})
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    assert json.loads(frame[6:]) == {"type": "token", "text": "héllo"}
+
+
+@pytest.mark.asyncio
+async def test_stream_frames_parse(fake_claude, backend):
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    seed = (await client.get("/seed")).json()
+    assert seed["rides"][0] == SEED_RIDES[0].model_dump(mode="json")
+
+    response = await client.post("/optimize-stream", json=seed)
+    events = [json.loads(line[6:]) for line in response.text.split("\n\n") if line]
+    result = events[-1]
+    assert result["type"] == "result"
+    assert sorted(rid for a in result["data"]["result"]["assignments"] for rid in a["ride_ids_in_order"]) == sorted(
+        r.id for r in SEED_RIDES
+    )
@@ -0,0 +1,68 @@
+import random
+
+from app.geo import haversine_miles
+from app.spatial import GridIndex, pickup_index, vehicle_index
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from tests.synthetic import LAT_RANGE, LNG_RANGE
+
+
+def _points(n: int, seed: int = 5):
+    rng = random.Random(seed)
+    return [(i, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for i in range(n)]
+
+
+def _brute(points, lat, lng):
+    return sorted((haversine_miles(lat, lng, plat, plng), key) for key, plat, plng in points)
+
+
+def test_nearest_and_within_match_brute_force():
+    points = _points(2000)
+    index = GridIndex.from_points(points)
+    rng = random.Random(9)
+    for _ in range(50):
+        lat, lng = rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+        exact = _brute(points, lat, lng)
+        assert [k for k, _ in index.nearest(lat, lng, k=7)] == [k for _, k in exact[:7]]
+        assert sorted(k for k, _ in index.within(lat, lng, 0.8)) == sorted(k for d, k in exact if d <= 0.8)
+
+
+def test_regional_scale_matches_brute_force():
+    # ±15° of latitude around the mean: east-west distances shrink ~30% across the index
+    rng = random.Random(4)
+    points = [(i, rng.uniform(33.0, 63.0), rng.uniform(-125.0, -95.0)) for i in range(3000)]
+    index = GridIndex.from_points(points, cell_miles=10.0)
+    for _ in range(150):
+        lat, lng = rng.uniform(33.0, 63.0), rng.uniform(-125.0, -95.0)
+        exact = _brute(points, lat, lng)
+        assert [k for k, _ in index.nearest(lat, lng, k=3)] == [k for _, k in exact[:3]]
+        assert sorted(k for k, _ in index.within(lat, lng, 40.0)) == sorted(k for d, k in exact if d <= 40.0)
+
+
+def test_nearest_with_predicate_and_cap():
+    points = _points(300)
+    index = GridIndex.from_points(points)
+    lat, lng = points[0][1], points[0][2]
+    even = index.nearest(lat, lng, k=3, predicate=lambda key: key % 2 == 0)
+    assert [k for k, _ in even] == [k for _, k in _brute(points, lat, lng) if k % 2 == 0][:3]
+    assert all(d <= 0.01 for _, d in index.nearest(lat, lng, k=10, max_miles=0.01))
+    assert GridIndex().nearest(lat, lng, k=3) == []
+
+
+def test_insert_moves_and_remove():
+    index = GridIndex.from_points([("a", 45.50, -122.60), ("b", 45.55, -122.70)])
+    assert index.nearest(45.55, -122.70)[0][0] == "b"
+    index.insert("a", 45.551, -122.701)  # vehicle moved next to b
+    assert len(index) == 2
+    assert index.nearest(45.5505, -122.7005, k=2)[0][0] in {"a", "b"}
+    assert index.within(45.50, -122.60, 1.0) == []
+    index.remove("b")
+    assert "b" not in index
+    assert index.nearest(45.55, -122.70)[0][0] == "a"
+
+
+def test_problem_indexes():
+    vehicles = vehicle_index(SEED_VEHICLES)
+    assert len(vehicles) == sum(1 for v in SEED_VEHICLES if v.status.value == "available")
+    rides = pickup_index(SEED_RIDES)
+    ride = SEED_RIDES[0]
+    assert rides.nearest(ride.pickup_lat, ride.pickup_lng)[0] == (ride.id, 0.0)
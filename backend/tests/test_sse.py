@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import pytest
+
+from app import sse
+from app.heuristic import greedy_assign
+from app.optimizer import optimize_events
+from app.seed import SEED_RIDES, SEED_VEHICLES
+from app.sse import TokenCoalescer
+
+
+def test_coalescer_flushes_on_size_or_age():
+    c = TokenCoalescer(interval=0.05, max_bytes=8)
+    assert c.due_in(0.0) is None
+    assert c.add("abc", 0.0) is None
+    assert c.add("", 0.01) is None
+    assert c.due_in(0.01) == pytest.approx(0.04)
+    assert c.add("defgh", 0.02) == "abcdefgh"  # 8 bytes
+    assert c.add("é", 0.03) is None
+    assert c.add("x", 0.09) == "éx"  # oldest delta is 60 ms old
+    assert c.flush() is None
+    assert TokenCoalescer(interval=0).add("a", 0.0) == "a"
+
+
+@pytest.mark.asyncio
+async def test_deltas_coalesce_ahead_of_status_and_result(fake_claude, monkeypatch):
+    monkeypatch.setattr(sse, "SSE_FLUSH_BYTES", 100)
+    plan = [a.model_dump(include={"vehicle_id", "ride_ids_in_order", "reasoning"}) for a in greedy_assign(SEED_RIDES, SEED_VEHICLES)]
+    fake_claude.text = json.dumps({"assignments": plan, "overall_strategy": "", "unassigned_rides": []})
+    fake_claude.thinking = ["tok "] * 60
+    events = [e async for e in optimize_events(SEED_RIDES, SEED_VEHICLES)]
+    types = [e["type"] for e in events]
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    assert "".join(tokens) == "tok " * 60
+    assert len(tokens) == 3  # 100, 100 and the 40-byte remainder
+    assert types == ["token"] * 3 + ["status", "result"]
+
+
+@pytest.mark.asyncio
+async def test_stalled_stream_still_flushes_on_time(fake_claude, monkeypatch):
+    monkeypatch.setattr(sse, "SSE_FLUSH_MS", 10)
+    fake_claude.thinking = ["first", "second"]
+    fake_claude.delay = 0.2
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    arrivals = []
+    async for event in optimize_events(SEED_RIDES, SEED_VEHICLES):
+        if event["type"] == "token":
+            arrivals.append((event["text"], loop.time() - start))
+    assert [text for text, _ in arrivals] == ["first", "second"]
+    assert arrivals[0][1] < 0.35  # not held until "second" arrives at ~0.4 s
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback, useRef } from "react";
-import type { Ride, Vehicle, OptimizeResponse, ScenarioInfo } from "./types";
+import type { Ride, Vehicle, OptimizeResponse, RouteAssignment, ScenarioInfo } from "./types";
 import { RouteMap } from "./components/RouteMap";
 import { RidePanel } from "./components/RidePanel";
 import { VehiclePanel } from "./components/VehiclePanel";
@@ -11,11 +11,14 @@ function App() {
   const [rides, setRides] = useState<Ride[]>([]);
   const [vehicles, setVehicles] = useState<Vehicle[]>([]);
   const [optimizeResponse, setOptimizeResponse] = useState<OptimizeResponse | null>(null);
+  const [provisionalAssignments, setProvisionalAssignments] = useState<RouteAssignment[] | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [scenarios, setScenarios] = useState<Record<string, ScenarioInfo>>({});
   const [activeScenario, setActiveScenario] = useState("downtown_mix");
   const [routeView, setRouteView] = useState<RouteView>("optimized");
+  // Speculative runs race a local heuristic against Claude under a 30 s deadline: opt-in only
+  const [speculative, setSpeculative] = useState(false);
   const [streamingText, setStreamingText] = useState("");
   const [streamStatus, setStreamStatus] = useState<string | null>(null);
   const abortRef = useRef<AbortController | null>(null);
@@ -31,6 +34,7 @@ function App() {
   // Load seed data when scenario changes
   useEffect(() => {
     setOptimizeResponse(null);
+    setProvisionalAssignments(null);
     setError(null);
     setRouteView("optimized");
     setStreamingText("");
@@ -50,6 +54,7 @@ function App() {
       abortRef.current = null;
     }
     setOptimizeResponse(null);
+    setProvisionalAssignments(null);
     setLoading(false);
     setError(null);
     setStreamingText("");
@@ -63,6 +68,7 @@ function App() {
     setStreamingText("");
     setStreamStatus(null);
     setOptimizeResponse(null);
+    setProvisionalAssignments(null);
 
     const controller = new AbortController();
     abortRef.current = controller;
@@ -71,7 +77,8 @@ function App() {
       const res = await fetch("/api/optimize-stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ rides, vehicles }),
+        // Speculative: the local heuristic plan arrives first so the map fills in immediately
+        body: JSON.stringify({ rides, vehicles, speculative }),
         signal: controller.signal,
       });
 
@@ -101,6 +108,8 @@ function App() {
 
           if (payload.type === "token") {
             setStreamingText((prev) => prev + payload.text);
+          } else if (payload.type === "provisional") {
+            setProvisionalAssignments(payload.data.result.assignments as RouteAssignment[]);
           } else if (payload.type === "status") {
             setStreamStatus(payload.message);
           } else if (payload.type === "error") {
@@ -133,7 +142,7 @@ function App() {
         const res = await fetch("/api/optimize", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ rides, vehicles }),
+          body: JSON.stringify({ rides, vehicles, speculative }),
         });
         if (!res.ok) {
           const text = await res.text();
@@ -149,10 +158,10 @@ function App() {
       setLoading(false);
       abortRef.current = null;
     }
-  }, [rides, vehicles]);
+  }, [rides, vehicles, speculative]);
 
   // Compute which assignments to show on map based on toggle
-  const visibleAssignments = optimizeResponse?.result.assignments ?? [];
+  const visibleAssignments = optimizeResponse?.result.assignments ?? provisionalAssignments ?? [];
   const naiveAssignments = optimizeResponse?.naive_assignments ?? [];
 
   return (
@@ -202,6 +211,20 @@ function App() {
             </button>
           )}
 
+          <label
+            className="flex items-center gap-1.5 text-xs text-gray-600 select-none"
+            title="Show a local heuristic plan right away and keep whichever plan scores better (30 s deadline)"
+          >
+            <input
+              type="checkbox"
+              checked={speculative}
+              onChange={(e) => setSpeculative(e.target.checked)}
+              disabled={loading}
+              className="accent-indigo-600"
+            />
+            Quick preview
+          </label>
+
           <button
             onClick={handleOptimize}
             disabled={loading || rides.length === 0}
@@ -34,7 +34,9 @@ export interface RouteAssignment {
   ride_ids_in_order: string[];
   reasoning: string;
   polyline: number[][];  // [[lat, lng], ...] from Google Directions
+  encoded_polyline?: string;  // Google encoded polyline instead, when requested with polyline_format "encoded"
   route_miles: number;
+  locally_improved?: boolean;  // re-sequenced by the local-search pass
 }
 
 export interface OptimizationResult {
@@ -51,6 +53,12 @@ export interface OptimizeResponse {
   naive_violations: number;
   optimized_violations: number;
   naive_assignments: RouteAssignment[];
+  degradations?: string[];  // stages shortened to meet the request deadline
+  plan_source?: "llm" | "heuristic" | "naive" | "mip" | "matching";
+  plan_scores?: Record<string, number>;
+  repairs?: Record<string, number>;  // local fixes applied to Claude's plan
+  local_search?: { miles_saved: number; passes: Record<string, number>[]; routes_changed: number };
+  run_id?: string;  // geometry on demand: GET /routes/{run_id}/{vehicle_id}/polyline
 }
 
 export interface ScenarioInfo {